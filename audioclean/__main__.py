@@ -1,5 +1,8 @@
+import multiprocessing
+
 from audioclean.commands.cli import app_main
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     app_main()
@@ -5,8 +5,18 @@ from typing import Iterable
 
 from audioclean.engine.analyzer import analyze
 from audioclean.engine.applier import apply_plan, undo
-from audioclean.core.config import Config, default_config_path, load_config
+from audioclean.core.config import (
+    Config,
+    default_config_path,
+    fpcalc_settings,
+    hash_settings,
+    load_config,
+    match_settings,
+)
+from audioclean.core import db as db_layer
 from audioclean.core.db import connect
+from audioclean.core.journal import ensure_journal_index, read_journal
+from audioclean.engine.lookup import lookup_file
 from audioclean.engine.meta import collect_meta_issues, meta_fix, meta_report
 from audioclean.core.models import Journal, Plan
 from audioclean.engine.planner import plan as plan_ops
@@ -27,16 +37,49 @@ class Audioclean:
         config = load_config(config_path if config_path.exists() else None)
         return cls(config=config, config_path=config_path)
 
-    def scan(self, paths: Iterable[Path], jobs: int | None = None) -> dict[str, int]:
+    def scan(
+        self,
+        paths: Iterable[Path],
+        jobs: int | None = None,
+        executor: str | None = None,
+        full: bool = False,
+    ) -> dict[str, int]:
         conn = connect(self.config.db_path)
         reporter = Reporter(quiet=True, progress=False)
-        return scan(list(paths), conn, jobs or self.config.jobs, reporter)
+        jobs = jobs or self.config.jobs
+        return scan(
+            list(paths),
+            conn,
+            jobs,
+            reporter,
+            batch_size=self.config.scan_batch_size,
+            commit_interval=self.config.scan_commit_interval,
+            executor=executor or self.config.scan_executor,
+            chunk_size=self.config.scan_chunk_size,
+            hashing=hash_settings(self.config),
+            fingerprinting=fpcalc_settings(self.config, jobs),
+            prefer_lossless=self.config.prefer_lossless,
+            full=full,
+            walk_jobs=self.config.scan_walk_jobs,
+            acoustic=match_settings(self.config),
+        )
 
     def analyze(self, paths: Iterable[Path]) -> dict[str, int]:
         conn = connect(self.config.db_path)
         reporter = Reporter(quiet=True, progress=False)
         root = next(iter(paths), None)
-        return analyze(conn, reporter, root)
+        return analyze(conn, reporter, root, self.config.prefer_lossless)
+
+    def lookup(self, path: Path, limit: int = 10) -> list[dict]:
+        conn = connect(self.config.db_path)
+        candidates = lookup_file(
+            conn,
+            path,
+            fingerprinting=fpcalc_settings(self.config, 1),
+            matching=match_settings(self.config),
+            limit=limit,
+        )
+        return [candidate.to_dict() for candidate in candidates]
 
     def plan(
         self,
@@ -71,10 +114,44 @@ class Audioclean:
         force_low_confidence: bool = False,
         quarantine: Path | None = None,
         quarantine_enabled: bool | None = None,
+        resume: bool = False,
     ) -> Journal:
+        """Apply ``plan`` and return its journal with every entry loaded."""
+        summary = self.apply_summary(
+            plan,
+            dry_run=dry_run,
+            force_low_confidence=force_low_confidence,
+            quarantine=quarantine,
+            quarantine_enabled=quarantine_enabled,
+            resume=resume,
+        )
+        state = read_journal(Path(summary["journal_path"]))
+        return Journal(
+            journal_id=state.journal_id,
+            created_at=str(state.header.get("created_at", "")),
+            plan_id=state.plan_id,
+            entries=state.entries,
+        )
+
+    def apply_summary(
+        self,
+        plan: Plan,
+        dry_run: bool = False,
+        force_low_confidence: bool = False,
+        quarantine: Path | None = None,
+        quarantine_enabled: bool | None = None,
+        resume: bool = False,
+    ) -> dict:
+        """Apply ``plan`` and return counts by status and strategy plus the journal path.
+
+        Unlike ``apply`` nothing is held per operation, so memory stays flat for
+        plans of any size.
+        """
         conn = connect(self.config.db_path)
         reporter = Reporter(quiet=True, progress=False)
-        use_quarantine = self.config.quarantine_enabled if quarantine_enabled is None else quarantine_enabled
+        use_quarantine = (
+            self.config.quarantine_enabled if quarantine_enabled is None else quarantine_enabled
+        )
         quarantine_dir = quarantine or self.config.quarantine_dir
         return apply_plan(
             plan,
@@ -85,11 +162,29 @@ class Audioclean:
             force_low_confidence=force_low_confidence,
             quarantine_enabled=use_quarantine,
             quarantine_dir=quarantine_dir,
+            resume=resume,
+            fsync_batch=self.config.journal_fsync_batch,
+            jobs=self.config.apply_jobs,
         )
 
-    def undo(self, journal_id: str, dry_run: bool = False) -> None:
+    def undo(self, journal_id: str, dry_run: bool = False, verify: bool = False) -> dict:
+        conn = connect(self.config.db_path)
         reporter = Reporter(quiet=True, progress=False)
-        undo(journal_id, reporter, self.config.journal_dir, dry_run=dry_run)
+        return undo(
+            journal_id,
+            conn,
+            reporter,
+            self.config.journal_dir,
+            dry_run=dry_run,
+            jobs=self.config.apply_jobs,
+            verify=verify,
+            hashing=hash_settings(self.config),
+        )
+
+    def journals(self, plan_id: str | None = None, limit: int | None = None) -> list[dict]:
+        conn = connect(self.config.db_path)
+        ensure_journal_index(conn, self.config.journal_dir)
+        return [dict(row) for row in db_layer.list_journals(conn, plan_id=plan_id, limit=limit)]
 
     def meta_check(self, paths: Iterable[Path], format_str: str | None = None) -> list[dict]:
         format_str = format_str or self.config.filename_format
@@ -108,7 +203,9 @@ class Audioclean:
         use_dry_run = dry_run if dry_run is not None else self.config.dry_run_default
         meta_fix(paths, format_str, self.config, reporter, dry_run=use_dry_run, force=force)
 
-    def meta_report(self, paths: Iterable[Path], out_path: Path, format_str: str | None = None) -> None:
+    def meta_report(
+        self, paths: Iterable[Path], out_path: Path, format_str: str | None = None
+    ) -> None:
         reporter = Reporter(quiet=True, progress=False)
         format_str = format_str or self.config.filename_format
         meta_report(paths, format_str, self.config, reporter, out_path)
@@ -16,26 +16,33 @@ from audioclean.engine.analyzer import analyze
 from audioclean.engine.applier import apply_plan, undo
 from audioclean.core import db as db_layer
 from audioclean.core.config import (
+    SCAN_EXECUTORS,
     Config,
     config_default_toml,
     config_to_toml,
     default_config_path,
+    fpcalc_settings,
+    hash_settings,
     load_config,
+    match_settings,
     parse_trust_list,
 )
-from audioclean.core.db import connect
+from audioclean.core.db import connect, schema_version
+from audioclean.core.journal import ensure_journal_index, index_journals
 from audioclean.engine.duplicates import (
     format_canonical_label,
-    group_by_id,
+    get_duplicate_group,
     group_stats,
     list_duplicate_groups,
     resolve_group_actions,
 )
+from audioclean.engine.lookup import lookup_file
 from audioclean.engine.meta import meta_check, meta_fix, meta_report
 from audioclean.core.models import Plan
 from audioclean.engine.planner import plan as plan_ops
 from audioclean.core.reporter import Reporter
 from audioclean.engine.scanner import scan
+from audioclean.utils.fpcalc import FingerprintError
 from audioclean.utils.fs import format_bytes
 
 
@@ -47,6 +54,7 @@ actions_app = typer.Typer(invoke_without_command=True)
 group_app = typer.Typer(invoke_without_command=True)
 settings_app = typer.Typer(invoke_without_command=True)
 meta_app = typer.Typer()
+journal_app = typer.Typer()
 app.add_typer(config_app, name="config")
 app.add_typer(cache_app, name="cache")
 app.add_typer(duplicates_app, name="duplicates")
@@ -54,6 +62,7 @@ app.add_typer(actions_app, name="actions")
 app.add_typer(group_app, name="group")
 app.add_typer(settings_app, name="settings")
 app.add_typer(meta_app, name="meta")
+app.add_typer(journal_app, name="journal")
 
 
 @app.callback()
@@ -82,7 +91,11 @@ def main(
     ctx.ensure_object(dict)
     config_path = config_path or default_config_path()
     ctx.obj["config_path"] = config_path
-    ctx.obj["config"] = load_config(config_path if config_path.exists() else None)
+    try:
+        ctx.obj["config"] = load_config(config_path if config_path.exists() else None)
+    except ValueError as exc:
+        typer.echo(f"Invalid config {config_path}: {exc}", err=True)
+        raise typer.Exit(code=2)
     if db_path:
         ctx.obj["config"].db_path = db_path
     if min_art is not None:
@@ -104,6 +117,13 @@ def main(
 def scan_cmd(
     ctx: typer.Context,
     path: list[Path] = typer.Argument(None),
+    executor: Optional[str] = typer.Option(None, "--executor", help="thread|process"),
+    chunk_size: Optional[int] = typer.Option(
+        None, "--chunk-size", help="Paths per task in process mode"
+    ),
+    full: bool = typer.Option(
+        False, "--full", help="List every directory, even those unchanged since the last scan"
+    ),
 ):
     """Scan a library and update the cache DB."""
     reporter = ctx.obj["reporter"]
@@ -113,13 +133,39 @@ def scan_cmd(
             reporter.info("Missing PATH. Set default_library_path in settings or pass a path.")
             raise typer.Exit(code=2)
         path = [config.default_library_path]
+    executor = executor or config.scan_executor
+    if executor not in SCAN_EXECUTORS:
+        reporter.info(f"Unknown executor: {executor}. Use one of: {', '.join(SCAN_EXECUTORS)}")
+        raise typer.Exit(code=2)
     conn = connect(config.db_path)
-    stats = scan(path, conn, ctx.obj["jobs"], reporter)
+    stats = scan(
+        path,
+        conn,
+        ctx.obj["jobs"],
+        reporter,
+        batch_size=config.scan_batch_size,
+        commit_interval=config.scan_commit_interval,
+        executor=executor,
+        chunk_size=chunk_size or config.scan_chunk_size,
+        hashing=hash_settings(config),
+        fingerprinting=fpcalc_settings(config, ctx.obj["jobs"]),
+        prefer_lossless=config.prefer_lossless,
+        full=full,
+        walk_jobs=config.scan_walk_jobs,
+        acoustic=match_settings(config),
+    )
     if reporter.json_output:
         reporter.emit_json(stats)
     else:
         reporter.info(f"Scanned {stats['files_scanned']} files")
-        reporter.info(f"Fingerprints: {stats['fingerprints_computed']}")
+        reporter.info(f"Moved: {stats['files_moved']}, removed: {stats['files_pruned']}")
+        reporter.info(
+            f"Directories: {stats['dirs_listed']} listed, {stats['dirs_skipped']} unchanged"
+        )
+        reporter.info(
+            f"Fingerprints: {stats['fingerprints_computed']} "
+            f"({stats['fingerprints_per_second']}/s, {stats['fingerprint_errors']} failed)"
+        )
         reporter.info(f"Hashes: {stats['hashes_computed']}")
 
 
@@ -137,7 +183,7 @@ def analyze_cmd(
             raise typer.Exit(code=2)
         path = [config.default_library_path]
     conn = connect(config.db_path)
-    analyze(conn, reporter, path[0] if path else None)
+    analyze(conn, reporter, path[0] if path else None, config.prefer_lossless)
 
 
 @app.command("groups")
@@ -147,12 +193,24 @@ def groups_cmd(
     group_id: Optional[int] = typer.Option(None, "--group", help="Show a specific group"),
     limit: Optional[int] = typer.Option(None, "--limit", help="Limit number of groups"),
     stats: bool = typer.Option(False, "--stats", help="Show group stats"),
+    refresh: bool = typer.Option(
+        False, "--refresh", help="Re-group files changed since the last scan first"
+    ),
 ):
     """List duplicate groups for review."""
     reporter = ctx.obj["reporter"]
     config: Config = ctx.obj["config"]
     conn = connect(config.db_path)
-    groups = list_duplicate_groups(conn, config.prefer_lossless, sort_by="size" if largest else "hash")
+    groups: list = []
+    if stats or group_id is None:
+        groups = list_duplicate_groups(
+            conn,
+            config.prefer_lossless,
+            sort_by="size" if largest else "hash",
+            match=config.duplicate_match,
+            acoustic=match_settings(config),
+            refresh=refresh,
+        )
 
     if stats:
         payload = group_stats(groups)
@@ -164,7 +222,14 @@ def groups_cmd(
         reporter.info(f"Max group size: {payload['max_group_size']:.0f}")
 
     if group_id is not None:
-        selected = group_by_id(groups, group_id)
+        selected = get_duplicate_group(
+            conn,
+            group_id,
+            config.prefer_lossless,
+            match=config.duplicate_match,
+            acoustic=match_settings(config),
+            refresh=refresh,
+        )
         if not selected:
             reporter.info(f"Group {group_id} not found")
             raise typer.Exit(code=1)
@@ -172,6 +237,10 @@ def groups_cmd(
 
     if limit is not None:
         groups = groups[:limit]
+    selected_hashes = None
+    if group_id is not None or limit is not None:
+        selected_hashes = [group.group_hash for group in groups if group]
+    overrides_by_group = db_layer.get_overrides_by_group(conn, selected_hashes)
 
     if reporter.json_output:
         payload = []
@@ -179,15 +248,21 @@ def groups_cmd(
             if not group:
                 continue
             actions = resolve_group_actions(
-                group, db_layer.get_group_overrides(conn, group.group_hash), config.dedupe_mode
+                group, overrides_by_group.get(group.group_hash, {}), config.dedupe_mode
             )
             payload.append(
                 {
                     "group_id": group.group_id,
                     "hash": group.group_hash,
+                    "reason": group.reason,
+                    "similarity": group.similarity,
                     "canonical": str(Path(group.canonical["path"])),
                     "members": [
-                        {"path": str(item["path"]), "action": item["action"], "template": item["template"]}
+                        {
+                            "path": str(item["path"]),
+                            "action": item["action"],
+                            "template": item["template"],
+                        }
                         for item in actions
                     ],
                 }
@@ -198,7 +273,7 @@ def groups_cmd(
     for group in groups:
         if not group:
             continue
-        overrides = db_layer.get_group_overrides(conn, group.group_hash)
+        overrides = overrides_by_group.get(group.group_hash, {})
         actions = resolve_group_actions(group, overrides, config.dedupe_mode)
         reporter.info(f"Group #{group.group_id}")
         reporter.info(f"Canonical: {format_canonical_label(group.canonical)}")
@@ -212,8 +287,13 @@ def groups_cmd(
 def review_cmd(
     ctx: typer.Context,
     largest: bool = typer.Option(False, "--largest", help="Show largest groups first"),
-    start: Optional[int] = typer.Option(None, "--start", help="Start review at group id"),
+    start: Optional[int] = typer.Option(
+        None, "--start", help="Start review at the Nth group of the listing (1-based)"
+    ),
     limit: Optional[int] = typer.Option(None, "--limit", help="Limit number of groups"),
+    refresh: bool = typer.Option(
+        False, "--refresh", help="Re-group files changed since the last scan first"
+    ),
 ):
     """Interactively review duplicate groups and set overrides."""
     reporter = ctx.obj["reporter"]
@@ -222,9 +302,17 @@ def review_cmd(
         raise typer.Exit(code=2)
     config: Config = ctx.obj["config"]
     conn = connect(config.db_path)
-    groups = list_duplicate_groups(conn, config.prefer_lossless, sort_by="size" if largest else "hash")
+    groups = list_duplicate_groups(
+        conn,
+        config.prefer_lossless,
+        sort_by="size" if largest else "hash",
+        match=config.duplicate_match,
+        acoustic=match_settings(config),
+        refresh=refresh,
+    )
     if start is not None:
-        groups = [group for group in groups if group.group_id >= start]
+        # A position, not a group id: stored ids follow insert order, not the listing.
+        groups = groups[max(start, 1) - 1 :]
     if limit is not None:
         groups = groups[:limit]
     if not groups:
@@ -247,7 +335,14 @@ def duplicates_export_cmd(
     reporter = ctx.obj["reporter"]
     config: Config = ctx.obj["config"]
     conn = connect(config.db_path)
-    groups = list_duplicate_groups(conn, config.prefer_lossless, sort_by="hash")
+    groups = list_duplicate_groups(
+        conn,
+        config.prefer_lossless,
+        sort_by="hash",
+        match=config.duplicate_match,
+        acoustic=match_settings(config),
+    )
+    overrides_by_group = db_layer.get_overrides_by_group(conn)
 
     if csv_output:
         writer = csv.writer(sys.stdout)
@@ -262,7 +357,7 @@ def duplicates_export_cmd(
             ]
         )
         for group in groups:
-            overrides = db_layer.get_group_overrides(conn, group.group_hash)
+            overrides = overrides_by_group.get(group.group_hash, {})
             actions = resolve_group_actions(group, overrides, config.dedupe_mode)
             canonical_path = str(Path(group.canonical["path"]))
             for item in actions:
@@ -281,12 +376,14 @@ def duplicates_export_cmd(
 
     payload = []
     for group in groups:
-        overrides = db_layer.get_group_overrides(conn, group.group_hash)
+        overrides = overrides_by_group.get(group.group_hash, {})
         actions = resolve_group_actions(group, overrides, config.dedupe_mode)
         payload.append(
             {
                 "group_id": group.group_id,
                 "fingerprint": group.group_hash,
+                "reason": group.reason,
+                "similarity": group.similarity,
                 "canonical": str(Path(group.canonical["path"])),
                 "files": [
                     {
@@ -310,11 +407,15 @@ def plan_cmd(
     layout: Optional[str] = typer.Option(None, "--layout", help="Layout template"),
     art_only: bool = typer.Option(False, "--art-only", help="Only plan art fixes"),
     summary_only: bool = typer.Option(False, "--summary-only", help="Show summary only"),
-    out_path: Optional[Path] = typer.Option(None, "--out", help="Write plan JSON to file"),
-    auto_accept_above: float = typer.Option(0.90, "--auto-accept-above", help="Auto-accept threshold"),
-    require_review_below: float = typer.Option(0.75, "--require-review-below", help="Review threshold"),
+    out_path: Optional[Path] = typer.Option(None, "--out", help="Write plan NDJSON to file"),
+    auto_accept_above: float = typer.Option(
+        0.90, "--auto-accept-above", help="Auto-accept threshold"
+    ),
+    require_review_below: float = typer.Option(
+        0.75, "--require-review-below", help="Review threshold"
+    ),
 ):
-    """Generate an operations plan (JSON) without applying."""
+    """Generate an operations plan (NDJSON) without applying."""
     reporter = ctx.obj["reporter"]
     ui_reporter = Reporter(
         json_output=False,
@@ -342,7 +443,18 @@ def plan_cmd(
         confidence_threshold=config.confidence_threshold,
         auto_accept_above=auto_accept_above,
         require_review_below=require_review_below,
+        lazy=True,
     )
+    emit_plan_to_stdout = out_path is None and not summary_only
+    if out_path:
+        with out_path.open("w", encoding="utf-8") as handle:
+            plan_obj.write_ndjson(handle)
+    elif emit_plan_to_stdout:
+        plan_obj.write_ndjson(sys.stdout)
+    else:
+        for _ in plan_obj.operations:
+            pass
+
     summary = plan_obj.metadata.get("summary", {})
     summary_payload = {
         "duplicate_groups": summary.get("duplicate_groups", 0),
@@ -356,12 +468,6 @@ def plan_cmd(
         "plan_id": plan_obj.plan_id,
     }
 
-    emit_plan_to_stdout = out_path is None and not summary_only
-    if out_path:
-        out_path.write_text(plan_obj.to_json(), encoding="utf-8")
-    elif not summary_only:
-        typer.echo(plan_obj.to_json())
-
     if summary_only or not emit_plan_to_stdout:
         if reporter.json_output:
             typer.echo(json.dumps(summary_payload, indent=2))
@@ -384,13 +490,15 @@ def apply_cmd(
         None, "--quarantine", help="Move deletes into quarantine directory"
     ),
     no_quarantine: bool = typer.Option(False, "--no-quarantine", help="Disable quarantine"),
+    resume: bool = typer.Option(
+        False, "--resume", help="Continue an interrupted apply of this plan from its journal"
+    ),
 ):
     """Apply a plan with journaling."""
     reporter = ctx.obj["reporter"]
     config: Config = ctx.obj["config"]
+    plan = _load_plan(plan_path, reporter)
     conn = connect(config.db_path)
-    payload = json.loads(plan_path.read_text(encoding="utf-8"))
-    plan = Plan.from_dict(payload)
     quarantine_enabled = config.quarantine_enabled
     quarantine_dir = config.quarantine_dir
     if no_quarantine:
@@ -398,28 +506,129 @@ def apply_cmd(
     if quarantine:
         quarantine_enabled = True
         quarantine_dir = quarantine
-    apply_plan(
-        plan,
-        conn,
-        reporter,
-        config.journal_dir,
-        dry_run=dry_run,
-        force_low_confidence=force_low_confidence,
-        quarantine_enabled=quarantine_enabled,
-        quarantine_dir=quarantine_dir,
-    )
+    try:
+        apply_plan(
+            plan,
+            conn,
+            reporter,
+            config.journal_dir,
+            dry_run=dry_run,
+            force_low_confidence=force_low_confidence,
+            quarantine_enabled=quarantine_enabled,
+            quarantine_dir=quarantine_dir,
+            resume=resume,
+            fsync_batch=config.journal_fsync_batch,
+            jobs=config.apply_jobs,
+        )
+    except FileNotFoundError as exc:
+        if not resume:
+            raise
+        reporter.info(str(exc))
+        raise typer.Exit(code=2)
 
 
 @app.command("undo")
 def undo_cmd(
     ctx: typer.Context,
-    journal_id: str = typer.Argument(..., help="Journal id or 'last'"),
+    journal_id: str = typer.Argument(..., help="Journal id or 'last' (newest not yet undone)"),
     dry_run: bool = typer.Option(False, "--dry-run", help="Simulate undo"),
+    verify: bool = typer.Option(
+        False, "--verify", help="Check restored files against their scanned BLAKE3"
+    ),
 ):
     """Undo a previous apply using the journal."""
     reporter = ctx.obj["reporter"]
     config: Config = ctx.obj["config"]
-    undo(journal_id, reporter, config.journal_dir, dry_run=dry_run)
+    conn = connect(config.db_path)
+    try:
+        summary = undo(
+            journal_id,
+            conn,
+            reporter,
+            config.journal_dir,
+            dry_run=dry_run,
+            jobs=config.apply_jobs,
+            verify=verify,
+            hashing=hash_settings(config),
+        )
+    except FileNotFoundError as exc:
+        reporter.info(str(exc))
+        raise typer.Exit(code=2)
+    if reporter.json_output:
+        reporter.emit_json(summary)
+
+
+@journal_app.command("list")
+def journal_list_cmd(
+    ctx: typer.Context,
+    plan_id: Optional[str] = typer.Option(None, "--plan", help="Only journals for this plan id"),
+    limit: int = typer.Option(20, "--limit", help="Maximum journals to show (0 for all)"),
+):
+    """List apply journals, newest first."""
+    reporter = ctx.obj["reporter"]
+    config: Config = ctx.obj["config"]
+    conn = connect(config.db_path)
+    ensure_journal_index(conn, config.journal_dir)
+    rows = db_layer.list_journals(conn, plan_id=plan_id, limit=limit or None)
+    if reporter.json_output:
+        reporter.emit_json([dict(row) for row in rows])
+        return
+    if not rows:
+        reporter.info("No journals found")
+        return
+    for row in rows:
+        reporter.info(
+            f"{row['journal_id']}  {row['created_at']}  {row['status']:<10}  "
+            f"{row['entries']} entries  plan {row['plan_id']}"
+        )
+
+
+@journal_app.command("reindex")
+def journal_reindex_cmd(ctx: typer.Context):
+    """Register journal files that are missing from the journal index."""
+    reporter = ctx.obj["reporter"]
+    config: Config = ctx.obj["config"]
+    conn = connect(config.db_path)
+    added = index_journals(conn, config.journal_dir)
+    if reporter.json_output:
+        reporter.emit_json({"indexed": added, "journal_dir": str(config.journal_dir)})
+        return
+    reporter.info(f"Indexed {added} journals from {config.journal_dir}")
+
+
+@app.command("lookup")
+def lookup_cmd(
+    ctx: typer.Context,
+    file: Path = typer.Argument(..., help="Audio file to look up"),
+    limit: int = typer.Option(10, "--limit", help="Maximum candidates to show"),
+):
+    """Find library files that sound like FILE."""
+    reporter = ctx.obj["reporter"]
+    config: Config = ctx.obj["config"]
+    if not file.is_file():
+        reporter.info(f"File not found: {file}")
+        raise typer.Exit(code=2)
+    conn = connect(config.db_path)
+    try:
+        candidates = lookup_file(
+            conn,
+            file,
+            fingerprinting=fpcalc_settings(config, 1),
+            matching=match_settings(config),
+            limit=limit,
+        )
+    except FingerprintError as exc:
+        reporter.info(f"Could not fingerprint {file}: {exc}")
+        raise typer.Exit(code=2)
+    if reporter.json_output:
+        reporter.emit_json([candidate.to_dict() for candidate in candidates])
+        return
+    if not candidates:
+        reporter.info("No candidates found")
+        return
+    for candidate in candidates:
+        label = "match" if candidate.matched else "near"
+        reporter.info(f"{candidate.similarity:.3f}  {label:<5}  {candidate.path}")
 
 
 @app.command("doctor")
@@ -478,7 +687,7 @@ def about(ctx: typer.Context):
 @actions_app.callback(invoke_without_command=True)
 def actions_root(
     ctx: typer.Context,
-    plan_path: Optional[Path] = typer.Argument(None, help="Plan JSON path"),
+    plan_path: Optional[Path] = typer.Argument(None, help="Plan file path"),
 ):
     """Inspect planned actions without applying."""
     reporter = ctx.obj["reporter"]
@@ -539,10 +748,18 @@ def cache_stats(ctx: typer.Context):
     conn = connect(config.db_path)
     files = conn.execute("SELECT COUNT(*) AS c FROM files").fetchone()["c"]
     fingerprints = conn.execute("SELECT COUNT(*) AS c FROM fingerprints").fetchone()["c"]
+    schema = schema_version(conn)
     if reporter.json_output:
-        reporter.emit_json({"files": files, "fingerprints": fingerprints, "db": str(config.db_path)})
+        reporter.emit_json(
+            {
+                "files": files,
+                "fingerprints": fingerprints,
+                "db": str(config.db_path),
+                "schema_version": schema,
+            }
+        )
     else:
-        reporter.info(f"DB: {config.db_path}")
+        reporter.info(f"DB: {config.db_path} (schema v{schema})")
         reporter.info(f"Files: {files}")
         reporter.info(f"Fingerprints: {fingerprints}")
 
@@ -684,7 +901,9 @@ def meta_report_cmd(
     meta_report(path, format_str, config, reporter, out_path)
 
 
-def _emit_plan_summary(summary: dict, out_path: Optional[Path], reporter: Reporter | None = None) -> None:
+def _emit_plan_summary(
+    summary: dict, out_path: Optional[Path], reporter: Reporter | None = None
+) -> None:
     reporter = reporter or Reporter()
     reporter.info(f"Duplicate groups analyzed: {summary.get('duplicate_groups', 0)}")
     reporter.info(f"Files to delete: {summary.get('delete', 0)}")
@@ -704,8 +923,11 @@ def _load_plan(plan_path: Optional[Path], reporter: Reporter) -> Plan:
     if not plan_path.exists():
         reporter.info(f"Plan not found: {plan_path}")
         raise typer.Exit(code=1)
-    payload = json.loads(plan_path.read_text(encoding="utf-8"))
-    return Plan.from_dict(payload)
+    try:
+        return Plan.load(plan_path)
+    except (OSError, ValueError, KeyError) as exc:
+        reporter.info(f"Invalid plan {plan_path}: {exc}")
+        raise typer.Exit(code=2)
 
 
 def _summarize_actions(plan: Plan) -> dict[str, int]:
@@ -785,7 +1007,10 @@ def _action_confidence(action: str) -> float:
 def _format_member_label(path: Path, row) -> str:
     ext = path.suffix.lower()
     bitrate = row["bitrate"] or 0
-    descriptor = "lossless" if ext in {".flac", ".wav"} else f"{bitrate} kbps" if bitrate else "unknown"
+    if ext in {".flac", ".wav"}:
+        descriptor = "lossless"
+    else:
+        descriptor = f"{bitrate} kbps" if bitrate else "unknown"
     return f"{path.name} ({descriptor})"
 
 
@@ -799,8 +1024,13 @@ def _apply_group_override(
     config: Config = ctx.obj["config"]
     group_id = ctx.obj.get("group_id")
     conn = connect(config.db_path)
-    groups = list_duplicate_groups(conn, config.prefer_lossless, sort_by="hash")
-    group = group_by_id(groups, group_id)
+    group = get_duplicate_group(
+        conn,
+        group_id,
+        config.prefer_lossless,
+        match=config.duplicate_match,
+        acoustic=match_settings(config),
+    )
     if not group:
         reporter.info(f"Group {group_id} not found")
         raise typer.Exit(code=1)
@@ -840,8 +1070,13 @@ def group_root(
     reporter = ctx.obj["reporter"]
     config: Config = ctx.obj["config"]
     conn = connect(config.db_path)
-    groups = list_duplicate_groups(conn, config.prefer_lossless, sort_by="hash")
-    group = group_by_id(groups, group_id)
+    group = get_duplicate_group(
+        conn,
+        group_id,
+        config.prefer_lossless,
+        match=config.duplicate_match,
+        acoustic=match_settings(config),
+    )
     if not group:
         reporter.info(f"Group {group_id} not found")
         raise typer.Exit(code=1)
@@ -950,7 +1185,9 @@ def _review_group_interactive(conn, reporter: Reporter, config: Config, group) -
 
         timestamp = datetime.utcnow().isoformat(timespec="seconds") + "Z"
         for path in matches:
-            db_layer.upsert_group_override(conn, group.group_hash, path, action, template, timestamp)
+            db_layer.upsert_group_override(
+                conn, group.group_hash, path, action, template, timestamp
+            )
         conn.commit()
         reporter.info(f"Override set: {action} for {len(matches)} file(s)")
 
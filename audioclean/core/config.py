@@ -4,11 +4,22 @@ from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Iterable
 
+from audioclean.utils.chromaprint import MatchSettings
+from audioclean.utils.fpcalc import FpcalcSettings
+from audioclean.utils.hash import HashSettings
+
+DUPLICATE_MATCHES = ("hash", "audio", "fingerprint")
+SCAN_EXECUTORS = ("thread", "process")
+# Settings that only take one of a few values.
+CHOICES = {"duplicate_match": DUPLICATE_MATCHES, "scan_executor": SCAN_EXECUTORS}
+
 
 @dataclass
 class Config:
     db_path: Path = Path("ac-metadata/cache.sqlite3")
     journal_dir: Path = Path("ac-metadata/journal")
+    journal_fsync_batch: int = 64
+    apply_jobs: int = 4
     dry_run_default: bool = False
     quarantine_enabled: bool = False
     quarantine_dir: Path = Path("ac-metadata/quarantine")
@@ -21,6 +32,10 @@ class Config:
     preferred_codecs: list[str] = field(default_factory=lambda: ["flac", "alac", "aac", "mp3"])
     fingerprint_required: bool = True
     prefer_lossless: bool = True
+    duplicate_match: str = "hash"
+    fingerprint_max_bit_error: float = 0.15
+    fingerprint_duration_tolerance: float = 3.0
+    fingerprint_max_offset: int = 8
     allow_network: bool = True
     no_network: bool = False
     dedupe_mode: str = "move"
@@ -31,12 +46,27 @@ class Config:
     normalize_unicode: bool = False
     jobs: int = 4
     show_progress: bool = True
+    scan_batch_size: int = 500
+    scan_commit_interval: float = 2.0
+    scan_executor: str = "thread"
+    scan_chunk_size: int = 64
+    scan_walk_jobs: int = 8
+    hash_chunk_size: int = 1024 * 1024
+    hash_mmap_threshold: int = 32 * 1024 * 1024
+    hash_threads: int = 0
+    fpcalc_length: int = 120
+    fpcalc_timeout: float = 60.0
+    fpcalc_retries: int = 1
+    fpcalc_batch_size: int = 8
+    fpcalc_jobs: int = 0
 
 
 def config_default_toml() -> str:
     return (
         "db_path = 'ac-metadata/cache.sqlite3'\n"
         "journal_dir = 'ac-metadata/journal'\n"
+        "journal_fsync_batch = 64\n"
+        "apply_jobs = 4\n"
         "dry_run_default = false\n"
         "quarantine_enabled = false\n"
         "quarantine_dir = 'ac-metadata/quarantine'\n"
@@ -47,6 +77,10 @@ def config_default_toml() -> str:
         "preferred_codecs = ['flac', 'alac', 'aac', 'mp3']\n"
         "fingerprint_required = true\n"
         "prefer_lossless = true\n"
+        "duplicate_match = 'hash'\n"
+        "fingerprint_max_bit_error = 0.15\n"
+        "fingerprint_duration_tolerance = 3.0\n"
+        "fingerprint_max_offset = 8\n"
         "allow_network = true\n"
         "dedupe_mode = 'move'\n"
         "dupe_dir = ''\n"
@@ -56,6 +90,19 @@ def config_default_toml() -> str:
         "normalize_unicode = false\n"
         "jobs = 4\n"
         "show_progress = true\n"
+        "scan_batch_size = 500\n"
+        "scan_commit_interval = 2.0\n"
+        "scan_executor = 'thread'\n"
+        "scan_chunk_size = 64\n"
+        "scan_walk_jobs = 8\n"
+        "hash_chunk_size = 1048576\n"
+        "hash_mmap_threshold = 33554432\n"
+        "hash_threads = 0\n"
+        "fpcalc_length = 120\n"
+        "fpcalc_timeout = 60.0\n"
+        "fpcalc_retries = 1\n"
+        "fpcalc_batch_size = 8\n"
+        "fpcalc_jobs = 0\n"
     )
 
 
@@ -75,6 +122,10 @@ def load_config(path: Path | None) -> Config:
         cfg.db_path = Path(data["db_path"])
     if "journal_dir" in data:
         cfg.journal_dir = Path(data["journal_dir"])
+    if "journal_fsync_batch" in data:
+        cfg.journal_fsync_batch = int(data["journal_fsync_batch"])
+    if "apply_jobs" in data:
+        cfg.apply_jobs = int(data["apply_jobs"])
     if "min_art" in data:
         cfg.min_art = int(data["min_art"])
     if "trust_order" in data:
@@ -95,6 +146,14 @@ def load_config(path: Path | None) -> Config:
         cfg.fingerprint_required = bool(data["fingerprint_required"])
     if "prefer_lossless" in data:
         cfg.prefer_lossless = bool(data["prefer_lossless"])
+    if "duplicate_match" in data:
+        cfg.duplicate_match = _choice(data, "duplicate_match")
+    if "fingerprint_max_bit_error" in data:
+        cfg.fingerprint_max_bit_error = float(data["fingerprint_max_bit_error"])
+    if "fingerprint_duration_tolerance" in data:
+        cfg.fingerprint_duration_tolerance = float(data["fingerprint_duration_tolerance"])
+    if "fingerprint_max_offset" in data:
+        cfg.fingerprint_max_offset = int(data["fingerprint_max_offset"])
     if "allow_network" in data:
         cfg.allow_network = bool(data["allow_network"])
         cfg.no_network = not cfg.allow_network
@@ -115,11 +174,44 @@ def load_config(path: Path | None) -> Config:
         cfg.jobs = int(data["jobs"])
     if "show_progress" in data:
         cfg.show_progress = bool(data["show_progress"])
+    if "scan_batch_size" in data:
+        cfg.scan_batch_size = int(data["scan_batch_size"])
+    if "scan_commit_interval" in data:
+        cfg.scan_commit_interval = float(data["scan_commit_interval"])
+    if "scan_executor" in data:
+        cfg.scan_executor = _choice(data, "scan_executor")
+    if "scan_chunk_size" in data:
+        cfg.scan_chunk_size = int(data["scan_chunk_size"])
+    if "scan_walk_jobs" in data:
+        cfg.scan_walk_jobs = int(data["scan_walk_jobs"])
+    if "hash_chunk_size" in data:
+        cfg.hash_chunk_size = int(data["hash_chunk_size"])
+    if "hash_mmap_threshold" in data:
+        cfg.hash_mmap_threshold = int(data["hash_mmap_threshold"])
+    if "hash_threads" in data:
+        cfg.hash_threads = int(data["hash_threads"])
+    if "fpcalc_length" in data:
+        cfg.fpcalc_length = int(data["fpcalc_length"])
+    if "fpcalc_timeout" in data:
+        cfg.fpcalc_timeout = float(data["fpcalc_timeout"])
+    if "fpcalc_retries" in data:
+        cfg.fpcalc_retries = int(data["fpcalc_retries"])
+    if "fpcalc_batch_size" in data:
+        cfg.fpcalc_batch_size = int(data["fpcalc_batch_size"])
+    if "fpcalc_jobs" in data:
+        cfg.fpcalc_jobs = int(data["fpcalc_jobs"])
     if "dupe_dir" in data and data["dupe_dir"]:
         cfg.dupe_dir = Path(data["dupe_dir"])
     return cfg
 
 
+def _choice(data: dict, key: str) -> str:
+    value = str(data[key])
+    if value not in CHOICES[key]:
+        raise ValueError(f"{key} must be one of {', '.join(CHOICES[key])}, not {value!r}")
+    return value
+
+
 def default_config_path() -> Path:
     return Path.home() / ".config" / "audioclean" / "config.toml"
 
@@ -140,6 +232,8 @@ def config_to_toml(cfg: Config) -> str:
     return (
         f"db_path = {_quote(str(cfg.db_path))}\n"
         f"journal_dir = {_quote(str(cfg.journal_dir))}\n"
+        f"journal_fsync_batch = {int(cfg.journal_fsync_batch)}\n"
+        f"apply_jobs = {int(cfg.apply_jobs)}\n"
         f"dry_run_default = {_bool(cfg.dry_run_default)}\n"
         f"quarantine_enabled = {_bool(cfg.quarantine_enabled)}\n"
         f"quarantine_dir = {_quote(str(cfg.quarantine_dir))}\n"
@@ -150,6 +244,10 @@ def config_to_toml(cfg: Config) -> str:
         f"preferred_codecs = {_list(cfg.preferred_codecs)}\n"
         f"fingerprint_required = {_bool(cfg.fingerprint_required)}\n"
         f"prefer_lossless = {_bool(cfg.prefer_lossless)}\n"
+        f"duplicate_match = {_quote(cfg.duplicate_match)}\n"
+        f"fingerprint_max_bit_error = {float(cfg.fingerprint_max_bit_error)}\n"
+        f"fingerprint_duration_tolerance = {float(cfg.fingerprint_duration_tolerance)}\n"
+        f"fingerprint_max_offset = {int(cfg.fingerprint_max_offset)}\n"
         f"allow_network = {_bool(cfg.allow_network)}\n"
         f"dedupe_mode = {_quote(cfg.dedupe_mode)}\n"
         f"dupe_dir = {_quote(dupe_dir)}\n"
@@ -159,6 +257,45 @@ def config_to_toml(cfg: Config) -> str:
         f"normalize_unicode = {_bool(cfg.normalize_unicode)}\n"
         f"jobs = {int(cfg.jobs)}\n"
         f"show_progress = {_bool(cfg.show_progress)}\n"
+        f"scan_batch_size = {int(cfg.scan_batch_size)}\n"
+        f"scan_commit_interval = {float(cfg.scan_commit_interval)}\n"
+        f"scan_executor = {_quote(cfg.scan_executor)}\n"
+        f"scan_chunk_size = {int(cfg.scan_chunk_size)}\n"
+        f"scan_walk_jobs = {int(cfg.scan_walk_jobs)}\n"
+        f"hash_chunk_size = {int(cfg.hash_chunk_size)}\n"
+        f"hash_mmap_threshold = {int(cfg.hash_mmap_threshold)}\n"
+        f"hash_threads = {int(cfg.hash_threads)}\n"
+        f"fpcalc_length = {int(cfg.fpcalc_length)}\n"
+        f"fpcalc_timeout = {float(cfg.fpcalc_timeout)}\n"
+        f"fpcalc_retries = {int(cfg.fpcalc_retries)}\n"
+        f"fpcalc_batch_size = {int(cfg.fpcalc_batch_size)}\n"
+        f"fpcalc_jobs = {int(cfg.fpcalc_jobs)}\n"
+    )
+
+
+def hash_settings(cfg: Config) -> HashSettings:
+    return HashSettings(
+        chunk_size=cfg.hash_chunk_size,
+        mmap_threshold=cfg.hash_mmap_threshold,
+        max_threads=cfg.hash_threads,
+    )
+
+
+def match_settings(cfg: Config) -> MatchSettings:
+    return MatchSettings(
+        max_bit_error=cfg.fingerprint_max_bit_error,
+        duration_tolerance=cfg.fingerprint_duration_tolerance,
+        max_offset=cfg.fingerprint_max_offset,
+    )
+
+
+def fpcalc_settings(cfg: Config, jobs: int | None = None) -> FpcalcSettings:
+    return FpcalcSettings(
+        length=cfg.fpcalc_length,
+        timeout=cfg.fpcalc_timeout,
+        retries=cfg.fpcalc_retries,
+        batch_size=cfg.fpcalc_batch_size,
+        jobs=cfg.fpcalc_jobs or jobs or cfg.jobs,
     )
 
 
@@ -1,10 +1,14 @@
 from __future__ import annotations
 
+import os
 import sqlite3
+from itertools import groupby
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Iterator
 
 from audioclean.core.models import FileRecord, Fingerprint
+from audioclean.utils.chromaprint import blob_to_raw, index_keys
+from audioclean.utils.tags import TagInfo
 
 
 SCHEMA = """
@@ -20,16 +24,72 @@ CREATE TABLE IF NOT EXISTS files (
     bitrate INTEGER,
     sample_rate INTEGER,
     channels INTEGER,
-    has_art INTEGER DEFAULT 0
+    has_art INTEGER DEFAULT 0,
+    sample_hash TEXT,
+    hash_level TEXT NOT NULL DEFAULT 'size',
+    audio_size INTEGER,
+    audio_hash TEXT
 );
 
 CREATE TABLE IF NOT EXISTS fingerprints (
     file_id INTEGER NOT NULL,
     chromaprint TEXT NOT NULL,
+    raw BLOB,
     UNIQUE(file_id),
     FOREIGN KEY(file_id) REFERENCES files(id) ON DELETE CASCADE
 );
 
+CREATE TABLE IF NOT EXISTS fingerprint_index (
+    segment INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    PRIMARY KEY(segment, file_id),
+    FOREIGN KEY(file_id) REFERENCES files(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_fingerprint_index_file ON fingerprint_index(file_id);
+
+CREATE TABLE IF NOT EXISTS dup_groups (
+    id INTEGER PRIMARY KEY,
+    match TEXT NOT NULL,
+    group_hash TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    canonical_id INTEGER NOT NULL,
+    similarity REAL NOT NULL DEFAULT 1.0,
+    total_bytes INTEGER NOT NULL,
+    UNIQUE(match, group_hash)
+);
+
+CREATE TABLE IF NOT EXISTS dup_members (
+    group_id INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    PRIMARY KEY(group_id, file_id),
+    FOREIGN KEY(group_id) REFERENCES dup_groups(id) ON DELETE CASCADE,
+    FOREIGN KEY(file_id) REFERENCES files(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS dup_dirty (
+    match TEXT NOT NULL,
+    group_hash TEXT NOT NULL,
+    PRIMARY KEY(match, group_hash)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS dup_state (
+    match TEXT PRIMARY KEY,
+    params TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS tags (
+    file_id INTEGER PRIMARY KEY,
+    title TEXT,
+    artist TEXT,
+    album TEXT,
+    album_artist TEXT,
+    year TEXT,
+    track INTEGER,
+    disc INTEGER,
+    FOREIGN KEY(file_id) REFERENCES files(id) ON DELETE CASCADE
+);
+
 CREATE TABLE IF NOT EXISTS matches (
     file_id INTEGER NOT NULL,
     mb_recording_id TEXT,
@@ -65,33 +125,357 @@ CREATE TABLE IF NOT EXISTS group_overrides (
 );
 """
 
+# Columns added to tables created by earlier releases, filled in by the baseline migration.
+ADDED_COLUMNS = [
+    ("files", "sample_hash", "TEXT", None),
+    (
+        "files",
+        "hash_level",
+        "TEXT NOT NULL DEFAULT 'size'",
+        "UPDATE files SET hash_level = 'full' WHERE blake3 IS NOT NULL",
+    ),
+    ("files", "audio_size", "INTEGER", None),
+    ("files", "audio_hash", "TEXT", None),
+    ("fingerprints", "raw", "BLOB", None),
+]
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_files_blake3 ON files(blake3) WHERE blake3 IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_files_audio_hash ON files(audio_hash) WHERE audio_hash IS NOT NULL;
+"""
+
+# Any change to a file's hashes or to a fingerprint marks the affected groups for refresh.
+DUP_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS dup_files_insert AFTER INSERT ON files
+BEGIN
+    INSERT OR IGNORE INTO dup_dirty SELECT 'hash', NEW.blake3 WHERE NEW.blake3 IS NOT NULL;
+    INSERT OR IGNORE INTO dup_dirty
+        SELECT 'audio', NEW.audio_hash WHERE NEW.audio_hash IS NOT NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dup_files_update AFTER UPDATE OF blake3, audio_hash ON files
+BEGIN
+    INSERT OR IGNORE INTO dup_dirty
+        SELECT 'hash', OLD.blake3 WHERE OLD.blake3 IS NOT NULL AND OLD.blake3 IS NOT NEW.blake3;
+    INSERT OR IGNORE INTO dup_dirty
+        SELECT 'hash', NEW.blake3 WHERE NEW.blake3 IS NOT NULL AND OLD.blake3 IS NOT NEW.blake3;
+    INSERT OR IGNORE INTO dup_dirty
+        SELECT 'audio', OLD.audio_hash
+        WHERE OLD.audio_hash IS NOT NULL AND OLD.audio_hash IS NOT NEW.audio_hash;
+    INSERT OR IGNORE INTO dup_dirty
+        SELECT 'audio', NEW.audio_hash
+        WHERE NEW.audio_hash IS NOT NULL AND OLD.audio_hash IS NOT NEW.audio_hash;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dup_files_delete AFTER DELETE ON files
+BEGIN
+    INSERT OR IGNORE INTO dup_dirty SELECT 'hash', OLD.blake3 WHERE OLD.blake3 IS NOT NULL;
+    INSERT OR IGNORE INTO dup_dirty
+        SELECT 'audio', OLD.audio_hash WHERE OLD.audio_hash IS NOT NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dup_fingerprints_insert AFTER INSERT ON fingerprints
+BEGIN
+    INSERT OR IGNORE INTO dup_dirty VALUES ('fingerprint', '');
+END;
+
+CREATE TRIGGER IF NOT EXISTS dup_fingerprints_update AFTER UPDATE ON fingerprints
+BEGIN
+    INSERT OR IGNORE INTO dup_dirty VALUES ('fingerprint', '');
+END;
+
+CREATE TRIGGER IF NOT EXISTS dup_fingerprints_delete AFTER DELETE ON fingerprints
+BEGIN
+    INSERT OR IGNORE INTO dup_dirty VALUES ('fingerprint', '');
+END;
+"""
+
+HASH_LEVELS = ("size", "sample", "full")
+DUP_COLUMNS = {"hash": "blake3", "audio": "audio_hash"}
+
+TAG_COLUMNS = """
+       tags.file_id AS tagged, tags.title AS tag_title, tags.artist AS tag_artist,
+       tags.album AS tag_album, tags.album_artist AS tag_album_artist, tags.year AS tag_year,
+       tags.track AS tag_track, tags.disc AS tag_disc
+"""
+
+FILES_WITH_TAGS = f"""
+SELECT files.*, {TAG_COLUMNS}
+FROM files
+LEFT JOIN tags ON tags.file_id = files.id
+"""
+
+DUP_MEMBERS_WITH_TAGS = f"""
+SELECT dup_members.group_id AS dup_group_id, files.*, {TAG_COLUMNS}
+FROM dup_groups
+JOIN dup_members ON dup_members.group_id = dup_groups.id
+JOIN files ON files.id = dup_members.file_id
+LEFT JOIN tags ON tags.file_id = files.id
+"""
+
+
+# Applied on every connection; none of these change the file format.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+)
+
 
 def connect(db_path: Path) -> sqlite3.Connection:
     db_path.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(db_path)
+    conn = sqlite3.connect(db_path, check_same_thread=False)
     conn.row_factory = sqlite3.Row
-    conn.executescript(SCHEMA)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    migrate(conn)
     return conn
 
 
+def schema_version(conn: sqlite3.Connection) -> int:
+    return int(conn.execute("PRAGMA user_version").fetchone()[0])
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Apply pending MIGRATIONS in order and return the resulting schema version.
+
+    The version is kept in PRAGMA user_version, so a current database costs one
+    pragma read. Each step runs in one explicit transaction with its version
+    bump, so a failed step leaves the database at the previous version.
+    """
+    version = schema_version(conn)
+    for number, step in enumerate(MIGRATIONS[version:], start=version + 1):
+        conn.execute("BEGIN")
+        try:
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+    return max(version, len(MIGRATIONS))
+
+
+def _run_script(conn: sqlite3.Connection, script: str) -> None:
+    # executescript() would COMMIT first; this keeps the statements in the open transaction.
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ""
+
+
+def _migrate_baseline(conn: sqlite3.Connection) -> None:
+    # Databases from before versioning may be at any earlier layout; every statement is
+    # idempotent so they all converge here.
+    seed_dup_groups = not _table_exists(conn, "dup_groups")
+    _run_script(conn, SCHEMA)
+    _add_missing_columns(conn)
+    _run_script(conn, INDEXES)
+    _run_script(conn, DUP_TRIGGERS)
+    if seed_dup_groups:
+        _seed_dup_dirty(conn)
+
+
+def _migrate_lookup_indexes(conn: sqlite3.Connection) -> None:
+    _run_script(
+        conn,
+        """
+        CREATE INDEX IF NOT EXISTS idx_files_missing_art ON files(path) WHERE has_art = 0;
+        CREATE INDEX IF NOT EXISTS idx_operations_plan ON operations(plan_id);
+        """,
+    )
+
+
+def _migrate_journal_index(conn: sqlite3.Connection) -> None:
+    # byte_offset is the end of the journal's last synced record.
+    _run_script(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS journals (
+            journal_id TEXT PRIMARY KEY,
+            plan_id TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            path TEXT NOT NULL,
+            entries INTEGER NOT NULL DEFAULT 0,
+            byte_offset INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_journals_created ON journals(created_at);
+        CREATE INDEX IF NOT EXISTS idx_journals_plan ON journals(plan_id, created_at);
+        """,
+    )
+
+
+def _migrate_dir_index(conn: sqlite3.Connection) -> None:
+    # mtime_ns is -1 for directories that must be listed again on the next scan.
+    _run_script(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS dirs (
+            path TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            entries INTEGER NOT NULL
+        ) WITHOUT ROWID;
+        """,
+    )
+
+
+def _migrate_fingerprint_indexed(conn: sqlite3.Connection) -> None:
+    # Set once segments are indexed, so fingerprints without any segments are not retried.
+    conn.execute("ALTER TABLE fingerprints ADD COLUMN indexed INTEGER NOT NULL DEFAULT 0")
+    conn.execute(
+        """
+        UPDATE fingerprints SET indexed = 1
+        WHERE EXISTS (
+            SELECT 1 FROM fingerprint_index WHERE fingerprint_index.file_id = fingerprints.file_id
+        )
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_fingerprints_unindexed ON fingerprints(file_id) "
+        "WHERE indexed = 0"
+    )
+
+
+MIGRATIONS = [
+    _migrate_baseline,
+    _migrate_lookup_indexes,
+    _migrate_journal_index,
+    _migrate_dir_index,
+    _migrate_fingerprint_indexed,
+]
+
+
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone()
+    return row is not None
+
+
+def _seed_dup_dirty(conn: sqlite3.Connection) -> None:
+    for match, column in DUP_COLUMNS.items():
+        conn.execute(
+            f"""
+            INSERT OR IGNORE INTO dup_dirty
+            SELECT ?, {column} FROM files
+            WHERE {column} IS NOT NULL
+            GROUP BY {column}
+            HAVING COUNT(*) > 1
+            """,
+            (match,),
+        )
+    conn.execute("INSERT OR IGNORE INTO dup_dirty VALUES ('fingerprint', '')")
+
+
+def _add_missing_columns(conn: sqlite3.Connection) -> None:
+    for table, column, declaration, backfill in ADDED_COLUMNS:
+        existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if column in existing:
+            continue
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+        if backfill:
+            conn.execute(backfill)
+
+
 def get_file_by_path(conn: sqlite3.Connection, path: Path) -> sqlite3.Row | None:
     return conn.execute("SELECT * FROM files WHERE path = ?", (str(path),)).fetchone()
 
 
+def load_file_index(
+    conn: sqlite3.Connection, roots: Iterable[Path], include_untagged: bool = False
+) -> dict[str, tuple[int, float] | None]:
+    """(size, mtime) by path; with ``include_untagged`` rows without tags map to None."""
+    index: dict[str, tuple[int, float] | None] = {}
+    columns = "files.path, files.size, files.mtime, tags.file_id AS tagged"
+    for root in roots:
+        for row in _iter_under_root(conn, columns, root, include_untagged):
+            if row["tagged"] is None:
+                index[row["path"]] = None
+            else:
+                index[row["path"]] = (int(row["size"]), float(row["mtime"]))
+    return index
+
+
+def load_tags_index(
+    conn: sqlite3.Connection, roots: Iterable[Path]
+) -> dict[str, tuple[int, float, TagInfo]]:
+    index: dict[str, tuple[int, float, TagInfo]] = {}
+    columns = "files.path, files.size, files.mtime, tags.*"
+    for root in roots:
+        for row in _iter_under_root(conn, columns, root):
+            index[row["path"]] = (int(row["size"]), float(row["mtime"]), _row_to_tags(row, ""))
+    return index
+
+
+def _iter_under_root(
+    conn: sqlite3.Connection, columns: str, root: Path, include_untagged: bool = False
+) -> Iterable[sqlite3.Row]:
+    # Rows without a tags entry predate tag caching; leaving them out forces a rescan.
+    join = "LEFT JOIN" if include_untagged else "JOIN"
+    query = f"SELECT {columns} FROM files {join} tags ON tags.file_id = files.id WHERE "
+    yield from conn.execute(query + "files.path = ?", (str(root),))
+    lower, upper = _prefix_bounds(root)
+    yield from conn.execute(query + "files.path >= ? AND files.path < ?", (lower, upper))
+
+
+def _prefix_bounds(root: Path) -> tuple[str, str]:
+    # Range over the UNIQUE(path) index: every "<root>/..." sorts in
+    # [root + sep, root + chr(sep + 1)).
+    prefix = str(root).rstrip(os.sep) + os.sep
+    return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+
+def load_dir_index(conn: sqlite3.Connection, roots: Iterable[Path]) -> dict[str, tuple[int, int]]:
+    """(mtime_ns, entries) by directory path, for directories recorded by earlier scans."""
+    index: dict[str, tuple[int, int]] = {}
+    for root in roots:
+        lower, upper = _prefix_bounds(root)
+        rows = conn.execute(
+            "SELECT * FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+            (str(root), lower, upper),
+        )
+        index.update((row["path"], (int(row["mtime_ns"]), int(row["entries"]))) for row in rows)
+    return index
+
+
+def upsert_dirs(conn: sqlite3.Connection, dirs: dict[str, tuple[int, int]]) -> None:
+    conn.executemany(
+        "INSERT OR REPLACE INTO dirs (path, mtime_ns, entries) VALUES (?, ?, ?)",
+        ((path, mtime_ns, entries) for path, (mtime_ns, entries) in dirs.items()),
+    )
+
+
+def delete_dirs(conn: sqlite3.Connection, paths: Iterable[str]) -> None:
+    """Forget directories and everything recorded below them."""
+    for path in paths:
+        lower, upper = _prefix_bounds(Path(path))
+        conn.execute(
+            "DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (path, lower, upper)
+        )
+
+
 def upsert_file(conn: sqlite3.Connection, record: FileRecord) -> int:
     existing = get_file_by_path(conn, record.path)
     if existing:
         conn.execute(
             """
             UPDATE files
-            SET size=?, mtime=?, blake3=?, codec=?, container=?, duration=?, bitrate=?,
-                sample_rate=?, channels=?, has_art=?
+            SET size=?, mtime=?, blake3=?, sample_hash=?, hash_level=?, codec=?, container=?,
+                duration=?, bitrate=?, sample_rate=?, channels=?, has_art=?, audio_size=?,
+                audio_hash=?
             WHERE id=?
             """,
             (
                 record.size,
                 record.mtime,
                 record.blake3,
+                record.sample_hash,
+                record.hash_level,
                 record.codec,
                 record.container,
                 record.duration,
@@ -99,22 +483,30 @@ def upsert_file(conn: sqlite3.Connection, record: FileRecord) -> int:
                 record.sample_rate,
                 record.channels,
                 1 if record.has_art else 0,
+                record.audio_size,
+                record.audio_hash,
                 existing["id"],
             ),
         )
-        return int(existing["id"])
+        file_id = int(existing["id"])
+        if record.tags is not None:
+            upsert_tags(conn, file_id, record.tags)
+        return file_id
 
     cur = conn.execute(
         """
-        INSERT INTO files (path, size, mtime, blake3, codec, container, duration,
-                           bitrate, sample_rate, channels, has_art)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        INSERT INTO files (path, size, mtime, blake3, sample_hash, hash_level, codec, container,
+                           duration, bitrate, sample_rate, channels, has_art, audio_size,
+                           audio_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """,
         (
             str(record.path),
             record.size,
             record.mtime,
             record.blake3,
+            record.sample_hash,
+            record.hash_level,
             record.codec,
             record.container,
             record.duration,
@@ -122,15 +514,377 @@ def upsert_file(conn: sqlite3.Connection, record: FileRecord) -> int:
             record.sample_rate,
             record.channels,
             1 if record.has_art else 0,
+            record.audio_size,
+            record.audio_hash,
         ),
     )
-    return int(cur.lastrowid)
+    file_id = int(cur.lastrowid)
+    if record.tags is not None:
+        upsert_tags(conn, file_id, record.tags)
+    return file_id
+
+
+def write_scan_batch(conn: sqlite3.Connection, records: list[FileRecord]) -> None:
+    conn.executemany(
+        """
+        INSERT INTO files (path, size, mtime, blake3, sample_hash, hash_level, codec, container,
+                           duration, bitrate, sample_rate, channels, has_art, audio_size,
+                           audio_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(path) DO UPDATE SET
+            size=excluded.size, mtime=excluded.mtime, blake3=excluded.blake3,
+            sample_hash=excluded.sample_hash, hash_level=excluded.hash_level,
+            codec=excluded.codec, container=excluded.container, duration=excluded.duration,
+            bitrate=excluded.bitrate, sample_rate=excluded.sample_rate,
+            channels=excluded.channels, has_art=excluded.has_art,
+            audio_size=excluded.audio_size, audio_hash=excluded.audio_hash
+        """,
+        [
+            (
+                str(record.path),
+                record.size,
+                record.mtime,
+                record.blake3,
+                record.sample_hash,
+                record.hash_level,
+                record.codec,
+                record.container,
+                record.duration,
+                record.bitrate,
+                record.sample_rate,
+                record.channels,
+                1 if record.has_art else 0,
+                record.audio_size,
+                record.audio_hash,
+            )
+            for record in records
+        ],
+    )
+    ids = get_file_ids(conn, [record.path for record in records])
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO tags (file_id, title, artist, album, album_artist, year, track, disc)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        [
+            (
+                ids[str(record.path)],
+                record.tags.title,
+                record.tags.artist,
+                record.tags.album,
+                record.tags.album_artist,
+                record.tags.year,
+                record.tags.track,
+                record.tags.disc,
+            )
+            for record in records
+            if record.tags is not None
+        ],
+    )
+
+
+def write_fingerprints(conn: sqlite3.Connection, items: list[tuple[Path, bytes]]) -> None:
+    """Store raw fingerprints; the compressed text column is left empty for them."""
+    ids = get_file_ids(conn, [path for path, _ in items])
+    rows = [(ids[str(path)], raw) for path, raw in items if str(path) in ids]
+    conn.executemany(
+        "INSERT OR REPLACE INTO fingerprints (file_id, chromaprint, raw) VALUES (?, '', ?)", rows
+    )
+    index_fingerprints(conn, [(file_id, index_keys(blob_to_raw(raw))) for file_id, raw in rows])
+
+
+def index_fingerprints(conn: sqlite3.Connection, items: list[tuple[int, set[int]]]) -> None:
+    file_ids = [file_id for file_id, _ in items]
+    for start in range(0, len(file_ids), 500):
+        chunk = file_ids[start : start + 500]
+        placeholders = ", ".join("?" for _ in chunk)
+        conn.execute(f"DELETE FROM fingerprint_index WHERE file_id IN ({placeholders})", chunk)
+        conn.execute(
+            f"UPDATE fingerprints SET indexed = 1 WHERE file_id IN ({placeholders})", chunk
+        )
+    conn.executemany(
+        "INSERT INTO fingerprint_index (segment, file_id) VALUES (?, ?)",
+        [(segment, file_id) for file_id, segments in items for segment in segments],
+    )
+
+
+def get_unindexed_fingerprint_ids(conn: sqlite3.Connection) -> list[int]:
+    rows = conn.execute(
+        "SELECT file_id FROM fingerprints WHERE indexed = 0 AND raw IS NOT NULL"
+    )
+    return [int(row["file_id"]) for row in rows]
+
+
+def lookup_segments(
+    conn: sqlite3.Connection, segments: Iterable[int], limit: int
+) -> list[tuple[int, int]]:
+    """(file_id, shared segment count) for the files sharing the most segments."""
+    keys = list(segments)
+    if not keys:
+        return []
+    placeholders = ", ".join("?" for _ in keys)
+    rows = conn.execute(
+        f"""
+        SELECT file_id, COUNT(*) AS shared FROM fingerprint_index
+        WHERE segment IN ({placeholders})
+        GROUP BY file_id
+        ORDER BY shared DESC, file_id
+        LIMIT ?
+        """,
+        (*keys, limit),
+    )
+    return [(int(row["file_id"]), int(row["shared"])) for row in rows]
+
+
+def get_raw_fingerprint_backfill(conn: sqlite3.Connection) -> list[sqlite3.Row]:
+    return conn.execute(
+        "SELECT file_id, chromaprint FROM fingerprints WHERE raw IS NULL"
+    ).fetchall()
+
+
+def set_raw_fingerprints(conn: sqlite3.Connection, items: list[tuple[int, bytes]]) -> None:
+    conn.executemany("UPDATE fingerprints SET raw = ?2 WHERE file_id = ?1", items)
+
+
+def get_fingerprint_durations(
+    conn: sqlite3.Connection, frame_seconds: float
+) -> list[tuple[int, float]]:
+    """(file_id, duration) for files with a raw fingerprint, shortest first."""
+    rows = conn.execute(
+        """
+        SELECT fingerprints.file_id AS file_id,
+               COALESCE(files.duration, length(fingerprints.raw) / 4 * ?) AS duration
+        FROM fingerprints
+        JOIN files ON files.id = fingerprints.file_id
+        WHERE length(fingerprints.raw) > 0
+        ORDER BY duration, fingerprints.file_id
+        """,
+        (frame_seconds,),
+    )
+    return [(int(row["file_id"]), float(row["duration"])) for row in rows]
+
+
+def get_raw_fingerprints(
+    conn: sqlite3.Connection, file_ids: Iterable[int]
+) -> dict[int, memoryview]:
+    keys = list(file_ids)
+    raws: dict[int, memoryview] = {}
+    for start in range(0, len(keys), 500):
+        chunk = keys[start : start + 500]
+        placeholders = ", ".join("?" for _ in chunk)
+        rows = conn.execute(
+            f"SELECT file_id, raw FROM fingerprints WHERE file_id IN ({placeholders})", chunk
+        )
+        raws.update((int(row["file_id"]), blob_to_raw(row["raw"])) for row in rows)
+    return raws
+
+
+def get_files_with_tags_by_ids(
+    conn: sqlite3.Connection, file_ids: Iterable[int]
+) -> dict[int, sqlite3.Row]:
+    keys = list(file_ids)
+    rows: dict[int, sqlite3.Row] = {}
+    for start in range(0, len(keys), 500):
+        chunk = keys[start : start + 500]
+        placeholders = ", ".join("?" for _ in chunk)
+        for row in conn.execute(FILES_WITH_TAGS + f"WHERE files.id IN ({placeholders})", chunk):
+            rows[int(row["id"])] = row
+    return rows
+
+
+def iter_raw_fingerprints(conn: sqlite3.Connection) -> Iterator[tuple[int, memoryview]]:
+    """Yield (file_id, sub-fingerprints) as uint32 views over the stored BLOBs."""
+    for row in conn.execute("SELECT file_id, raw FROM fingerprints WHERE length(raw) > 0"):
+        yield int(row["file_id"]), blob_to_raw(row["raw"])
+
+
+def get_file_ids(conn: sqlite3.Connection, paths: Iterable[Path]) -> dict[str, int]:
+    keys = [str(path) for path in paths]
+    ids: dict[str, int] = {}
+    for start in range(0, len(keys), 500):
+        chunk = keys[start : start + 500]
+        placeholders = ", ".join("?" for _ in chunk)
+        rows = conn.execute(f"SELECT id, path FROM files WHERE path IN ({placeholders})", chunk)
+        ids.update((row["path"], int(row["id"])) for row in rows)
+    return ids
+
+
+def get_file_signatures(conn: sqlite3.Connection, paths: Iterable[Path]) -> dict[str, sqlite3.Row]:
+    """Id, size, mtime, blake3 and sample hash as of the last scan, keyed by path."""
+    keys = sorted({str(path) for path in paths})
+    rows: dict[str, sqlite3.Row] = {}
+    for start in range(0, len(keys), 500):
+        chunk = keys[start : start + 500]
+        placeholders = ", ".join("?" for _ in chunk)
+        rows.update(
+            (row["path"], row)
+            for row in conn.execute(
+                f"""
+                SELECT id, path, size, mtime, blake3, sample_hash FROM files
+                WHERE path IN ({placeholders})
+                """,
+                chunk,
+            )
+        )
+    return rows
+
+
+def move_files(
+    conn: sqlite3.Connection, moves: list[tuple[int, str, str, float, bool]]
+) -> None:
+    """Point rows at the new paths of moved files.
+
+    Moves are (id, old path, new path, mtime, verified). Tags and fingerprints
+    stay with the row and group overrides follow the path. Hashes stay only
+    when the move was checked against one; otherwise the row drops back to
+    hash_level 'size' so the next size collision hashes the file again.
+    """
+    conn.executemany(
+        "UPDATE files SET path = ?, mtime = ? WHERE id = ?",
+        ((new_path, mtime, file_id) for file_id, _, new_path, mtime, _ in moves),
+    )
+    conn.executemany(
+        """
+        UPDATE files
+        SET blake3 = NULL, sample_hash = NULL, audio_hash = NULL, hash_level = 'size'
+        WHERE id = ?
+        """,
+        ((file_id,) for file_id, _, _, _, verified in moves if not verified),
+    )
+    conn.executemany(
+        "UPDATE OR REPLACE group_overrides SET path = ? WHERE path = ?",
+        ((new_path, old_path) for _, old_path, new_path, _, _ in moves),
+    )
+
+
+def delete_files(conn: sqlite3.Connection, file_ids: Iterable[int]) -> int:
+    """Delete files and the rows that hang off them; foreign keys are not enforced."""
+    ids = sorted(set(file_ids))
+    for start in range(0, len(ids), 500):
+        chunk = ids[start : start + 500]
+        placeholders = ", ".join("?" for _ in chunk)
+        for table in ("fingerprint_index", "fingerprints", "tags", "matches", "dup_members"):
+            conn.execute(f"DELETE FROM {table} WHERE file_id IN ({placeholders})", chunk)
+        conn.execute(f"DELETE FROM files WHERE id IN ({placeholders})", chunk)
+    return len(ids)
+
+
+def get_sample_hash_candidates(conn: sqlite3.Connection) -> list[sqlite3.Row]:
+    return conn.execute(
+        """
+        SELECT id, path, size FROM files
+        WHERE sample_hash IS NULL
+          AND size IN (SELECT size FROM files GROUP BY size HAVING COUNT(*) > 1)
+        ORDER BY size, path
+        """
+    ).fetchall()
+
+
+def get_full_hash_candidates(conn: sqlite3.Connection) -> list[sqlite3.Row]:
+    return conn.execute(
+        """
+        SELECT id, path, size FROM files
+        WHERE blake3 IS NULL
+          AND (size, sample_hash) IN (
+              SELECT size, sample_hash FROM files
+              WHERE sample_hash IS NOT NULL
+              GROUP BY size, sample_hash
+              HAVING COUNT(*) > 1
+          )
+        ORDER BY size, path
+        """
+    ).fetchall()
+
+
+def get_audio_hash_candidates(conn: sqlite3.Connection) -> list[sqlite3.Row]:
+    return conn.execute(
+        """
+        SELECT id, path, size FROM files
+        WHERE audio_hash IS NULL
+          AND audio_size > 0
+          AND (container, audio_size) IN (
+              SELECT container, audio_size FROM files
+              WHERE audio_size > 0
+              GROUP BY container, audio_size
+              HAVING COUNT(*) > 1
+          )
+        ORDER BY size, path
+        """
+    ).fetchall()
+
+
+def get_audio_size_backfill(conn: sqlite3.Connection) -> list[sqlite3.Row]:
+    return conn.execute("SELECT id, path, size FROM files WHERE audio_size IS NULL").fetchall()
+
+
+def set_audio_sizes(conn: sqlite3.Connection, items: list[tuple[int, int]]) -> None:
+    conn.executemany("UPDATE files SET audio_size = ?2 WHERE id = ?1", items)
+
+
+def set_audio_hashes(conn: sqlite3.Connection, items: list[tuple[int, str | None]]) -> None:
+    conn.executemany("UPDATE files SET audio_hash = ?2 WHERE id = ?1", items)
+
+
+def set_sample_hashes(
+    conn: sqlite3.Connection, items: list[tuple[int, str, str | None]]
+) -> None:
+    conn.executemany(
+        """
+        UPDATE files
+        SET sample_hash = ?2,
+            blake3 = COALESCE(?3, blake3),
+            hash_level = CASE WHEN COALESCE(?3, blake3) IS NULL THEN 'sample' ELSE 'full' END
+        WHERE id = ?1
+        """,
+        items,
+    )
+
+
+def set_full_hashes(conn: sqlite3.Connection, items: list[tuple[int, str]]) -> None:
+    conn.executemany("UPDATE files SET blake3 = ?2, hash_level = 'full' WHERE id = ?1", items)
+
+
+def upsert_tags(conn: sqlite3.Connection, file_id: int, tags: TagInfo) -> None:
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO tags (file_id, title, artist, album, album_artist, year, track, disc)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            file_id,
+            tags.title,
+            tags.artist,
+            tags.album,
+            tags.album_artist,
+            tags.year,
+            tags.track,
+            tags.disc,
+        ),
+    )
+
+
+def tags_from_row(row: sqlite3.Row) -> TagInfo | None:
+    if "tagged" not in row.keys() or row["tagged"] is None:
+        return None
+    return _row_to_tags(row, "tag_")
+
+
+def _row_to_tags(row: sqlite3.Row, prefix: str) -> TagInfo:
+    return TagInfo(
+        title=row[f"{prefix}title"],
+        artist=row[f"{prefix}artist"],
+        album=row[f"{prefix}album"],
+        album_artist=row[f"{prefix}album_artist"],
+        year=row[f"{prefix}year"],
+        track=row[f"{prefix}track"],
+        disc=row[f"{prefix}disc"],
+    )
 
 
 def upsert_fingerprint(conn: sqlite3.Connection, fingerprint: Fingerprint) -> None:
     conn.execute(
-        "INSERT OR REPLACE INTO fingerprints (file_id, chromaprint) VALUES (?, ?)",
-        (fingerprint.file_id, fingerprint.chromaprint),
+        "INSERT OR REPLACE INTO fingerprints (file_id, chromaprint, raw) VALUES (?, ?, ?)",
+        (fingerprint.file_id, fingerprint.chromaprint, fingerprint.raw),
     )
 
 
@@ -138,33 +892,307 @@ def iter_files(conn: sqlite3.Connection) -> Iterable[sqlite3.Row]:
     return conn.execute("SELECT * FROM files ORDER BY path")
 
 
-def get_duplicates_by_hash(conn: sqlite3.Connection) -> list[list[sqlite3.Row]]:
-    groups: list[list[sqlite3.Row]] = []
-    hashes = conn.execute(
-        """
-        SELECT blake3, COUNT(*) as count
-        FROM files
-        WHERE blake3 IS NOT NULL
-        GROUP BY blake3
-        HAVING count > 1
+def iter_files_missing_art(conn: sqlite3.Connection) -> Iterable[sqlite3.Row]:
+    return conn.execute("SELECT * FROM files WHERE has_art = 0 ORDER BY path")
+
+
+def count_files(conn: sqlite3.Connection) -> int:
+    return int(conn.execute("SELECT COUNT(*) FROM files").fetchone()[0])
+
+
+def count_files_missing_art(conn: sqlite3.Connection) -> int:
+    return int(conn.execute("SELECT COUNT(*) FROM files WHERE has_art = 0").fetchone()[0])
+
+
+def iter_files_with_tags(conn: sqlite3.Connection) -> Iterable[sqlite3.Row]:
+    return conn.execute(FILES_WITH_TAGS + "ORDER BY files.path")
+
+
+def iter_duplicates_by_hash(conn: sqlite3.Connection) -> Iterator[list[sqlite3.Row]]:
+    return _iter_duplicates_by(conn, "blake3")
+
+
+def iter_duplicates_by_audio_hash(conn: sqlite3.Connection) -> Iterator[list[sqlite3.Row]]:
+    return _iter_duplicates_by(conn, "audio_hash")
+
+
+def _iter_duplicates_by(conn: sqlite3.Connection, column: str) -> Iterator[list[sqlite3.Row]]:
+    """Yield groups of rows sharing ``column``, in ``column`` order.
+
+    One query walks the partial index on ``column`` and rows are split into
+    groups as they stream, so only the current group is held in memory.
+    """
+    cursor = conn.execute(
+        FILES_WITH_TAGS
+        + f"""
+        WHERE files.{column} IN (
+            SELECT {column} FROM files
+            WHERE {column} IS NOT NULL
+            GROUP BY {column}
+            HAVING COUNT(*) > 1
+        )
+        ORDER BY files.{column}, files.id
         """
+    )
+    for _, rows in groupby(cursor, key=lambda row: row[column]):
+        yield list(rows)
+
+
+def get_files_by_hash(conn: sqlite3.Connection, column: str, value: str) -> list[sqlite3.Row]:
+    return conn.execute(
+        FILES_WITH_TAGS + f"WHERE files.{column} = ? ORDER BY files.id", (value,)
     ).fetchall()
-    for row in hashes:
-        items = conn.execute("SELECT * FROM files WHERE blake3 = ?", (row["blake3"],)).fetchall()
-        groups.append(items)
-    return groups
 
 
-def record_operation(conn: sqlite3.Connection, plan_id: str, op_id: str, op_type: str, path: Path, new_path: Path | None, status: str) -> None:
+def get_dup_dirty(conn: sqlite3.Connection, match: str) -> list[str]:
+    rows = conn.execute(
+        "SELECT group_hash FROM dup_dirty WHERE match = ? ORDER BY group_hash", (match,)
+    )
+    return [row["group_hash"] for row in rows]
+
+
+def clear_dup_dirty(conn: sqlite3.Connection, match: str, hashes: Iterable[str]) -> None:
+    conn.executemany(
+        "DELETE FROM dup_dirty WHERE match = ? AND group_hash = ?",
+        [(match, group_hash) for group_hash in hashes],
+    )
+
+
+def get_dup_params(conn: sqlite3.Connection, match: str) -> str | None:
+    row = conn.execute("SELECT params FROM dup_state WHERE match = ?", (match,)).fetchone()
+    return row["params"] if row else None
+
+
+def set_dup_params(conn: sqlite3.Connection, match: str, params: str) -> None:
     conn.execute(
+        """
+        INSERT INTO dup_state (match, params) VALUES (?, ?)
+        ON CONFLICT(match) DO UPDATE SET params=excluded.params
+        """,
+        (match, params),
+    )
+
+
+def get_dup_group_hashes(conn: sqlite3.Connection, match: str) -> list[str]:
+    rows = conn.execute("SELECT group_hash FROM dup_groups WHERE match = ?", (match,))
+    return [row["group_hash"] for row in rows]
+
+
+def upsert_dup_group(
+    conn: sqlite3.Connection,
+    match: str,
+    group_hash: str,
+    reason: str,
+    canonical_id: int,
+    similarity: float,
+    total_bytes: int,
+    member_ids: list[int],
+) -> int:
+    conn.execute(
+        """
+        INSERT INTO dup_groups (match, group_hash, reason, canonical_id, similarity, total_bytes)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(match, group_hash) DO UPDATE SET
+            reason=excluded.reason,
+            canonical_id=excluded.canonical_id,
+            similarity=excluded.similarity,
+            total_bytes=excluded.total_bytes
+        """,
+        (match, group_hash, reason, canonical_id, similarity, total_bytes),
+    )
+    group_id = int(
+        conn.execute(
+            "SELECT id FROM dup_groups WHERE match = ? AND group_hash = ?", (match, group_hash)
+        ).fetchone()["id"]
+    )
+    conn.execute("DELETE FROM dup_members WHERE group_id = ?", (group_id,))
+    conn.executemany(
+        "INSERT INTO dup_members (group_id, file_id) VALUES (?, ?)",
+        [(group_id, file_id) for file_id in member_ids],
+    )
+    return group_id
+
+
+def get_dup_member_groups(conn: sqlite3.Connection, match: str) -> dict[int, str]:
+    """Group hash by member file id."""
+    rows = conn.execute(
+        """
+        SELECT dup_members.file_id, dup_groups.group_hash FROM dup_members
+        JOIN dup_groups ON dup_groups.id = dup_members.group_id
+        WHERE dup_groups.match = ?
+        """,
+        (match,),
+    )
+    return {int(row["file_id"]): row["group_hash"] for row in rows}
+
+
+def delete_dup_groups(conn: sqlite3.Connection, match: str, hashes: Iterable[str]) -> None:
+    for group_hash in hashes:
+        row = conn.execute(
+            "SELECT id FROM dup_groups WHERE match = ? AND group_hash = ?", (match, group_hash)
+        ).fetchone()
+        if row is None:
+            continue
+        conn.execute("DELETE FROM dup_members WHERE group_id = ?", (row["id"],))
+        conn.execute("DELETE FROM dup_groups WHERE id = ?", (row["id"],))
+
+
+def iter_dup_groups(
+    conn: sqlite3.Connection, match: str
+) -> Iterator[tuple[sqlite3.Row, list[sqlite3.Row]]]:
+    """Yield (group, member rows) for every stored group, in group_hash order."""
+    groups = conn.execute(
+        "SELECT * FROM dup_groups WHERE match = ? ORDER BY group_hash", (match,)
+    ).fetchall()
+    members = conn.execute(
+        DUP_MEMBERS_WITH_TAGS
+        + "WHERE dup_groups.match = ? ORDER BY dup_groups.group_hash, files.id",
+        (match,),
+    )
+    by_group = groupby(members, key=lambda row: row["dup_group_id"])
+    pending = next(by_group, None)
+    for group in groups:
+        rows: list[sqlite3.Row] = []
+        if pending is not None and pending[0] == group["id"]:
+            rows = list(pending[1])
+            pending = next(by_group, None)
+        yield group, rows
+
+
+def count_dup_groups(conn: sqlite3.Connection, match: str) -> tuple[int, int]:
+    row = conn.execute(
+        """
+        SELECT COUNT(DISTINCT dup_groups.id) AS groups, COUNT(*) AS members
+        FROM dup_groups
+        JOIN dup_members ON dup_members.group_id = dup_groups.id
+        WHERE dup_groups.match = ?
+        """,
+        (match,),
+    ).fetchone()
+    return int(row["groups"]), int(row["members"])
+
+
+def get_dup_group(
+    conn: sqlite3.Connection, match: str, group_id: int
+) -> tuple[sqlite3.Row, list[sqlite3.Row]] | None:
+    group = conn.execute(
+        "SELECT * FROM dup_groups WHERE id = ? AND match = ?", (group_id, match)
+    ).fetchone()
+    if group is None:
+        return None
+    members = conn.execute(
+        DUP_MEMBERS_WITH_TAGS + "WHERE dup_groups.id = ? ORDER BY files.id", (group_id,)
+    ).fetchall()
+    return group, members
+
+
+def record_operations(
+    conn: sqlite3.Connection,
+    plan_id: str,
+    operations: Iterable[tuple[str, str, Path, Path | None, str]],
+) -> None:
+    """Record (op_id, op_type, path, new_path, status) rows for ``plan_id``."""
+    conn.executemany(
         """
         INSERT INTO operations (op_id, plan_id, op_type, path, new_path, status)
         VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(op_id) DO UPDATE SET
+            plan_id=excluded.plan_id, op_type=excluded.op_type, path=excluded.path,
+            new_path=excluded.new_path, status=excluded.status
         """,
-        (op_id, plan_id, op_type, str(path), str(new_path) if new_path else None, status),
+        (
+            (op_id, plan_id, op_type, str(path), str(new_path) if new_path else None, status)
+            for op_id, op_type, path, new_path, status in operations
+        ),
+    )
+
+
+def register_journal(
+    conn: sqlite3.Connection,
+    journal_id: str,
+    plan_id: str,
+    created_at: str,
+    path: Path,
+    entries: int = 0,
+    byte_offset: int = 0,
+    status: str = "incomplete",
+) -> None:
+    conn.execute(
+        """
+        INSERT INTO journals
+            (journal_id, plan_id, created_at, path, entries, byte_offset, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(journal_id) DO UPDATE SET
+            plan_id=excluded.plan_id, created_at=excluded.created_at, path=excluded.path,
+            entries=excluded.entries, byte_offset=excluded.byte_offset, status=excluded.status
+        """,
+        (journal_id, plan_id, created_at, str(path), entries, byte_offset, status),
     )
 
 
+def update_journal(
+    conn: sqlite3.Connection,
+    journal_id: str,
+    entries: int | None = None,
+    byte_offset: int | None = None,
+    status: str | None = None,
+) -> None:
+    conn.execute(
+        """
+        UPDATE journals SET
+            entries = COALESCE(?, entries),
+            byte_offset = COALESCE(?, byte_offset),
+            status = COALESCE(?, status)
+        WHERE journal_id = ?
+        """,
+        (entries, byte_offset, status, journal_id),
+    )
+
+
+def get_journal(conn: sqlite3.Connection, journal_id: str) -> sqlite3.Row | None:
+    return conn.execute("SELECT * FROM journals WHERE journal_id = ?", (journal_id,)).fetchone()
+
+
+def latest_journal(
+    conn: sqlite3.Connection,
+    plan_id: str | None = None,
+    status: str | None = None,
+    exclude: Iterable[str] = (),
+) -> sqlite3.Row | None:
+    rows = list_journals(conn, plan_id=plan_id, status=status, exclude=exclude, limit=1)
+    return rows[0] if rows else None
+
+
+def list_journals(
+    conn: sqlite3.Connection,
+    plan_id: str | None = None,
+    status: str | None = None,
+    limit: int | None = None,
+    exclude: Iterable[str] = (),
+) -> list[sqlite3.Row]:
+    """Registered journals, newest first; ``exclude`` drops journals in those statuses."""
+    clauses, params = [], []
+    if plan_id is not None:
+        clauses.append("plan_id = ?")
+        params.append(plan_id)
+    if status is not None:
+        clauses.append("status = ?")
+        params.append(status)
+    exclude = list(exclude)
+    if exclude:
+        clauses.append(f"status NOT IN ({', '.join('?' for _ in exclude)})")
+        params.extend(exclude)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    params.append(-1 if limit is None else limit)
+    return conn.execute(
+        f"SELECT * FROM journals {where} ORDER BY created_at DESC, rowid DESC LIMIT ?", params
+    ).fetchall()
+
+
+def count_journals(conn: sqlite3.Connection) -> int:
+    return int(conn.execute("SELECT COUNT(*) FROM journals").fetchone()[0])
+
+
 def upsert_group_override(
     conn: sqlite3.Connection,
     group_hash: str,
@@ -182,6 +1210,20 @@ def upsert_group_override(
     )
 
 
+def move_group_overrides(
+    conn: sqlite3.Connection, old_hash: str, new_hash: str, paths: list[str]
+) -> None:
+    """Re-key overrides for ``paths`` to another group; overrides already there win."""
+    for start in range(0, len(paths), 500):
+        chunk = paths[start : start + 500]
+        placeholders = ", ".join("?" for _ in chunk)
+        conn.execute(
+            "UPDATE OR IGNORE group_overrides SET group_hash = ? "
+            f"WHERE group_hash = ? AND path IN ({placeholders})",
+            [new_hash, old_hash, *chunk],
+        )
+
+
 def delete_group_override(conn: sqlite3.Connection, group_hash: str, path: Path) -> None:
     conn.execute(
         "DELETE FROM group_overrides WHERE group_hash = ? AND path = ?",
@@ -195,3 +1237,26 @@ def get_group_overrides(conn: sqlite3.Connection, group_hash: str) -> dict[str,
         (group_hash,),
     ).fetchall()
     return {row["path"]: row for row in rows}
+
+
+def get_overrides_by_group(
+    conn: sqlite3.Connection, group_hashes: Iterable[str] | None = None
+) -> dict[str, dict[str, sqlite3.Row]]:
+    """Overrides keyed by group hash, then path; every group when ``group_hashes`` is None."""
+    if group_hashes is None:
+        rows: Iterable[sqlite3.Row] = conn.execute("SELECT * FROM group_overrides")
+    else:
+        rows = _iter_overrides_in(conn, sorted(set(group_hashes)))
+    overrides: dict[str, dict[str, sqlite3.Row]] = {}
+    for row in rows:
+        overrides.setdefault(row["group_hash"], {})[row["path"]] = row
+    return overrides
+
+
+def _iter_overrides_in(conn: sqlite3.Connection, keys: list[str]) -> Iterator[sqlite3.Row]:
+    for start in range(0, len(keys), 500):
+        chunk = keys[start : start + 500]
+        placeholders = ", ".join("?" for _ in chunk)
+        yield from conn.execute(
+            f"SELECT * FROM group_overrides WHERE group_hash IN ({placeholders})", chunk
+        )
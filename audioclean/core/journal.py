@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from audioclean.core import db as db_layer
+from audioclean.core.models import Journal, Operation
+
+JOURNAL_FORMAT = "audioclean-journal"
+JOURNAL_SUFFIX = ".jsonl"
+
+
+@dataclass
+class JournalState:
+    header: dict[str, Any]
+    entries: list[dict[str, Any]] = field(default_factory=list)
+    pending: dict[str, dict[str, Any]] = field(default_factory=dict)
+    complete: bool = False
+    # Op ids with a result, and how many results there are; kept even without ``entries``.
+    done: set[str] = field(default_factory=set)
+    count: int = 0
+
+    @property
+    def journal_id(self) -> str:
+        return str(self.header["journal_id"])
+
+    @property
+    def plan_id(self) -> str:
+        return str(self.header.get("plan_id", ""))
+
+
+class JournalWriter:
+    """Append-only apply journal: one header line, then intent and result lines.
+
+    Nothing is synced per line. Callers write the intents for a batch of
+    operations and call ``sync`` before touching any file, so a batch costs one
+    fsync and every change on disk has a durable intent ahead of it.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.stats = {"records": 0, "fsyncs": 0}
+        _drop_partial_line(path)
+        self._handle = path.open("a", encoding="utf-8")
+        # End of the last synced record.
+        self.offset = self._handle.tell()
+
+    @staticmethod
+    def create(journal_dir: Path, journal: Journal, dry_run: bool = False) -> "JournalWriter":
+        journal_dir.mkdir(parents=True, exist_ok=True)
+        writer = JournalWriter(journal_dir / f"{journal.journal_id}{JOURNAL_SUFFIX}")
+        writer._write(
+            {
+                "type": "header",
+                "format": JOURNAL_FORMAT,
+                "journal_id": journal.journal_id,
+                "created_at": journal.created_at,
+                "plan_id": journal.plan_id,
+                "dry_run": dry_run,
+            }
+        )
+        writer.sync()
+        return writer
+
+    def intent(
+        self, op: Operation, target: Path | None, source: dict[str, Any] | None = None
+    ) -> None:
+        """Record an operation before it runs; ``source`` identifies the file at ``op.path``."""
+        self._write(
+            {
+                "type": "intent",
+                "op_id": op.op_id,
+                "op_type": op.op_type,
+                "path": str(op.path),
+                "new_path": str(target) if target else None,
+                "source": source,
+            }
+        )
+
+    def result(self, entry: dict[str, Any]) -> None:
+        self._write({"type": "result", **entry})
+
+    def complete(self) -> None:
+        self._write({"type": "complete"})
+        self.sync()
+
+    def sync(self) -> None:
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+        self.stats["fsyncs"] += 1
+        self.offset = self._handle.tell()
+
+    def close(self) -> None:
+        if not self._handle.closed:
+            self._handle.flush()
+            self._handle.close()
+
+    def __enter__(self) -> "JournalWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.close()
+        return False
+
+    def _write(self, record: dict[str, Any]) -> None:
+        self._handle.write(json.dumps(record) + "\n")
+        self.stats["records"] += 1
+
+
+def read_journal(path: Path, keep_entries: bool = True) -> JournalState:
+    """Load a journal; JSON documents written before the append-only format are accepted.
+
+    Without ``keep_entries`` the file is streamed and only the finished op ids
+    and open intents are kept, so memory does not grow with the journal.
+    """
+    if path.suffix != JOURNAL_SUFFIX:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+        entries = list(payload.pop("entries", []))
+        return JournalState(
+            header=payload,
+            entries=entries if keep_entries else [],
+            complete=True,
+            done={str(entry.get("op_id")) for entry in entries},
+            count=len(entries),
+        )
+
+    state: JournalState | None = None
+    with path.open("r", encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Only the final line can be torn by a crash; it never reached fsync.
+                break
+            kind = record.pop("type", None)
+            if kind == "header":
+                state = JournalState(header=record)
+            elif state is None:
+                break
+            elif kind == "intent":
+                state.pending[record["op_id"]] = record
+            elif kind == "result":
+                state.pending.pop(record.get("op_id"), None)
+                state.done.add(str(record.get("op_id")))
+                state.count += 1
+                if keep_entries:
+                    state.entries.append(record)
+            elif kind == "complete":
+                state.complete = True
+    if state is None:
+        raise ValueError(f"journal has no header: {path}")
+    return state
+
+
+def journal_paths(journal_dir: Path) -> list[Path]:
+    """Journal files, newest first."""
+    if not journal_dir.exists():
+        return []
+    paths = [*journal_dir.glob(f"*{JOURNAL_SUFFIX}"), *journal_dir.glob("*.json")]
+    return sorted(paths, key=lambda p: p.stat().st_mtime, reverse=True)
+
+
+def index_journals(conn, journal_dir: Path) -> int:
+    """Register journal files in ``journal_dir`` that the journals table does not know yet.
+
+    Journals are registered by apply as they are written, so this only has work
+    to do for journals written before the table existed.
+    """
+    added = 0
+    # Oldest first, so rowid breaks created_at ties the same way live registration does.
+    for path in reversed(journal_paths(journal_dir)):
+        if db_layer.get_journal(conn, path.stem) is not None:
+            continue
+        try:
+            state = read_journal(path, keep_entries=False)
+        except ValueError:
+            continue
+        db_layer.register_journal(
+            conn,
+            state.journal_id,
+            state.plan_id,
+            str(state.header.get("created_at", "")),
+            path,
+            entries=state.count,
+            byte_offset=path.stat().st_size,
+            status=_index_status(state),
+        )
+        added += 1
+    conn.commit()
+    return added
+
+
+def _index_status(state: JournalState) -> str:
+    if not state.complete:
+        return "incomplete"
+    return "dry-run" if state.header.get("dry_run") else "complete"
+
+
+def ensure_journal_index(conn, journal_dir: Path) -> None:
+    # Journals from before the index are picked up the first time it is used.
+    if db_layer.count_journals(conn) == 0:
+        index_journals(conn, journal_dir)
+
+
+def _drop_partial_line(path: Path, chunk: int = 65536) -> None:
+    if not path.exists():
+        return
+    with path.open("rb+") as handle:
+        end = handle.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            step = min(chunk, position)
+            position -= step
+            handle.seek(position)
+            data = handle.read(step)
+            if position + step == end and data.endswith(b"\n"):
+                return
+            newline = data.rfind(b"\n")
+            if newline >= 0:
+                handle.truncate(position + newline + 1)
+                return
+        handle.truncate(0)
@@ -1,12 +1,15 @@
 from __future__ import annotations
 
 import json
+import os
 from dataclasses import dataclass, field, asdict
 from datetime import datetime
 from pathlib import Path
-from typing import Any
+from typing import Any, BinaryIO, Iterable, Iterator, TextIO
 from uuid import uuid4
 
+from audioclean.utils.tags import TagInfo
+
 
 def _now_iso() -> str:
     return datetime.utcnow().isoformat(timespec="seconds") + "Z"
@@ -19,6 +22,8 @@ class FileRecord:
     size: int
     mtime: float
     blake3: str | None = None
+    sample_hash: str | None = None
+    hash_level: str = "size"
     codec: str | None = None
     container: str | None = None
     duration: float | None = None
@@ -26,12 +31,16 @@ class FileRecord:
     sample_rate: int | None = None
     channels: int | None = None
     has_art: bool = False
+    audio_size: int | None = None
+    audio_hash: str | None = None
+    tags: TagInfo | None = None
 
 
 @dataclass
 class Fingerprint:
     file_id: int
     chromaprint: str
+    raw: bytes | None = None
 
 
 @dataclass
@@ -79,18 +88,22 @@ class Operation:
         )
 
 
+PLAN_FORMAT = "audioclean-plan"
+PLAN_FORMAT_VERSION = 1
+
+
 @dataclass
 class Plan:
     plan_id: str
     created_at: str
     root_paths: list[Path]
-    operations: list[Operation]
+    operations: Iterable[Operation]
     metadata: dict[str, Any] = field(default_factory=dict)
 
     @staticmethod
     def create(
         root_paths: list[Path],
-        operations: list[Operation],
+        operations: Iterable[Operation],
         metadata: dict[str, Any] | None = None,
     ) -> "Plan":
         return Plan(
@@ -124,6 +137,88 @@ class Plan:
             metadata=dict(data.get("metadata", {})),
         )
 
+    def write_ndjson(self, handle: TextIO) -> int:
+        """Write a header line, one line per operation and a trailer; returns the op count.
+
+        Operations are consumed as they are written, so a lazy plan never holds
+        more than one in memory. Metadata goes in the trailer because planning
+        fills in the summary while the operations are produced.
+        """
+        header = {
+            "type": "header",
+            "format": PLAN_FORMAT,
+            "version": PLAN_FORMAT_VERSION,
+            "plan_id": self.plan_id,
+            "created_at": self.created_at,
+            "root_paths": [str(p) for p in self.root_paths],
+        }
+        handle.write(json.dumps(header) + "\n")
+        count = 0
+        for op in self.operations:
+            handle.write(json.dumps(operation_to_dict(op)) + "\n")
+            count += 1
+        trailer = {"type": "trailer", "operations": count, "metadata": self.metadata}
+        handle.write(json.dumps(trailer) + "\n")
+        return count
+
+    @staticmethod
+    def load(path: Path) -> "Plan":
+        """Read a plan file. NDJSON plans are streamed; older JSON documents are loaded whole."""
+        with path.open("rb") as handle:
+            first = handle.readline()
+            try:
+                header = json.loads(first)
+            except ValueError:
+                header = None
+            if not isinstance(header, dict) or header.get("format") != PLAN_FORMAT:
+                handle.seek(0)
+                return Plan.from_dict(json.load(handle))
+            if int(header.get("version", 0)) > PLAN_FORMAT_VERSION:
+                raise ValueError(f"unsupported plan format version {header['version']}")
+            trailer = json.loads(_read_last_line(handle) or b"null")
+        if not isinstance(trailer, dict) or trailer.get("type") != "trailer":
+            raise ValueError("plan is truncated: trailer line is missing")
+        return Plan(
+            plan_id=header["plan_id"],
+            created_at=header["created_at"],
+            root_paths=[Path(p) for p in header.get("root_paths", [])],
+            operations=_PlanFileOperations(path, len(first), int(trailer["operations"])),
+            metadata=dict(trailer.get("metadata", {})),
+        )
+
+
+class _PlanFileOperations:
+    """Re-iterable view of the operation lines of an NDJSON plan."""
+
+    def __init__(self, path: Path, offset: int, count: int) -> None:
+        self.path = path
+        self.offset = offset
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[Operation]:
+        with self.path.open("rb") as handle:
+            handle.seek(self.offset)
+            for _ in range(self.count):
+                yield operation_from_dict(json.loads(handle.readline()))
+
+
+def _read_last_line(handle: BinaryIO, chunk: int = 65536) -> bytes:
+    end = handle.seek(0, os.SEEK_END)
+    position = end
+    tail = b""
+    while position > 0:
+        step = min(chunk, position)
+        position -= step
+        handle.seek(position)
+        tail = handle.read(step) + tail
+        lines = tail.rstrip(b"\n").rsplit(b"\n", 1)
+        if len(lines) == 2 or position == 0:
+            return lines[-1]
+    return b""
+
 
 @dataclass
 class Journal:
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from pathlib import Path
+
+from audioclean.core import db as db_layer
+from audioclean.core.models import FileRecord
+
+
+_STOP = object()
+
+
+class ScanWriter:
+    """Drain scan results on a dedicated thread and write them in committed batches.
+
+    A batch is committed once it holds ``batch_size`` results or its oldest result
+    is ``commit_interval`` seconds old, so an interrupted scan loses at most one batch.
+    """
+
+    def __init__(
+        self,
+        conn,
+        batch_size: int = 500,
+        commit_interval: float = 2.0,
+        queue_size: int | None = None,
+    ) -> None:
+        self.conn = conn
+        self.batch_size = max(1, batch_size)
+        self.commit_interval = max(0.0, commit_interval)
+        self.stats = {
+            "rows_written": 0,
+            "batches_committed": 0,
+            "max_uncommitted_rows": 0,
+            "write_seconds": 0.0,
+        }
+        self.error: BaseException | None = None
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size or self.batch_size * 4)
+        self._thread = threading.Thread(target=self._run, name="audioclean-db-writer", daemon=True)
+
+    def __enter__(self) -> "ScanWriter":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.close()
+        return False
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def put(self, record: FileRecord) -> None:
+        self._put(record)
+
+    def put_fingerprint(self, path: Path, raw: bytes) -> None:
+        self._put((path, raw))
+
+    def flush(self) -> None:
+        """Commit everything put so far; the connection is free until the next put."""
+        flushed = threading.Event()
+        self._put(flushed)
+        while not flushed.wait(0.5) and self._thread.is_alive():
+            continue
+        if self.error is not None:
+            raise RuntimeError("scan DB writer failed") from self.error
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._put(_STOP)
+            self._thread.join()
+        if self.error is not None:
+            raise RuntimeError("scan DB writer failed") from self.error
+
+    def _put(self, item: object) -> None:
+        while self._thread.is_alive():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        if self.error is not None:
+            raise RuntimeError("scan DB writer failed") from self.error
+
+    def _run(self) -> None:
+        batch: list[FileRecord | tuple[Path, bytes]] = []
+        opened_at = 0.0
+        try:
+            while True:
+                timeout = None
+                if batch:
+                    timeout = max(0.0, opened_at + self.commit_interval - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+                if item is _STOP:
+                    break
+                if isinstance(item, threading.Event):
+                    self._flush(batch)
+                    batch = []
+                    item.set()
+                    continue
+                if item is not None:
+                    if not batch:
+                        opened_at = time.monotonic()
+                    batch.append(item)
+                due = batch and time.monotonic() - opened_at >= self.commit_interval
+                if len(batch) >= self.batch_size or due:
+                    self._flush(batch)
+                    batch = []
+            self._flush(batch)
+        except BaseException as exc:
+            self.error = exc
+            self.conn.rollback()
+
+    def _flush(self, batch: list[FileRecord | tuple[Path, bytes]]) -> None:
+        if not batch:
+            return
+        started = time.perf_counter()
+        records = [item for item in batch if isinstance(item, FileRecord)]
+        fingerprints = [item for item in batch if not isinstance(item, FileRecord)]
+        if records:
+            db_layer.write_scan_batch(self.conn, records)
+        if fingerprints:
+            db_layer.write_fingerprints(self.conn, fingerprints)
+        self.conn.commit()
+        self.stats["write_seconds"] += time.perf_counter() - started
+        self.stats["rows_written"] += len(batch)
+        self.stats["batches_committed"] += 1
+        self.stats["max_uncommitted_rows"] = max(self.stats["max_uncommitted_rows"], len(batch))
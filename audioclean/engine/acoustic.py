@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from itertools import groupby
+
+from audioclean.core import db as db_layer
+from audioclean.utils.chromaprint import MatchSettings, bit_error_rate, block_keys
+
+# Chromaprint emits one sub-fingerprint every 4096 / 3 samples at 11025 Hz.
+FRAME_SECONDS = 4096 / 3 / 11025
+_MAX_KEY_POSTINGS = 256
+
+
+def find_acoustic_groups(
+    conn, settings: MatchSettings | None = None
+) -> list[tuple[list[int], float]]:
+    """Group files whose raw fingerprints match within ``settings.max_bit_error``.
+
+    Files are walked in duration order one bucket of ``duration_tolerance``
+    seconds at a time, so only the current and next bucket are held in memory.
+    Candidate pairs must share ``min_shared_keys`` block keys before their bit
+    error rate is measured, and matches are merged with union-find. Returns
+    (file_ids, similarity) per group, where similarity is one minus the worst
+    bit error rate that joined the group.
+    """
+    settings = settings or MatchSettings()
+    tolerance = max(settings.duration_tolerance, 0.001)
+    entries = db_layer.get_fingerprint_durations(conn, FRAME_SECONDS)
+    bucket_of = [int(duration // tolerance) for _, duration in entries]
+    buckets = [
+        (bucket, list(members))
+        for bucket, members in groupby(range(len(entries)), key=bucket_of.__getitem__)
+    ]
+
+    parent = list(range(len(entries)))
+    worst = [0.0] * len(entries)
+
+    def find(node: int) -> int:
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    raws: dict[int, memoryview] = {}
+    keys: dict[int, set[int]] = {}
+
+    def load(positions: list[int]) -> None:
+        missing = [position for position in positions if position not in raws]
+        loaded = db_layer.get_raw_fingerprints(conn, [entries[position][0] for position in missing])
+        for position in missing:
+            raw = loaded.get(entries[position][0])
+            raws[position] = raw if raw is not None else memoryview(b"").cast("I")
+            keys[position] = block_keys(raws[position], settings.block_frames)
+
+    for idx, (bucket, members) in enumerate(buckets):
+        following: list[int] = []
+        if idx + 1 < len(buckets) and buckets[idx + 1][0] == bucket + 1:
+            following = buckets[idx + 1][1]
+        load(members + following)
+
+        postings: dict[int, list[int]] = defaultdict(list)
+        for position in members + following:
+            for key in keys[position]:
+                postings[key].append(position)
+
+        for position in members:
+            shared: Counter[int] = Counter()
+            for key in keys[position]:
+                posting = postings[key]
+                if len(posting) > _MAX_KEY_POSTINGS:
+                    continue
+                shared.update(other for other in posting if other > position)
+            duration = entries[position][1]
+            for other, count in shared.items():
+                if count < settings.min_shared_keys:
+                    continue
+                if abs(entries[other][1] - duration) > settings.duration_tolerance:
+                    continue
+                root, other_root = find(position), find(other)
+                if root == other_root:
+                    continue
+                ber = bit_error_rate(raws[position], raws[other], settings.max_offset)
+                if ber <= settings.max_bit_error:
+                    parent[other_root] = root
+                    worst[root] = max(worst[root], worst[other_root], ber)
+
+        for position in members:
+            raws.pop(position, None)
+            keys.pop(position, None)
+
+    groups: dict[int, list[int]] = defaultdict(list)
+    for position, (file_id, _) in enumerate(entries):
+        groups[find(position)].append(file_id)
+    return [
+        (sorted(file_ids), round(1.0 - worst[root], 4))
+        for root, file_ids in groups.items()
+        if len(file_ids) > 1
+    ]
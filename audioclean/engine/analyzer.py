@@ -4,17 +4,19 @@ from pathlib import Path
 
 from audioclean.core import db as db_layer
 from audioclean.core.reporter import Reporter
+from audioclean.engine.duplicates import refresh_duplicate_groups
 
 
-def analyze(conn, reporter: Reporter, root: Path | None = None) -> dict[str, int]:
-    files = list(db_layer.iter_files(conn))
-    duplicates = db_layer.get_duplicates_by_hash(conn)
-    missing_art = [row for row in files if not row["has_art"]]
+def analyze(
+    conn, reporter: Reporter, root: Path | None = None, prefer_lossless: bool = True
+) -> dict[str, int]:
+    refresh_duplicate_groups(conn, prefer_lossless)
+    duplicate_groups, duplicate_files = db_layer.count_dup_groups(conn, "hash")
     report = {
-        "files_total": len(files),
-        "duplicate_groups": len(duplicates),
-        "duplicate_files": sum(len(group) for group in duplicates),
-        "missing_art": len(missing_art),
+        "files_total": db_layer.count_files(conn),
+        "duplicate_groups": duplicate_groups,
+        "duplicate_files": duplicate_files,
+        "missing_art": db_layer.count_files_missing_art(conn),
     }
     if reporter.json_output:
         reporter.emit_json(report)
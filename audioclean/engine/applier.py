@@ -1,12 +1,28 @@
 from __future__ import annotations
 
-import json
-import shutil
+import os
+import time
+from itertools import islice
 from pathlib import Path
+from typing import Any
 
 from audioclean.core import db as db_layer
+from audioclean.core.journal import (
+    JournalWriter,
+    ensure_journal_index,
+    index_journals,
+    read_journal,
+)
 from audioclean.core.models import Journal, Operation, Plan
 from audioclean.core.reporter import Reporter
+from audioclean.engine.executor import DeviceExecutor
+from audioclean.utils.fs import format_bytes, move_file, same_device
+from audioclean.utils.hash import HashSettings, blake3_with
+
+_FILE_CHANGES = {"move", "rename", "delete"}
+_RESTORABLE = {"moved", "quarantined", "interrupted"}
+# Journal statuses that "undo last" passes over.
+_NOT_UNDOABLE = ("undone", "dry-run")
 
 
 def apply_plan(
@@ -18,89 +34,269 @@ def apply_plan(
     force_low_confidence: bool = False,
     quarantine_enabled: bool = False,
     quarantine_dir: Path | None = None,
-) -> Journal:
-    journal_dir.mkdir(parents=True, exist_ok=True)
-    journal = Journal.create(plan.plan_id)
+    resume: bool = False,
+    fsync_batch: int = 64,
+    jobs: int = 4,
+) -> dict[str, Any]:
+    """Apply ``plan``, journaling each file change before it is made, and return a summary.
+
+    Operations are taken ``fsync_batch`` at a time: the batch's intents are
+    written and synced, then the files are changed and the results appended.
+    Each batch runs on DeviceExecutor with ``jobs`` workers per device pair.
+    Files are renamed where possible; quarantine uses hard links so an
+    existing quarantined file is never replaced; that delete is journaled as
+    a conflict and the rest of the plan goes on. Every entry records the
+    strategy used and the bytes copied. An operation that raises is journaled
+    as failed before the error is re-raised.
+    With ``resume`` the newest unfinished journal for the plan is continued;
+    finished operations are skipped and interrupted ones are checked against
+    the filesystem before being retried: a target only counts as done when it
+    is the file the intent recorded. Journals are registered in the
+    journals table as they are written.
+
+    Results go to the journal only; memory holds counters and, when resuming,
+    the ids of finished operations, so a plan is applied in constant memory.
+    """
+    pending: dict[str, dict] = {}
+    done: set[str] = set()
+    entries = 0
+    if resume:
+        ensure_journal_index(conn, journal_dir)
+        row = db_layer.latest_journal(conn, plan_id=plan.plan_id, status="incomplete")
+        if row is None or not Path(row["path"]).exists():
+            raise FileNotFoundError(f"No unfinished journal for plan {plan.plan_id}")
+        journal_path = Path(row["path"])
+        state = read_journal(journal_path, keep_entries=False)
+        journal = Journal(
+            journal_id=state.journal_id,
+            created_at=str(state.header.get("created_at", "")),
+            plan_id=plan.plan_id,
+            entries=[],
+        )
+        pending, done, entries = state.pending, state.done, state.count
+        writer = JournalWriter(journal_path)
+        reporter.info(f"Resuming journal {journal.journal_id} after {entries} entries")
+    else:
+        journal = Journal.create(plan.plan_id)
+        writer = JournalWriter.create(journal_dir, journal, dry_run=dry_run)
+        db_layer.register_journal(
+            conn,
+            journal.journal_id,
+            plan.plan_id,
+            journal.created_at,
+            writer.path,
+            byte_offset=writer.offset,
+        )
+        conn.commit()
     thresholds = plan.metadata.get("thresholds", {})
     auto_accept_above = float(thresholds.get("auto_accept_above", 0.0))
-    for op in plan.operations:
-        if not force_low_confidence:
-            if op.status == "review":
-                result = _skip_result(op, "review-required")
-                journal.entries.append(result)
-                continue
-            if op.confidence is not None and op.confidence < auto_accept_above:
-                result = _skip_result(op, "skipped-low-confidence")
-                journal.entries.append(result)
-                continue
-        result = _apply_operation(
-            op,
-            dry_run,
-            quarantine_enabled=quarantine_enabled,
-            quarantine_dir=quarantine_dir,
-            root_paths=plan.root_paths,
+
+    failures: dict[str, dict] = {}
+
+    def apply_one(op: Operation, target: Path | None) -> dict:
+        try:
+            if op.op_id in pending:
+                recovered = _recover_operation(op, pending[op.op_id])
+                if recovered is not None:
+                    return recovered
+            return _apply_operation(op, dry_run, target)
+        except Exception as exc:
+            failures[op.op_id] = {**_base_entry(op), "status": "failed", "error": str(exc)}
+            raise
+
+    copied = {"files": 0, "bytes": 0}
+    statuses: dict[str, int] = {}
+    strategies: dict[str, int] = {}
+    operations = iter(plan.operations)
+    with writer, DeviceExecutor(jobs) as executor:
+        while chunk := list(islice(operations, max(1, fsync_batch))):
+            batch: list[Operation] = []
+            targets: list[Path | None] = []
+            for op in chunk:
+                if op.op_id in done:
+                    continue
+                skip = None if force_low_confidence else _skip_status(op, auto_accept_above)
+                if skip:
+                    writer.result(_skip_result(op, skip))
+                    statuses[skip] = statuses.get(skip, 0) + 1
+                    entries += 1
+                    continue
+                target = _target_for(op, quarantine_enabled, quarantine_dir, plan.root_paths)
+                batch.append(op)
+                targets.append(target)
+                if not dry_run and op.op_id not in pending and op.op_type in _FILE_CHANGES:
+                    writer.intent(op, target, _identity(op.path))
+            writer.sync()
+            if not dry_run:
+                for target in targets:
+                    if target is not None:
+                        executor.ensure_dir(target.parent)
+
+            results, error = executor.run(batch, targets, apply_one)
+            recorded = []
+            for op, target, result in zip(batch, targets, results):
+                if result is None:
+                    result = failures.pop(op.op_id, None)
+                if result is None:
+                    continue
+                pending.pop(op.op_id, None)
+                writer.result(result)
+                entries += 1
+                statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+                if "strategy" in result:
+                    strategies[result["strategy"]] = strategies.get(result["strategy"], 0) + 1
+                recorded.append((op.op_id, op.op_type, op.path, op.new_path, result["status"]))
+                if result.get("strategy") == "copy":
+                    if not copied["files"]:
+                        reporter.info(
+                            f"Warning: {op.path} -> {target} crosses filesystems; "
+                            "files are copied, not renamed"
+                        )
+                    copied["files"] += 1
+                    copied["bytes"] += result.get("bytes_copied", 0)
+            db_layer.record_operations(conn, plan.plan_id, recorded)
+            db_layer.update_journal(
+                conn, journal.journal_id, entries=entries, byte_offset=writer.offset
+            )
+            conn.commit()
+            if error is not None:
+                writer.sync()
+                raise error
+        writer.complete()
+        db_layer.update_journal(
+            conn,
+            journal.journal_id,
+            entries=entries,
+            byte_offset=writer.offset,
+            status="dry-run" if dry_run else "complete",
         )
-        journal.entries.append(result)
-        db_layer.record_operation(
-            conn, plan.plan_id, op.op_id, op.op_type, op.path, op.new_path, result["status"]
+        conn.commit()
+    if statuses.get("conflict"):
+        reporter.info(
+            f"Not quarantined, already in quarantine: {statuses['conflict']} files left in place"
         )
-    conn.commit()
-    journal_path = journal_dir / f"{journal.journal_id}.json"
-    journal_path.write_text(json.dumps(journal.to_dict(), indent=2), encoding="utf-8")
-    reporter.info(f"Journal: {journal_path}")
-    return journal
+    if copied["files"]:
+        verb = "Would copy" if dry_run else "Copied"
+        reporter.info(
+            f"{verb} {copied['files']} files across filesystems ({format_bytes(copied['bytes'])})"
+        )
+    reporter.info(f"Journal: {writer.path}")
+    return {
+        "journal_id": journal.journal_id,
+        "journal_path": str(writer.path),
+        "entries": entries,
+        "statuses": statuses,
+        "strategies": strategies,
+        "files_copied": copied["files"],
+        "bytes_copied": copied["bytes"],
+    }
 
 
-def _apply_operation(
+def _target_for(
     op: Operation,
-    dry_run: bool,
     quarantine_enabled: bool,
     quarantine_dir: Path | None,
     root_paths: list[Path],
-) -> dict[str, str]:
-    base = {
-        "op_id": op.op_id,
-        "op_type": op.op_type,
-        "path": str(op.path),
-        "reason": op.reason,
-        "sources": op.sources,
-        "confidence": op.confidence,
-        "metadata": op.metadata,
-    }
+) -> Path | None:
+    if op.op_type in {"move", "rename"}:
+        return op.new_path
+    if op.op_type == "delete" and quarantine_enabled and quarantine_dir:
+        return _quarantine_target(op.path, quarantine_dir, root_paths)
+    return None
+
+
+def _skip_status(op: Operation, auto_accept_above: float) -> str | None:
+    if op.status == "review":
+        return "review-required"
+    if op.confidence is not None and op.confidence < auto_accept_above:
+        return "skipped-low-confidence"
+    return None
+
+
+def _recover_operation(op: Operation, intent: dict) -> dict | None:
+    # The intent was synced but no result was: the change may or may not have happened.
+    if op.path.exists():
+        return None
+    target = intent.get("new_path")
+    if target and _is_source(Path(target), intent.get("source")):
+        status = "quarantined" if op.op_type == "delete" else "moved"
+        return {**_base_entry(op), "status": status, "new_path": target}
+    if target and Path(target).exists():
+        return {**_base_entry(op), "status": "conflict", "new_path": target}
+    if op.op_type == "delete" and not target:
+        return {**_base_entry(op), "status": "deleted"}
+    return {**_base_entry(op), "status": "missing"}
+
+
+def _identity(path: Path) -> dict[str, Any] | None:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return {"dev": stat.st_dev, "ino": stat.st_ino, "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def _is_source(path: Path, source: dict[str, Any] | None) -> bool:
+    """Whether ``path`` is the journaled file: its inode, or a cross-device copy of it."""
+    if not source:
+        return False
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return False
+    if stat.st_dev == source["dev"]:
+        return stat.st_ino == source["ino"]
+    return (stat.st_size, stat.st_mtime) == (source["size"], source["mtime"])
+
+
+def _apply_operation(op: Operation, dry_run: bool, target: Path | None) -> dict:
+    # Target directories are created by the caller before the batch runs.
+    base = _base_entry(op)
     if dry_run:
-        return {**base, "status": "dry-run"}
+        return {**base, "status": "dry-run", **_predict_transfer(op, target)}
 
     if op.op_type in {"move", "rename"}:
-        if op.new_path is None:
+        if target is None:
             return {**base, "status": "skipped"}
-        op.new_path.parent.mkdir(parents=True, exist_ok=True)
-        shutil.move(str(op.path), str(op.new_path))
+        strategy, copied = move_file(op.path, target)
         return {
             **base,
             "status": "moved",
-            "new_path": str(op.new_path),
+            "new_path": str(target),
+            "strategy": strategy,
+            "bytes_copied": copied,
         }
     if op.op_type == "delete":
-        if quarantine_enabled and quarantine_dir:
-            destination = _quarantine_target(op.path, quarantine_dir, root_paths)
-            if dry_run:
-                return {**base, "status": "quarantined", "new_path": str(destination)}
-            destination.parent.mkdir(parents=True, exist_ok=True)
-            shutil.move(str(op.path), str(destination))
-            return {**base, "status": "quarantined", "new_path": str(destination)}
-        if dry_run:
-            return {**base, "status": "dry-run"}
+        if target is not None:
+            try:
+                strategy, copied = move_file(op.path, target, keep_existing=True)
+            except FileExistsError:
+                return {**base, "status": "conflict", "new_path": str(target)}
+            return {
+                **base,
+                "status": "quarantined",
+                "new_path": str(target),
+                "strategy": strategy,
+                "bytes_copied": copied,
+            }
         op.path.unlink(missing_ok=True)
-        return {**base, "status": "deleted"}
+        return {**base, "status": "deleted", "strategy": "unlink", "bytes_copied": 0}
     return {**base, "status": "noop"}
 
 
-def _skip_result(op: Operation, status: str) -> dict[str, str]:
+def _predict_transfer(op: Operation, target: Path | None) -> dict:
+    if target is None or op.op_type not in _FILE_CHANGES or not op.path.exists():
+        return {}
+    if not same_device(op.path, target):
+        return {"strategy": "copy", "bytes_copied": op.path.stat().st_size}
+    return {"strategy": "link" if op.op_type == "delete" else "rename", "bytes_copied": 0}
+
+
+def _base_entry(op: Operation) -> dict:
     return {
         "op_id": op.op_id,
         "op_type": op.op_type,
         "path": str(op.path),
-        "status": status,
         "reason": op.reason,
         "sources": op.sources,
         "confidence": op.confidence,
@@ -108,36 +304,155 @@ def _skip_result(op: Operation, status: str) -> dict[str, str]:
     }
 
 
-def undo(journal_id: str, reporter: Reporter, journal_dir: Path, dry_run: bool = False) -> None:
-    journal_path = _resolve_journal_path(journal_id, journal_dir)
-    payload = json.loads(journal_path.read_text(encoding="utf-8"))
-    entries = list(reversed(payload.get("entries", [])))
-    for entry in entries:
+def _skip_result(op: Operation, status: str) -> dict[str, str]:
+    return {**_base_entry(op), "status": status}
+
+
+def undo(
+    journal_id: str,
+    conn,
+    reporter: Reporter,
+    journal_dir: Path,
+    dry_run: bool = False,
+    jobs: int = 4,
+    verify: bool = False,
+    hashing: HashSettings | None = None,
+) -> dict[str, int | float]:
+    """Restore the files changed by a journal and return restore counts.
+
+    Entries that share a path are restored one after another, newest first;
+    independent entries run on DeviceExecutor with ``jobs`` workers per
+    device pair. A restore never replaces a file that is back at the original
+    path, and an interrupted operation is only restored when the file at its
+    target is the one its intent recorded. With ``verify`` each restored file
+    is checked against the BLAKE3 stored by scan; a file renamed back with the
+    size and mtime scan saw is taken as unchanged and not re-hashed.
+    """
+    row = _resolve_journal(conn, journal_id, journal_dir)
+    state = read_journal(Path(row["path"]))
+    # Interrupted operations have an intent but no result; restore them if they got as far
+    # as their target. Failed operations left their file in place and are skipped.
+    interrupted = [{**intent, "status": "interrupted"} for intent in state.pending.values()]
+    restores: list[Operation] = []
+    for entry in reversed(state.entries + interrupted):
         status = entry.get("status")
-        path = Path(entry.get("path", ""))
-        new_path = Path(entry.get("new_path")) if entry.get("new_path") else None
-        if status in {"moved", "quarantined"} and new_path and path.exists() is False:
-            if dry_run:
-                reporter.info(f"Would restore {new_path} -> {path}")
-            else:
-                new_path.parent.mkdir(parents=True, exist_ok=True)
-                shutil.move(str(new_path), str(path))
+        if status in _RESTORABLE and entry.get("new_path"):
+            restores.append(
+                Operation(
+                    op_id=str(entry.get("op_id", "")),
+                    op_type=status,
+                    path=Path(entry["new_path"]),
+                    new_path=Path(entry.get("path", "")),
+                    metadata={"source": entry.get("source")},
+                )
+            )
         elif status == "deleted":
-            reporter.info(f"Cannot undo delete for {path}")
+            reporter.info(f"Cannot undo delete for {entry.get('path')}")
+
+    summary: dict[str, int | float] = {"restored": 0, "conflict": 0, "missing": 0}
+    if dry_run:
+        for op in restores:
+            if not op.new_path.exists():
+                reporter.info(f"Would restore {op.path} -> {op.new_path}")
+        reporter.info("Undo complete")
+        return summary
+
+    known = {}
+    if verify:
+        known = db_layer.get_file_signatures(
+            conn, [path for op in restores for path in (op.path, op.new_path)]
+        )
+        summary.update({"verified": 0, "mismatch": 0, "unverified": 0, "rehashed": 0})
+    hashing = hashing or HashSettings()
+
+    def restore(op: Operation, target: Path | None) -> dict:
+        if op.op_type == "interrupted" and not _is_source(op.path, op.metadata["source"]):
+            if not op.path.exists():
+                return {"status": "missing", "path": str(op.path)}
+            return {"status": "conflict", "path": str(op.path), "reason": "target was replaced"}
+        try:
+            strategy, copied = move_file(op.path, target, keep_existing=True)
+        except FileExistsError:
+            return {"status": "conflict", "path": str(target)}
+        except FileNotFoundError:
+            return {"status": "missing", "path": str(target)}
+        result = {"status": "restored", "path": str(target), "bytes_copied": copied}
+        if verify:
+            signature = known.get(str(target)) or known.get(str(op.path))
+            result.update(_verify_restored(target, strategy, signature, hashing))
+        return result
+
+    started = time.perf_counter()
+    with DeviceExecutor(jobs) as executor:
+        targets = [op.new_path for op in restores]
+        for target in targets:
+            executor.ensure_dir(target.parent)
+        results, error = executor.run(restores, targets, restore)
+    elapsed = time.perf_counter() - started
+
+    copied = 0
+    for result in results:
+        if result is None:
+            continue
+        summary[result["status"]] += 1
+        copied += result.get("bytes_copied", 0)
+        if "verified" in result:
+            summary[result["verified"]] += 1
+            summary["rehashed"] += result["rehashed"]
+            if result["verified"] == "mismatch":
+                reporter.info(f"Restored file does not match its scanned BLAKE3: {result['path']}")
+        if result["status"] == "conflict":
+            reason = result.get("reason", "original path is occupied")
+            reporter.info(f"Not restored, {reason}: {result['path']}")
+    summary["seconds"] = round(elapsed, 3)
+    summary["bytes_copied"] = copied
+    if error is not None:
+        raise error
+
+    db_layer.update_journal(conn, state.journal_id, status="undone")
+    conn.commit()
+    rate = summary["restored"] / elapsed if elapsed else 0.0
+    reporter.info(
+        f"Restored {summary['restored']} files in {elapsed:.2f}s ({rate:,.0f} files/s, "
+        f"{format_bytes(copied)} copied)"
+    )
+    if verify:
+        reporter.info(
+            f"Verified {summary['verified']} ({summary['rehashed']} re-hashed), "
+            f"{summary['mismatch']} mismatched, {summary['unverified']} without a scan hash"
+        )
     reporter.info("Undo complete")
+    return summary
+
+
+def _verify_restored(
+    path: Path, strategy: str, signature, hashing: HashSettings
+) -> dict[str, str | int]:
+    if signature is None or not signature["blake3"]:
+        return {"verified": "unverified", "rehashed": 0}
+    stat = path.stat()
+    unchanged = (stat.st_size, stat.st_mtime) == (signature["size"], signature["mtime"])
+    if unchanged and strategy in {"rename", "link"}:
+        return {"verified": "verified", "rehashed": 0}
+    matches = blake3_with(path, hashing) == signature["blake3"]
+    return {"verified": "verified" if matches else "mismatch", "rehashed": 1}
 
 
-def _resolve_journal_path(journal_id: str, journal_dir: Path) -> Path:
-    journal_dir.mkdir(parents=True, exist_ok=True)
+def _resolve_journal(conn, journal_id: str, journal_dir: Path):
+    ensure_journal_index(conn, journal_dir)
     if journal_id == "last":
-        journals = sorted(journal_dir.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
-        if not journals:
-            raise FileNotFoundError("No journal files found")
-        return journals[0]
-    candidate = journal_dir / f"{journal_id}.json"
-    if not candidate.exists():
-        raise FileNotFoundError(f"Journal not found: {journal_id}")
-    return candidate
+        row = db_layer.latest_journal(conn, exclude=_NOT_UNDOABLE)
+        if row is None:
+            raise FileNotFoundError("No journal left to undo")
+    else:
+        row = db_layer.get_journal(conn, journal_id)
+        if row is None and index_journals(conn, journal_dir):
+            row = db_layer.get_journal(conn, journal_id)
+        if row is None:
+            raise FileNotFoundError(f"Journal not found: {journal_id}")
+    if not Path(row["path"]).exists():
+        raise FileNotFoundError(f"Journal file is missing: {row['path']}")
+    return row
 
 
 def _quarantine_target(path: Path, quarantine_dir: Path, root_paths: list[Path]) -> Path:
@@ -2,9 +2,11 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Iterator
 
 from audioclean.core import db as db_layer
+from audioclean.engine.acoustic import find_acoustic_groups
+from audioclean.utils.chromaprint import MatchSettings
 from audioclean.utils.tags import read_tags
 
 
@@ -15,35 +17,160 @@ class DuplicateGroup:
     members: list
     canonical: object
     total_bytes: int
-
-
-def list_duplicate_groups(conn, prefer_lossless: bool, sort_by: str = "hash") -> list[DuplicateGroup]:
-    groups = db_layer.get_duplicates_by_hash(conn)
-    ordered = sorted(groups, key=lambda rows: (rows[0]["blake3"] or ""))
-    wrapped: list[DuplicateGroup] = []
-    for idx, rows in enumerate(ordered, start=1):
-        group_hash = rows[0]["blake3"] or ""
-        canonical = _select_canonical(rows, prefer_lossless)
-        total_bytes = sum(int(row["size"]) for row in rows)
-        wrapped.append(
-            DuplicateGroup(
-                group_id=idx,
-                group_hash=group_hash,
-                members=list(rows),
-                canonical=canonical,
-                total_bytes=total_bytes,
-            )
-        )
+    reason: str = "hash_exact"
+    similarity: float = 1.0
+
+
+def list_duplicate_groups(
+    conn,
+    prefer_lossless: bool,
+    sort_by: str = "hash",
+    match: str = "hash",
+    acoustic: MatchSettings | None = None,
+    refresh: bool = False,
+) -> list[DuplicateGroup]:
+    """Stored duplicate groups; scan keeps them current, ``refresh`` re-groups first."""
+    if refresh:
+        refresh_duplicate_groups(conn, prefer_lossless, match, acoustic)
+    wrapped = []
+    for row, members in db_layer.iter_dup_groups(conn, match):
+        group = _wrap_group(row, members)
+        if group is not None:
+            wrapped.append(group)
     if sort_by == "size":
         wrapped.sort(key=lambda group: (len(group.members), group.total_bytes), reverse=True)
     return wrapped
 
 
-def group_by_id(groups: Iterable[DuplicateGroup], group_id: int) -> DuplicateGroup | None:
-    for group in groups:
-        if group.group_id == group_id:
-            return group
-    return None
+def get_duplicate_group(
+    conn,
+    group_id: int,
+    prefer_lossless: bool,
+    match: str = "hash",
+    acoustic: MatchSettings | None = None,
+    refresh: bool = False,
+) -> DuplicateGroup | None:
+    if refresh:
+        refresh_duplicate_groups(conn, prefer_lossless, match, acoustic)
+    found = db_layer.get_dup_group(conn, match, group_id)
+    if found is None:
+        return None
+    return _wrap_group(*found)
+
+
+def refresh_duplicate_groups(
+    conn,
+    prefer_lossless: bool,
+    match: str = "hash",
+    acoustic: MatchSettings | None = None,
+) -> int:
+    """Re-group the hashes marked dirty since the last refresh; returns groups touched.
+
+    Hash and audio groups are refreshed one dirty hash at a time, and rebuilt
+    from the streamed duplicate query when first built or when prefer_lossless
+    changes. Fingerprint groups can merge across files, so any change rebuilds
+    them all; each is keyed on its lowest file id, and overrides set on the
+    groups its members were in before move over to it. Stored ids are kept for
+    every group whose hash is unchanged.
+    """
+    acoustic = acoustic or MatchSettings()
+    params = f"prefer_lossless={prefer_lossless}"
+    if match == "fingerprint":
+        params += f";{acoustic!r};key=anchor"
+    dirty = set(db_layer.get_dup_dirty(conn, match))
+    rebuild = db_layer.get_dup_params(conn, match) != params
+    if not dirty and not rebuild:
+        return 0
+
+    if rebuild or match == "fingerprint":
+        if match == "fingerprint":
+            found = _fingerprint_groups(conn, acoustic)
+        elif match == "audio":
+            found = _hash_groups(db_layer.iter_duplicates_by_audio_hash(conn), "audio_hash")
+        else:
+            found = _hash_groups(db_layer.iter_duplicates_by_hash(conn), "blake3")
+        previous = db_layer.get_dup_member_groups(conn, match) if match == "fingerprint" else {}
+        current = set()
+        for group_hash, rows, similarity in found:
+            _store_group(conn, match, group_hash, rows, similarity, prefer_lossless)
+            current.add(group_hash)
+            earlier = {previous.get(int(row["id"])) for row in rows} - {None, group_hash}
+            for old_hash in sorted(earlier):
+                db_layer.move_group_overrides(
+                    conn, old_hash, group_hash, [row["path"] for row in rows]
+                )
+        stored = db_layer.get_dup_group_hashes(conn, match)
+        db_layer.delete_dup_groups(
+            conn, match, [group_hash for group_hash in stored if group_hash not in current]
+        )
+        regrouped = len(current)
+    else:
+        column = db_layer.DUP_COLUMNS[match]
+        for group_hash in sorted(dirty):
+            rows = db_layer.get_files_by_hash(conn, column, group_hash)
+            if len(rows) > 1:
+                _store_group(conn, match, group_hash, rows, 1.0, prefer_lossless)
+            else:
+                db_layer.delete_dup_groups(conn, match, [group_hash])
+        regrouped = len(dirty)
+    db_layer.clear_dup_dirty(conn, match, dirty)
+    db_layer.set_dup_params(conn, match, params)
+    conn.commit()
+    return regrouped
+
+
+def _hash_groups(groups: Iterable[list], column: str) -> Iterator[tuple[str, list, float]]:
+    for rows in groups:
+        yield rows[0][column], rows, 1.0
+
+
+def _store_group(
+    conn, match: str, group_hash: str, rows, similarity: float, prefer_lossless: bool
+) -> None:
+    canonical = _select_canonical(rows, prefer_lossless)
+    db_layer.upsert_dup_group(
+        conn,
+        match,
+        group_hash,
+        _group_reason(rows),
+        int(canonical["id"]),
+        similarity,
+        sum(int(row["size"]) for row in rows),
+        [int(row["id"]) for row in rows],
+    )
+
+
+def _wrap_group(row, members) -> DuplicateGroup | None:
+    canonical = next((member for member in members if member["id"] == row["canonical_id"]), None)
+    if len(members) < 2 or canonical is None:
+        return None
+    return DuplicateGroup(
+        group_id=int(row["id"]),
+        group_hash=row["group_hash"],
+        members=list(members),
+        canonical=canonical,
+        total_bytes=int(row["total_bytes"]),
+        reason=row["reason"],
+        similarity=float(row["similarity"]),
+    )
+
+
+def _fingerprint_groups(conn, settings: MatchSettings | None) -> list[tuple[str, list, float]]:
+    matched = find_acoustic_groups(conn, settings)
+    rows = db_layer.get_files_with_tags_by_ids(
+        conn, [file_id for file_ids, _ in matched for file_id in file_ids]
+    )
+    found = []
+    for file_ids, similarity in matched:
+        members = sorted(
+            (rows[file_id] for file_id in file_ids if file_id in rows),
+            key=lambda row: row["path"],
+        )
+        if len(members) < 2:
+            continue
+        # The lowest file id anchors the group: file ids survive moves, rescans and new members.
+        found.append((f"fp-{min(int(row['id']) for row in members)}", members, similarity))
+    return found
 
 
 def group_stats(groups: Iterable[DuplicateGroup]) -> dict[str, float]:
@@ -61,7 +188,7 @@ def group_stats(groups: Iterable[DuplicateGroup]) -> dict[str, float]:
 
 def format_canonical_label(row) -> str:
     path = Path(row["path"])
-    tags = read_tags(path)
+    tags = db_layer.tags_from_row(row) or read_tags(path)
     artist = tags.artist or tags.album_artist or "Unknown Artist"
     title = tags.title or path.stem
     codec = path.suffix.lstrip(".").upper()
@@ -95,6 +222,14 @@ def resolve_group_actions(group: DuplicateGroup, overrides: dict[str, object], d
     return actions
 
 
+def _group_reason(rows) -> str:
+    for column, reason in (("blake3", "hash_exact"), ("audio_hash", "audio_hash_exact")):
+        values = {row[column] for row in rows}
+        if len(values) == 1 and None not in values:
+            return reason
+    return "fingerprint_match"
+
+
 def _select_canonical(rows, prefer_lossless: bool):
     sorted_group = sorted(rows, key=lambda row: _dedupe_rank(row, prefer_lossless))
     return sorted_group[0]
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Sequence
+
+from audioclean.core.models import Operation
+
+
+class DeviceExecutor:
+    """Run file operations on one thread pool per pair of filesystem devices.
+
+    Operations in a batch that share a source or target path are chained and
+    run one after another in plan order. Independent chains run concurrently on
+    the pool of their (source device, target device) pair, ``jobs`` at a time,
+    so a slow mount on either side does not hold up the others.
+    """
+
+    def __init__(self, jobs: int = 4) -> None:
+        self.jobs = max(1, jobs)
+        self._pools: dict[tuple[int, int], ThreadPoolExecutor] = {}
+        self._devices: dict[Path, int] = {}
+        self._made_dirs: set[Path] = set()
+
+    def __enter__(self) -> "DeviceExecutor":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.close()
+        return False
+
+    def close(self) -> None:
+        for pool in self._pools.values():
+            pool.shutdown(wait=True)
+        self._pools.clear()
+
+    def ensure_dir(self, path: Path) -> None:
+        """Create ``path`` once per apply, from the calling thread."""
+        if path in self._made_dirs:
+            return
+        path.mkdir(parents=True, exist_ok=True)
+        self._made_dirs.add(path)
+
+    def device(self, path: Path) -> int:
+        parent = path.parent
+        device = self._devices.get(parent)
+        if device is None:
+            probe = parent
+            while not probe.exists() and probe != probe.parent:
+                probe = probe.parent
+            device = os.stat(probe).st_dev
+            self._devices[parent] = device
+        return device
+
+    def run(
+        self,
+        batch: Sequence[Operation],
+        targets: Sequence[Path | None],
+        apply_one: Callable[[Operation, Path | None], dict],
+    ) -> tuple[list[dict | None], BaseException | None]:
+        """Apply ``batch`` and return its results in batch order.
+
+        If an operation raises, the rest of its chain is not run, the other
+        chains still finish, and the first error is returned next to the
+        results that did complete.
+        """
+        results: list[dict | None] = [None] * len(batch)
+        chains = _chain_dependent(batch, targets)
+        if self.jobs == 1 or len(chains) == 1:
+            futures = [_completed(_run_chains, batch, targets, chains, apply_one, results)]
+        else:
+            # Chains are dealt round-robin into at most ``jobs`` lanes per device pair.
+            lanes: dict[tuple[int, int], list[list[list[int]]]] = {}
+            for chain in chains:
+                device_lanes = lanes.setdefault(self._devices_of(batch, targets, chain[0]), [])
+                if len(device_lanes) < self.jobs:
+                    device_lanes.append([chain])
+                else:
+                    device_lanes[sum(map(len, device_lanes)) % self.jobs].append(chain)
+            futures = [
+                self._pool(devices).submit(_run_chains, batch, targets, lane, apply_one, results)
+                for devices, device_lanes in lanes.items()
+                for lane in device_lanes
+            ]
+        error = None
+        for future in futures:
+            exc = future.exception()
+            if exc is not None and error is None:
+                error = exc
+        return results, error
+
+    def _devices_of(
+        self, batch: Sequence[Operation], targets: Sequence[Path | None], idx: int
+    ) -> tuple[int, int]:
+        src = self.device(batch[idx].path)
+        target = targets[idx]
+        return src, src if target is None else self.device(target)
+
+    def _pool(self, devices: tuple[int, int]) -> ThreadPoolExecutor:
+        pool = self._pools.get(devices)
+        if pool is None:
+            pool = ThreadPoolExecutor(
+                max_workers=self.jobs,
+                thread_name_prefix=f"audioclean-apply-{devices[0]}-{devices[1]}",
+            )
+            self._pools[devices] = pool
+        return pool
+
+
+def _run_chains(
+    batch: Sequence[Operation],
+    targets: Sequence[Path | None],
+    chains: list[list[int]],
+    apply_one: Callable[[Operation, Path | None], dict],
+    results: list[dict | None],
+) -> None:
+    error = None
+    for chain in chains:
+        try:
+            for idx in chain:
+                results[idx] = apply_one(batch[idx], targets[idx])
+        except Exception as exc:
+            error = error or exc
+    if error is not None:
+        raise error
+
+
+def _completed(function: Callable, *args) -> Future:
+    future: Future = Future()
+    try:
+        future.set_result(function(*args))
+    except Exception as exc:
+        future.set_exception(exc)
+    return future
+
+
+def _chain_dependent(
+    batch: Sequence[Operation], targets: Sequence[Path | None]
+) -> list[list[int]]:
+    """Group batch positions that touch a common path, each group in plan order."""
+    parent = list(range(len(batch)))
+
+    def find(node: int) -> int:
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    owners: dict[Path, int] = {}
+    for idx, (op, target) in enumerate(zip(batch, targets)):
+        for path in (op.path, target):
+            if path is None:
+                continue
+            other = owners.setdefault(path, idx)
+            if other != idx:
+                parent[find(idx)] = find(other)
+    chains: dict[int, list[int]] = {}
+    for idx in range(len(batch)):
+        chains.setdefault(find(idx), []).append(idx)
+    return sorted(chains.values(), key=lambda chain: chain[0])
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+from audioclean.core import db as db_layer
+from audioclean.core.reporter import Reporter
+from audioclean.utils.hash import HashSettings, blake3_sample, blake3_with, sample_covers_file
+from audioclean.utils.payload import blake3_audio, file_audio_payload_size
+
+
+def resolve_hashes(
+    conn,
+    jobs: int,
+    reporter: Reporter,
+    batch_size: int = 500,
+    settings: HashSettings | None = None,
+) -> dict[str, int]:
+    """Content-hash only files that can collide.
+
+    Files with a unique size keep hash_level 'size'. Same-size files get a
+    head/middle/tail sample hash, and only sample collisions are fully hashed,
+    so every blake3 stored is exact. The tag-independent audio hash is computed
+    the same way, for files sharing a container and audio payload size.
+    """
+    settings = settings or HashSettings()
+    stats = {
+        "sample_hashes_computed": 0,
+        "hashes_computed": 0,
+        "audio_hashes_computed": 0,
+        "hash_errors": 0,
+    }
+
+    rows = db_layer.get_sample_hash_candidates(conn)
+    with reporter.progress("Sample hashing same-size files") as progress:
+        task = progress.add_task("sample hash", total=len(rows))
+
+        def _sample(row) -> tuple[int, str, str | None]:
+            size = int(row["size"])
+            digest = blake3_sample(Path(row["path"]), size)
+            return int(row["id"]), digest, digest if sample_covers_file(size) else None
+
+        for items, errors in _hash_rows(rows, _sample, jobs, batch_size, progress, task):
+            db_layer.set_sample_hashes(conn, items)
+            conn.commit()
+            stats["sample_hashes_computed"] += len(items)
+            stats["hashes_computed"] += sum(1 for item in items if item[2])
+            stats["hash_errors"] += errors
+
+    rows = db_layer.get_full_hash_candidates(conn)
+    with reporter.progress("Hashing duplicate candidates") as progress:
+        task = progress.add_task("blake3", total=len(rows))
+
+        def _full(row) -> tuple[int, str]:
+            return int(row["id"]), blake3_with(Path(row["path"]), settings)
+
+        for items, errors in _hash_rows(rows, _full, jobs, batch_size, progress, task):
+            db_layer.set_full_hashes(conn, items)
+            conn.commit()
+            stats["hashes_computed"] += len(items)
+            stats["hash_errors"] += errors
+
+    rows = db_layer.get_audio_size_backfill(conn)
+    with reporter.progress("Measuring audio payloads") as progress:
+        task = progress.add_task("audio size", total=len(rows))
+
+        def _audio_size(row) -> tuple[int, int]:
+            return int(row["id"]), file_audio_payload_size(Path(row["path"]))
+
+        for items, errors in _hash_rows(rows, _audio_size, jobs, batch_size, progress, task):
+            db_layer.set_audio_sizes(conn, items)
+            conn.commit()
+            stats["hash_errors"] += errors
+
+    rows = db_layer.get_audio_hash_candidates(conn)
+    with reporter.progress("Hashing audio payloads") as progress:
+        task = progress.add_task("audio hash", total=len(rows))
+
+        def _audio(row) -> tuple[int, str | None]:
+            return int(row["id"]), blake3_audio(Path(row["path"]), settings.chunk_size)
+
+        for items, errors in _hash_rows(rows, _audio, jobs, batch_size, progress, task):
+            db_layer.set_audio_hashes(conn, items)
+            conn.commit()
+            stats["audio_hashes_computed"] += len(items)
+            stats["hash_errors"] += errors
+    return stats
+
+
+def _hash_rows(rows: list, func: Callable, jobs: int, batch_size: int, progress, task):
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        for start in range(0, len(rows), batch_size):
+            chunk = rows[start : start + batch_size]
+            futures = [executor.submit(func, row) for row in chunk]
+            items = []
+            errors = 0
+            for future in futures:
+                try:
+                    items.append(future.result())
+                except OSError:
+                    errors += 1
+                progress.advance(task, 1)
+            yield items, errors
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+
+from audioclean.core import db as db_layer
+from audioclean.utils.chromaprint import MatchSettings, bit_error_rate, blob_to_raw, index_keys
+from audioclean.utils.fpcalc import FingerprintError, FpcalcSettings, fingerprint_many
+
+
+@dataclass(frozen=True)
+class LookupCandidate:
+    file_id: int
+    path: Path
+    similarity: float
+    shared_segments: int
+    duration: float | None
+    matched: bool
+
+    def to_dict(self) -> dict[str, object]:
+        return {
+            "file_id": self.file_id,
+            "path": str(self.path),
+            "similarity": self.similarity,
+            "shared_segments": self.shared_segments,
+            "duration": self.duration,
+            "matched": self.matched,
+        }
+
+
+def lookup_file(
+    conn,
+    path: Path,
+    fingerprinting: FpcalcSettings | None = None,
+    matching: MatchSettings | None = None,
+    limit: int = 10,
+) -> list[LookupCandidate]:
+    """Rank library files by how closely they match ``path`` acoustically.
+
+    Candidates come from the fingerprint_index segments maintained by scan, so
+    only the best ``limit * 5`` files sharing at least ``min_shared_keys``
+    segments are compared in full.
+    """
+    matching = matching or MatchSettings()
+    result = next(fingerprint_many([path], fingerprinting or FpcalcSettings(jobs=1)))
+    if not result.raw:
+        raise FingerprintError(result.error or "fpcalc did not return a fingerprint")
+    raw = blob_to_raw(result.raw)
+
+    shared = {
+        file_id: count
+        for file_id, count in db_layer.lookup_segments(conn, index_keys(raw), max(1, limit) * 5)
+        if count >= matching.min_shared_keys
+    }
+    raws = db_layer.get_raw_fingerprints(conn, shared)
+    rows = db_layer.get_files_with_tags_by_ids(conn, raws)
+    candidates = []
+    for file_id, other in raws.items():
+        row = rows.get(file_id)
+        if row is None:
+            continue
+        ber = bit_error_rate(raw, other, matching.max_offset)
+        candidates.append(
+            LookupCandidate(
+                file_id=file_id,
+                path=Path(row["path"]),
+                similarity=round(1.0 - ber, 4),
+                shared_segments=shared[file_id],
+                duration=row["duration"],
+                matched=ber <= matching.max_bit_error,
+            )
+        )
+    candidates.sort(key=lambda candidate: (-candidate.similarity, str(candidate.path)))
+    return candidates[:limit]
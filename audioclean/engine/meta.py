@@ -9,6 +9,7 @@ from pathlib import Path
 from typing import Iterable
 
 from audioclean.engine.applier import apply_plan
+from audioclean.core import db as db_layer
 from audioclean.core.config import Config
 from audioclean.core.db import connect
 from audioclean.core.models import Operation, Plan
@@ -82,11 +83,11 @@ def meta_fix(
     dry_run: bool,
     force: bool,
 ) -> None:
-    files = discover_files(paths)
+    roots = list(paths)
+    conn = connect(config.db_path)
     ops: list[Operation] = []
     skipped = 0
-    for path in files:
-        tags = read_tags(path)
+    for path, tags in _iter_tagged_files(roots, conn, config):
         parsed = _parse_filename(format_str, path.stem, config)
         expected = _render_filename(format_str, tags, parsed, config)
         if not expected:
@@ -129,11 +130,10 @@ def meta_fix(
         return
 
     plan = Plan.create(
-        root_paths=list(paths),
+        root_paths=roots,
         operations=ops,
         metadata={"summary": summary, "thresholds": {"auto_accept_above": config.confidence_threshold}},
     )
-    conn = connect(config.db_path)
     apply_plan(
         plan,
         conn,
@@ -143,13 +143,19 @@ def meta_fix(
         force_low_confidence=force,
         quarantine_enabled=config.quarantine_enabled,
         quarantine_dir=config.quarantine_dir,
+        fsync_batch=config.journal_fsync_batch,
+        jobs=config.apply_jobs,
     )
 
 
 def collect_meta_issues(paths: Iterable[Path], format_str: str, config: Config) -> list[MetaIssue]:
     issues: list[MetaIssue] = []
-    for path in discover_files(paths):
-        tags = read_tags(path)
+    conn = connect(config.db_path)
+    try:
+        tagged = list(_iter_tagged_files(list(paths), conn, config))
+    finally:
+        conn.close()
+    for path, tags in tagged:
         parsed = _parse_filename(format_str, path.stem, config)
         expected = _render_filename(format_str, tags, parsed, config)
         mismatch_items = []
@@ -178,6 +184,23 @@ def collect_meta_issues(paths: Iterable[Path], format_str: str, config: Config)
     return issues
 
 
+def _iter_tagged_files(
+    roots: list[Path], conn, config: Config
+) -> Iterable[tuple[Path, TagInfo]]:
+    cached = db_layer.load_tags_index(conn, roots)
+    for path in discover_files(roots, workers=config.scan_walk_jobs):
+        entry = cached.get(str(path))
+        if entry is not None:
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if (entry[0], entry[1]) == (stat.st_size, stat.st_mtime):
+                yield path, entry[2]
+                continue
+        yield path, read_tags(path)
+
+
 def _parse_filename(format_str: str, filename: str, config: Config) -> dict[str, str]:
     tokens = _tokens(format_str)
     if not tokens:
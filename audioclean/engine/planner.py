@@ -1,16 +1,25 @@
 from __future__ import annotations
 
 from pathlib import Path
+from typing import Iterable, Iterator
 
 from audioclean.core import db as db_layer
-from audioclean.core.config import Config
+from audioclean.core.config import Config, match_settings
 from audioclean.engine.duplicates import list_duplicate_groups, resolve_group_actions
 from audioclean.core.models import Operation, Plan
 from audioclean.core.reporter import Reporter
+from audioclean.utils.chromaprint import MatchSettings
 from audioclean.utils.fs import render_layout
 from audioclean.utils.tags import read_tags
 
 
+_DEDUPE_REASONS = {
+    "hash_exact": ("Exact duplicate by blake3", "hash"),
+    "audio_hash_exact": ("Identical audio stream, tags differ", "audio_hash"),
+    "fingerprint_match": ("Same recording by acoustic fingerprint", "fingerprint"),
+}
+
+
 def plan(
     root_paths: list[Path],
     conn,
@@ -23,8 +32,14 @@ def plan(
     confidence_threshold: float,
     auto_accept_above: float,
     require_review_below: float,
+    lazy: bool = False,
 ) -> Plan:
-    operations: list[Operation] = []
+    """Build a plan for ``root_paths``.
+
+    With ``lazy`` the plan's operations are a generator that does the planning
+    as it is consumed, and metadata["summary"] is only complete once it has
+    been exhausted.
+    """
     summary = {
         "duplicate_groups": 0,
         "delete": 0,
@@ -35,11 +50,53 @@ def plan(
         "art_fetches": 0,
         "estimated_reclaim_bytes": 0,
     }
+    operations: Iterable[Operation] = _iter_operations(
+        root_paths,
+        conn,
+        reporter,
+        config,
+        dedupe_mode,
+        dupe_dir,
+        layout,
+        art_only,
+        confidence_threshold,
+        auto_accept_above,
+        require_review_below,
+        summary,
+    )
+    if not lazy:
+        operations = list(operations)
+    return Plan.create(
+        root_paths=root_paths,
+        operations=operations,
+        metadata={
+            "summary": summary,
+            "thresholds": {
+                "auto_accept_above": auto_accept_above,
+                "require_review_below": require_review_below,
+            },
+        },
+    )
+
 
+def _iter_operations(
+    root_paths: list[Path],
+    conn,
+    reporter: Reporter,
+    config: Config,
+    dedupe_mode: str,
+    dupe_dir: Path | None,
+    layout: str | None,
+    art_only: bool,
+    confidence_threshold: float,
+    auto_accept_above: float,
+    require_review_below: float,
+    summary: dict[str, int],
+) -> Iterator[Operation]:
     reporter.info("Planning actions...")
     if not art_only and dedupe_mode != "off":
         reporter.info("Stage: grouping duplicates")
-        dedupe_ops, dedupe_summary = _plan_dedupe(
+        yield from _plan_dedupe(
             conn,
             dedupe_mode,
             dupe_dir,
@@ -47,13 +104,14 @@ def plan(
             reporter,
             auto_accept_above,
             require_review_below,
+            summary,
+            match=config.duplicate_match,
+            acoustic=match_settings(config),
         )
-        operations.extend(dedupe_ops)
-        _merge_summary(summary, dedupe_summary)
 
     if not art_only and layout:
         reporter.info("Stage: determining rename targets")
-        rename_ops, rename_summary = _plan_rename(
+        yield from _plan_rename(
             conn,
             root_paths,
             layout,
@@ -61,31 +119,12 @@ def plan(
             auto_accept_above,
             require_review_below,
             reporter,
+            summary,
         )
-        operations.extend(rename_ops)
-        _merge_summary(summary, rename_summary)
 
     reporter.info("Stage: planning metadata writes")
     reporter.info("Stage: planning album art fetches")
-    art_ops, art_summary = _plan_art(conn, reporter, auto_accept_above, require_review_below)
-    if art_only:
-        operations = art_ops
-    else:
-        operations.extend(art_ops)
-    _merge_summary(summary, art_summary)
-
-    plan_obj = Plan.create(
-        root_paths=root_paths,
-        operations=operations,
-        metadata={
-            "summary": summary,
-            "thresholds": {
-                "auto_accept_above": auto_accept_above,
-                "require_review_below": require_review_below,
-            },
-        },
-    )
-    return plan_obj
+    yield from _plan_art(conn, reporter, auto_accept_above, require_review_below, summary)
 
 
 def _plan_dedupe(
@@ -96,26 +135,23 @@ def _plan_dedupe(
     reporter: Reporter,
     auto_accept_above: float,
     require_review_below: float,
-) -> tuple[list[Operation], dict[str, int]]:
-    operations: list[Operation] = []
-    summary = {
-        "duplicate_groups": 0,
-        "delete": 0,
-        "move": 0,
-        "rename": 0,
-        "review": 0,
-        "estimated_reclaim_bytes": 0,
-    }
-    groups = list_duplicate_groups(conn, prefer_lossless)
-    summary["duplicate_groups"] = len(groups)
+    summary: dict[str, int],
+    match: str = "hash",
+    acoustic: MatchSettings | None = None,
+) -> Iterator[Operation]:
+    groups = list_duplicate_groups(
+        conn, prefer_lossless, match=match, acoustic=acoustic, refresh=True
+    )
+    summary["duplicate_groups"] = summary.get("duplicate_groups", 0) + len(groups)
 
     reporter.info("Stage: resolving canonical tracks")
     reporter.info("Stage: selecting best files")
     reporter.info("Stage: planning deletes and moves")
+    overrides_by_group = db_layer.get_overrides_by_group(conn)
     with reporter.progress("Analyzing duplicate groups") as progress:
         task = progress.add_task("duplicate groups", total=len(groups))
         for group in groups:
-            overrides = db_layer.get_group_overrides(conn, group.group_hash)
+            overrides = overrides_by_group.get(group.group_hash, {})
             actions = resolve_group_actions(group, overrides, dedupe_mode)
             for action in actions:
                 op = _dedupe_action_to_op(
@@ -127,10 +163,9 @@ def _plan_dedupe(
                 )
                 if op is None:
                     continue
-                operations.append(op)
                 _apply_summary_for_op(summary, op, action["row"])
+                yield op
             progress.advance(task, 1)
-    return operations, summary
 
 
 def _plan_rename(
@@ -141,21 +176,16 @@ def _plan_rename(
     auto_accept_above: float,
     require_review_below: float,
     reporter: Reporter,
-) -> tuple[list[Operation], dict[str, int]]:
-    operations: list[Operation] = []
-    summary = {
-        "rename": 0,
-        "review": 0,
-    }
-    rows = [row for row in db_layer.iter_files(conn)]
+    summary: dict[str, int],
+) -> Iterator[Operation]:
     with reporter.progress("Determining rename targets") as progress:
-        task = progress.add_task("rename targets", total=len(rows))
-        for row in rows:
+        task = progress.add_task("rename targets", total=db_layer.count_files(conn))
+        for row in db_layer.iter_files_with_tags(conn):
             path = Path(row["path"])
             if not _in_roots(path, root_paths):
                 progress.advance(task, 1)
                 continue
-            tags = read_tags(path)
+            tags = db_layer.tags_from_row(row) or read_tags(path)
             confidence = _estimate_tag_confidence(tags)
             new_relative = render_layout(layout, tags)
             root = _root_for_path(path, root_paths)
@@ -176,12 +206,11 @@ def _plan_rename(
                 status=status,
                 metadata={"group": None},
             )
-            operations.append(op)
-            summary["rename"] += 1
+            summary["rename"] = summary.get("rename", 0) + 1
             if status == "review":
-                summary["review"] += 1
+                summary["review"] = summary.get("review", 0) + 1
+            yield op
             progress.advance(task, 1)
-    return operations, summary
 
 
 def _plan_art(
@@ -189,13 +218,11 @@ def _plan_art(
     reporter: Reporter,
     auto_accept_above: float,
     require_review_below: float,
-) -> tuple[list[Operation], dict[str, int]]:
-    operations: list[Operation] = []
-    rows = [row for row in db_layer.iter_files(conn) if not row["has_art"]]
-    summary = {"art_fetches": 0, "review": 0}
+    summary: dict[str, int],
+) -> Iterator[Operation]:
     with reporter.progress("Planning album art fetches") as progress:
-        task = progress.add_task("album art", total=len(rows))
-        for row in rows:
+        task = progress.add_task("album art", total=db_layer.count_files_missing_art(conn))
+        for row in db_layer.iter_files_missing_art(conn):
             path = Path(row["path"])
             confidence = 0.6
             status = _status_for_confidence(confidence, auto_accept_above, require_review_below)
@@ -208,12 +235,11 @@ def _plan_art(
                 sources=["embedded_art"],
                 status=status,
             )
-            operations.append(op)
-            summary["art_fetches"] += 1
+            summary["art_fetches"] = summary.get("art_fetches", 0) + 1
             if status == "review":
-                summary["review"] += 1
+                summary["review"] = summary.get("review", 0) + 1
+            yield op
             progress.advance(task, 1)
-    return operations, summary
 
 
 def _estimate_tag_confidence(tags) -> float:
@@ -227,7 +253,9 @@ def _estimate_tag_confidence(tags) -> float:
     return min(score, 0.95)
 
 
-def _status_for_confidence(confidence: float, auto_accept_above: float, require_review_below: float) -> str:
+def _status_for_confidence(
+    confidence: float, auto_accept_above: float, require_review_below: float
+) -> str:
     if confidence < require_review_below:
         return "review"
     if confidence >= auto_accept_above:
@@ -252,15 +280,16 @@ def _dedupe_action_to_op(
     if action in {"SKIP"}:
         return None
 
-    reason = "Exact duplicate by blake3"
-    sources = ["hash"]
+    reason, source = _DEDUPE_REASONS.get(group.reason, _DEDUPE_REASONS["hash_exact"])
+    sources = [source]
     if action_entry.get("override"):
         sources.append("override")
-    confidence = 0.99
+    confidence = min(0.99, group.similarity)
     status = _status_for_confidence(confidence, auto_accept_above, require_review_below)
     metadata = {
         "group_id": group.group_id,
         "group_hash": group.group_hash,
+        "reason_code": group.reason,
         "action": action,
         "size_bytes": int(row["size"]),
     }
@@ -314,7 +343,7 @@ def _dedupe_action_to_op(
         )
 
     if action == "RENAME":
-        tags = read_tags(path)
+        tags = db_layer.tags_from_row(row) or read_tags(path)
         if not template:
             return Operation.create(
                 "review",
@@ -343,11 +372,6 @@ def _dedupe_action_to_op(
     return None
 
 
-def _merge_summary(target: dict[str, int], update: dict[str, int]) -> None:
-    for key, value in update.items():
-        target[key] = target.get(key, 0) + int(value)
-
-
 def _apply_summary_for_op(summary: dict[str, int], op: Operation, row) -> None:
     if op.op_type == "delete":
         summary["delete"] = summary.get("delete", 0) + 1
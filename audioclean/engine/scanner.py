@@ -1,116 +1,528 @@
 from __future__ import annotations
 
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from dataclasses import dataclass, field
+from itertools import islice
 from pathlib import Path
-from typing import Iterable
-
-from mutagen import File
+from typing import Iterable, Iterator
 
 from audioclean.core import db as db_layer
-from audioclean.core.models import FileRecord, Fingerprint
+from audioclean.core.config import SCAN_EXECUTORS
+from audioclean.core.models import FileRecord
 from audioclean.core.reporter import Reporter
-from audioclean.utils.fpcalc import FingerprintError, chromaprint
-from audioclean.utils.hash import blake3_file
-from audioclean.utils.tags import has_embedded_art
+from audioclean.core.writer import ScanWriter
+from audioclean.engine.duplicates import refresh_duplicate_groups
+from audioclean.engine.hashing import resolve_hashes
+from audioclean.utils.chromaprint import (
+    MatchSettings,
+    decode_fingerprint,
+    index_keys,
+    raw_to_blob,
+)
+from audioclean.utils.fpcalc import FpcalcSettings, fingerprint_many
+from audioclean.utils.hash import HashSettings, blake3_sample, blake3_with
+from audioclean.utils.payload import audio_payload_ranges, audio_payload_size
+from audioclean.utils.tags import read_media
 
 
 AUDIO_EXTENSIONS = {".mp3", ".flac", ".m4a", ".aac", ".ogg", ".opus"}
 
 
-def discover_files(paths: Iterable[Path]) -> list[Path]:
-    files: list[Path] = []
-    for root in paths:
-        if root.is_file() and root.suffix.lower() in AUDIO_EXTENSIONS:
-            files.append(root)
-            continue
-        if not root.is_dir():
-            continue
-        for dirpath, _, filenames in os.walk(root):
-            for filename in filenames:
-                path = Path(dirpath) / filename
-                if path.suffix.lower() in AUDIO_EXTENSIONS:
-                    files.append(path)
-    return files
+# A directory modified this close to the walk may change again within its mtime granularity.
+_RACY_NS = 2_000_000_000
+
+
+@dataclass
+class _Visit:
+    changed: list[tuple[str, os.stat_result]] = field(default_factory=list)
+    subdirs: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    missing: list[str] = field(default_factory=list)
+    record: tuple[int, int] | None = None
+    files: int = 0
+    errors: int = 0
+    listed: bool = False
+    readable: bool = True
+
+
+class LibraryWalk:
+    """Walk library roots on a pool of ``workers`` threads, yielding changed audio files.
+
+    Each directory is one task. Its mtime is compared with ``known_dirs``: an
+    unchanged directory is not listed, its files and subdirectories come from
+    ``known`` and ``known_dirs`` and are only stat-ed; anything else is listed
+    with ``os.scandir``. Files whose (size, mtime) differ from ``known`` are
+    yielded as their directory finishes. At most ``workers * 2`` directories
+    are in flight and none are started while the consumer holds a yielded
+    file, so a slow consumer holds the walk back.
+
+    Counters, the directory records to store and the ``known`` files that are
+    gone are filled in as the walk proceeds and are complete once it is
+    exhausted. A known file only counts as missing when the walk read the
+    directory it was in, or a parent that no longer leads to it; files under
+    unreadable directories, roots that are not there and roots that list as
+    empty (an unmounted mount point looks like that) are left alone.
+    """
+
+    def __init__(
+        self,
+        paths: Iterable[Path],
+        known: dict[str, tuple[int, float] | None] | None = None,
+        known_dirs: dict[str, tuple[int, int]] | None = None,
+        workers: int = 8,
+    ) -> None:
+        self.roots = list(paths)
+        self.known = known or {}
+        self.known_dirs = known_dirs or {}
+        self.workers = max(1, workers)
+        self.files = 0
+        self.unchanged = 0
+        self.errors = 0
+        self.dirs_listed = 0
+        self.dirs_skipped = 0
+        # Directories to record as (mtime_ns, entries), and recorded ones that are gone.
+        self.dirs: dict[str, tuple[int, int]] = {}
+        self.removed_dirs: list[str] = []
+        self.missing: list[str] = []
+        self.empty_roots: list[str] = []
+        self._visited: dict[str, bool] = {}
+        self._files_by_dir: dict[str, list[str]] = {}
+        for path in self.known:
+            self._files_by_dir.setdefault(_parent(path), []).append(path)
+        self._dirs_by_parent: dict[str, list[str]] = {}
+        for path in self.known_dirs:
+            self._dirs_by_parent.setdefault(_parent(path), []).append(path)
+        self._settled = time.time_ns() - _RACY_NS
+
+    def __iter__(self) -> Iterator[tuple[Path, os.stat_result]]:
+        directories: deque[str] = deque()
+        for root in self.roots:
+            if root.is_file() and root.suffix.lower() in AUDIO_EXTENSIONS:
+                try:
+                    stat = root.stat()
+                except OSError:
+                    self.errors += 1
+                    continue
+                self.files += 1
+                if self.known.get(str(root)) == (stat.st_size, stat.st_mtime):
+                    self.unchanged += 1
+                else:
+                    yield root, stat
+            elif root.is_dir():
+                directories.append(str(root))
+        directories_walked = list(directories)
+
+        with ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="audioclean-walk"
+        ) as pool:
+            running: dict[Future, str] = {}
+            while directories or running:
+                while directories and len(running) < self.workers * 2:
+                    directory = directories.popleft()
+                    running[pool.submit(self._visit, directory)] = directory
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    directory = running.pop(future)
+                    visit = future.result()
+                    directories.extend(visit.subdirs)
+                    self.files += visit.files
+                    self.unchanged += visit.files - len(visit.changed)
+                    self.errors += visit.errors
+                    self.removed_dirs.extend(visit.removed)
+                    self.missing.extend(visit.missing)
+                    self._visited[directory] = visit.readable
+                    if visit.record is not None:
+                        self.dirs[directory] = visit.record
+                    if visit.listed:
+                        self.dirs_listed += 1
+                    else:
+                        self.dirs_skipped += 1
+                    for path, stat in visit.changed:
+                        yield Path(path), stat
+        self._find_missing(directories_walked)
+
+    def _visit(self, directory: str) -> _Visit:
+        visit = _Visit()
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except OSError:
+            visit.errors += 1
+            visit.record = (-1, 0)
+            visit.readable = False
+            return visit
+        recorded = self.known_dirs.get(directory)
+        if recorded is not None and recorded[0] == mtime_ns:
+            visit.subdirs.extend(self._dirs_by_parent.get(directory, ()))
+            for path in self._files_by_dir.get(directory, ()):
+                try:
+                    self._check(visit, path, os.stat(path))
+                except FileNotFoundError:
+                    visit.missing.append(path)
+                except OSError:
+                    visit.errors += 1
+            return visit
 
+        visit.listed = True
+        entries = 0
+        complete = True
+        listed: set[str] = set()
+        try:
+            with os.scandir(directory) as listing:
+                for entry in listing:
+                    entries += 1
+                    if entry.is_dir():
+                        # Like os.walk, symlinked directories are not followed.
+                        if not entry.is_symlink():
+                            visit.subdirs.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in AUDIO_EXTENSIONS:
+                        listed.add(entry.path)
+                        try:
+                            self._check(visit, entry.path, entry.stat())
+                        except OSError:
+                            visit.errors += 1
+                            complete = False
+            known = self._files_by_dir.get(directory, ())
+            visit.missing = [path for path in known if path not in listed]
+        except OSError:
+            visit.errors += 1
+            visit.readable = False
+            complete = False
+        visit.removed = list(set(self._dirs_by_parent.get(directory, ())) - set(visit.subdirs))
+        trusted = complete and mtime_ns < self._settled
+        visit.record = (mtime_ns if trusted else -1, entries)
+        return visit
 
-def scan(paths: Iterable[Path], conn, jobs: int, reporter: Reporter) -> dict[str, int]:
-    files = discover_files(paths)
+    def _find_missing(self, roots: list[str]) -> None:
+        # Directories the walk never reached are gone if their nearest visited parent was read.
+        for directory, paths in self._files_by_dir.items():
+            if directory in self._visited:
+                continue
+            parent = directory
+            while parent not in self._visited and _parent(parent) != parent:
+                parent = _parent(parent)
+            if self._visited.get(parent):
+                self.missing.extend(paths)
+        for root in roots:
+            if self._visited.get(root) and self.dirs.get(root, (0, 1))[1] == 0:
+                kept = [path for path in self.missing if not _under(path, root)]
+                if len(kept) < len(self.missing):
+                    self.empty_roots.append(root)
+                    self.missing = kept
+
+    def _check(self, visit: _Visit, path: str, stat: os.stat_result) -> None:
+        visit.files += 1
+        if self.known.get(path) != (stat.st_size, stat.st_mtime):
+            visit.changed.append((path, stat))
+
+
+def discover_files(paths: Iterable[Path], workers: int = 8) -> Iterator[Path]:
+    for path, _ in LibraryWalk(paths, workers=workers):
+        yield path
+
+
+def _under(path: str, root: str) -> bool:
+    return path.startswith(root.rstrip(os.sep) + os.sep)
+
+
+def _parent(path: str) -> str:
+    # os.path.dirname for the absolute paths stored in the DB, without its overhead.
+    return path.rpartition(os.sep)[0] or os.sep
+
+
+def scan(
+    paths: Iterable[Path],
+    conn,
+    jobs: int,
+    reporter: Reporter,
+    batch_size: int = 500,
+    commit_interval: float = 2.0,
+    executor: str = "thread",
+    chunk_size: int = 64,
+    hashing: HashSettings | None = None,
+    fingerprinting: FpcalcSettings | None = None,
+    prefer_lossless: bool = True,
+    full: bool = False,
+    walk_jobs: int = 8,
+    acoustic: MatchSettings | None = None,
+) -> dict[str, int]:
+    """Scan ``paths`` into the cache DB, reading only new and changed files.
+
+    Directories are listed only when their mtime differs from the last scan;
+    ``full`` lists every directory regardless. Listing runs on ``walk_jobs``
+    threads and overlaps with reading: changed files are submitted as they
+    are found, with at most a few tasks per worker queued ahead.
+
+    Cached files under ``paths`` that the walk no longer finds are pruned,
+    except where a new file turns out to be the same file moved: its row is
+    carried over to the new path, keeping hashes, tags and fingerprint.
+    Duplicate groups for every match mode are refreshed last, acoustic ones
+    with ``acoustic``.
+    """
+    if executor not in SCAN_EXECUTORS:
+        raise ValueError(f"Unknown scan executor: {executor}")
+    roots = list(paths)
+    known = db_layer.load_file_index(conn, roots, include_untagged=True)
+    known_dirs = {} if full else db_layer.load_dir_index(conn, roots)
+    walk = LibraryWalk(roots, known, known_dirs, workers=walk_jobs)
     stats = {
         "files_scanned": 0,
+        "files_moved": 0,
+        "files_pruned": 0,
         "fingerprints_computed": 0,
         "hashes_computed": 0,
         "errors": 0,
+        "fingerprint_errors": 0,
     }
-    pending = []
-    for path in files:
-        existing = db_layer.get_file_by_path(conn, path)
-        if existing and existing["size"] == path.stat().st_size and existing["mtime"] == path.stat().st_mtime:
-            continue
-        pending.append(path)
 
-    with reporter.progress("Scanning files") as progress:
-        task = progress.add_task("scan", total=len(files))
-        for _ in range(len(files) - len(pending)):
+    scanned: list[Path] = []
+    failed_dirs: set[str] = set()
+    fingerprint_seconds = 0.0
+    writer = ScanWriter(conn, batch_size=batch_size, commit_interval=commit_interval)
+    with reporter.progress("Scanning files") as progress, writer:
+        task = progress.add_task("scan", total=None)
+
+        def _record(path: Path, record: FileRecord | None) -> None:
             stats["files_scanned"] += 1
+            if record is None:
+                stats["errors"] += 1
+                failed_dirs.add(os.path.dirname(path))
+            else:
+                writer.put(record)
+                scanned.append(record.path)
+            completed = walk.unchanged + stats["files_moved"] + stats["files_scanned"]
+            progress.update(task, total=walk.files, completed=completed)
+
+        def _read(files: Iterable[tuple[Path, os.stat_result]]) -> None:
+            if jobs and jobs > 1 and executor == "process":
+                with ProcessPoolExecutor(max_workers=jobs) as pool:
+                    chunks: dict[Future, list[tuple[Path, os.stat_result]]] = {}
+
+                    def _collect(futures: Iterable[Future]) -> None:
+                        for future in futures:
+                            for (path, _), result in zip(chunks.pop(future), future.result()):
+                                _record(path, result)
+
+                    files = iter(files)
+                    while chunk := list(islice(files, max(1, chunk_size))):
+                        chunks[pool.submit(_scan_chunk, chunk)] = chunk
+                        if len(chunks) >= jobs * 2:
+                            _collect(wait(chunks, return_when=FIRST_COMPLETED).done)
+                    _collect(as_completed(list(chunks)))
+            elif jobs and jobs > 1:
+                with ThreadPoolExecutor(max_workers=jobs) as pool:
+                    futures: dict[Future, Path] = {}
+                    for path, stat in files:
+                        futures[pool.submit(_scan_safe, path, stat)] = path
+                        if len(futures) >= jobs * 4:
+                            for future in wait(futures, return_when=FIRST_COMPLETED).done:
+                                _record(futures.pop(future), future.result())
+                    for future in as_completed(list(futures)):
+                        _record(futures.pop(future), future.result())
+            else:
+                for path, stat in files:
+                    _record(path, _scan_safe(path, stat))
+
+        # New paths with the size of a cached file may be moves; they wait for the walk to end.
+        sizes = {entry[0] for entry in known.values() if entry is not None}
+        held: list[tuple[Path, os.stat_result]] = []
+
+        def _hold_moves() -> Iterator[tuple[Path, os.stat_result]]:
+            for path, stat in walk:
+                if stat.st_size in sizes and str(path) not in known:
+                    held.append((path, stat))
+                else:
+                    yield path, stat
+
+        _read(_hold_moves())
+        if walk.missing:
+            writer.flush()
+            held = _reconcile(conn, walk.missing, held, hashing or HashSettings(), stats)
+        if held:
+            _read(held)
+        stats["files_scanned"] += walk.unchanged + stats["files_moved"]
+        stats["errors"] += walk.errors
+        progress.update(task, total=walk.files, completed=stats["files_scanned"])
+
+        task = progress.add_task("fingerprint", total=len(scanned))
+        started = time.perf_counter()
+        for result in fingerprint_many(scanned, fingerprinting or FpcalcSettings(jobs=jobs or 1)):
+            if result.raw:
+                writer.put_fingerprint(result.path, result.raw)
+                stats["fingerprints_computed"] += 1
+            else:
+                stats["fingerprint_errors"] += 1
             progress.advance(task, 1)
-        if jobs and jobs > 1:
-            with ThreadPoolExecutor(max_workers=jobs) as executor:
-                future_map = {executor.submit(_scan_one, path): path for path in pending}
-                for future in as_completed(future_map):
-                    stats["files_scanned"] += 1
-                    try:
-                        record, fingerprinted = future.result()
-                        file_id = db_layer.upsert_file(conn, record)
-                        if fingerprinted:
-                            db_layer.upsert_fingerprint(
-                                conn, Fingerprint(file_id=file_id, chromaprint=fingerprinted)
-                            )
-                            stats["fingerprints_computed"] += 1
-                        stats["hashes_computed"] += 1
-                    except Exception:
-                        stats["errors"] += 1
-                    progress.advance(task, 1)
-        else:
-            for path in pending:
-                stats["files_scanned"] += 1
-                try:
-                    record, fingerprinted = _scan_one(path)
-                    file_id = db_layer.upsert_file(conn, record)
-                    if fingerprinted:
-                        db_layer.upsert_fingerprint(
-                            conn, Fingerprint(file_id=file_id, chromaprint=fingerprinted)
-                        )
-                        stats["fingerprints_computed"] += 1
-                    stats["hashes_computed"] += 1
-                except Exception:
-                    stats["errors"] += 1
-                progress.advance(task, 1)
+        fingerprint_seconds = time.perf_counter() - started
+    if walk.empty_roots:
+        reporter.info(f"Not pruning under empty roots: {', '.join(walk.empty_roots)}")
+    # Recorded only once their files are committed; a failed file keeps its directory
+    # listed until it scans cleanly.
+    for directory in failed_dirs:
+        walk.dirs[directory] = (-1, walk.dirs.get(directory, (-1, 0))[1])
+    db_layer.delete_dirs(conn, [str(root) for root in roots] if full else walk.removed_dirs)
+    db_layer.upsert_dirs(conn, walk.dirs)
     conn.commit()
+    _decode_raw_fingerprints(conn, batch_size)
+    _index_fingerprints(conn, batch_size)
+    hash_stats = resolve_hashes(conn, jobs, reporter, batch_size=batch_size, settings=hashing)
+    stats["duplicate_hashes_regrouped"] = sum(
+        refresh_duplicate_groups(conn, prefer_lossless, match, acoustic)
+        for match in ("hash", "audio", "fingerprint")
+    )
+    stats["hashes_computed"] += hash_stats["hashes_computed"]
+    stats["errors"] += hash_stats["hash_errors"]
+    stats.update(
+        {
+            "dirs_listed": walk.dirs_listed,
+            "dirs_skipped": walk.dirs_skipped,
+            "empty_roots": len(walk.empty_roots),
+            "sample_hashes_computed": hash_stats["sample_hashes_computed"],
+            "audio_hashes_computed": hash_stats["audio_hashes_computed"],
+            "db_rows_written": writer.stats["rows_written"],
+            "db_batches_committed": writer.stats["batches_committed"],
+            "db_write_seconds": round(writer.stats["write_seconds"], 3),
+            "fingerprint_seconds": round(fingerprint_seconds, 3),
+            "fingerprints_per_second": round(
+                stats["fingerprints_computed"] / fingerprint_seconds
+                if fingerprint_seconds
+                else 0.0,
+                1,
+            ),
+        }
+    )
     return stats
 
 
-def _scan_one(path: Path) -> tuple[FileRecord, str | None]:
-    stat = path.stat()
-    audio = File(path)
-    record = FileRecord(
+def _reconcile(
+    conn,
+    missing: list[str],
+    held: list[tuple[Path, os.stat_result]],
+    hashing: HashSettings,
+    stats: dict[str, int],
+) -> list[tuple[Path, os.stat_result]]:
+    """Carry the rows of missing files over to held files they moved to, delete the rest.
+
+    A held file takes over a missing row of the same size whose BLAKE3 it
+    matches. Rows only get a BLAKE3 once their size collides with another
+    file, so a row without one is matched on size and exact mtime instead,
+    which a rename or ``mv`` keeps, and on its sample hash if it has one. A
+    row matched on size and mtime alone keeps no content hashes. Returns the
+    held files that are new.
+    """
+    candidates: dict[int, list] = {}
+    for row in db_layer.get_file_signatures(conn, missing).values():
+        candidates.setdefault(int(row["size"]), []).append(row)
+    moves: list[tuple[int, str, str, float, bool]] = []
+    new: list[tuple[Path, os.stat_result]] = []
+    for path, stat in held:
+        rows = candidates.get(stat.st_size, [])
+        row = _match_moved(path, stat, rows, hashing, stats)
+        if row is None:
+            new.append((path, stat))
+            continue
+        rows.remove(row)
+        verified = bool(row["blake3"] or row["sample_hash"])
+        moves.append((int(row["id"]), row["path"], str(path), stat.st_mtime, verified))
+    db_layer.move_files(conn, moves)
+    gone = [int(row["id"]) for rows in candidates.values() for row in rows]
+    stats["files_moved"] = len(moves)
+    stats["files_pruned"] = db_layer.delete_files(conn, gone)
+    conn.commit()
+    return new
+
+
+def _match_moved(
+    path: Path, stat: os.stat_result, rows: list, hashing: HashSettings, stats: dict[str, int]
+):
+    if any(row["blake3"] for row in rows):
+        try:
+            digest = blake3_with(path, hashing)
+        except OSError:
+            return None
+        stats["hashes_computed"] += 1
+        matches = [row for row in rows if row["blake3"] == digest]
+        if matches:
+            # Identical copies are interchangeable; prefer the one that kept its name.
+            named = [row for row in matches if _name(row["path"]) == path.name]
+            return (named or matches)[0]
+    matches = [row for row in rows if not row["blake3"] and row["mtime"] == stat.st_mtime]
+    if any(row["sample_hash"] for row in matches):
+        try:
+            sample = blake3_sample(path, stat.st_size)
+        except OSError:
+            return None
+        matches = [row for row in matches if row["sample_hash"] in (None, sample)]
+    if len(matches) > 1:
+        matches = [row for row in matches if _name(row["path"]) == path.name]
+    return matches[0] if len(matches) == 1 else None
+
+
+def _name(path: str) -> str:
+    return path.rpartition(os.sep)[2]
+
+
+def _decode_raw_fingerprints(conn, batch_size: int) -> None:
+    rows = db_layer.get_raw_fingerprint_backfill(conn)
+    for start in range(0, len(rows), batch_size):
+        items = []
+        for row in rows[start : start + batch_size]:
+            try:
+                raw = raw_to_blob(decode_fingerprint(row["chromaprint"]))
+            except ValueError:
+                raw = b""
+            items.append((int(row["file_id"]), raw))
+        db_layer.set_raw_fingerprints(conn, items)
+        conn.commit()
+
+
+def _index_fingerprints(conn, batch_size: int) -> None:
+    file_ids = db_layer.get_unindexed_fingerprint_ids(conn)
+    for start in range(0, len(file_ids), batch_size):
+        raws = db_layer.get_raw_fingerprints(conn, file_ids[start : start + batch_size])
+        db_layer.index_fingerprints(
+            conn, [(file_id, index_keys(raw)) for file_id, raw in raws.items()]
+        )
+        conn.commit()
+
+
+def _scan_chunk(items: list[tuple[Path, os.stat_result]]) -> list[FileRecord | None]:
+    return [_scan_safe(path, stat) for path, stat in items]
+
+
+def _scan_safe(path: Path, stat: os.stat_result) -> FileRecord | None:
+    try:
+        return _scan_one(path, stat)
+    except Exception:
+        return None
+
+
+def _scan_one(path: Path, stat: os.stat_result | None = None) -> FileRecord:
+    stat = stat or path.stat()
+    with path.open("rb") as handle:
+        media = read_media(handle)
+        audio_size = audio_payload_size(audio_payload_ranges(handle))
+    return FileRecord(
         id=None,
         path=path,
         size=stat.st_size,
         mtime=stat.st_mtime,
-        blake3=blake3_file(path),
-        codec=audio.mime[0] if audio and audio.mime else None,
-        container=audio.__class__.__name__ if audio else None,
-        duration=float(audio.info.length) if audio and audio.info else None,
-        bitrate=int(audio.info.bitrate) if audio and audio.info and hasattr(audio.info, "bitrate") else None,
-        sample_rate=int(audio.info.sample_rate) if audio and audio.info and hasattr(audio.info, "sample_rate") else None,
-        channels=int(audio.info.channels) if audio and audio.info and hasattr(audio.info, "channels") else None,
-        has_art=has_embedded_art(path),
+        codec=media.codec,
+        container=media.container,
+        duration=media.duration,
+        bitrate=media.bitrate,
+        sample_rate=media.sample_rate,
+        channels=media.channels,
+        has_art=media.has_art,
+        audio_size=audio_size,
+        tags=media.tags,
     )
-    fingerprinted: str | None = None
-    try:
-        fingerprinted = chromaprint(path)
-    except FingerprintError:
-        fingerprinted = None
-
-    return record, fingerprinted
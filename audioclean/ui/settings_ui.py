@@ -12,7 +12,7 @@ from prompt_toolkit.shortcuts import (
     yes_no_dialog,
 )
 
-from audioclean.core.config import Config
+from audioclean.core.config import CHOICES, Config
 
 
 @dataclass(frozen=True)
@@ -33,6 +33,10 @@ SECTIONS: dict[str, list[SettingSpec]] = {
         SettingSpec("confidence_threshold", "Confidence threshold", "float"),
         SettingSpec("preferred_codecs", "Preferred codecs", "list"),
         SettingSpec("fingerprint_required", "Fingerprint required", "bool"),
+        SettingSpec("duplicate_match", "Duplicate match (hash|audio|fingerprint)", "str"),
+        SettingSpec("fingerprint_max_bit_error", "Fingerprint max bit error rate", "float"),
+        SettingSpec("fingerprint_duration_tolerance", "Fingerprint duration slack (s)", "float"),
+        SettingSpec("fingerprint_max_offset", "Fingerprint max offset (frames)", "int"),
     ],
     "Metadata & Filenames": [
         SettingSpec("filename_format", "Filename format", "str"),
@@ -49,10 +53,25 @@ SECTIONS: dict[str, list[SettingSpec]] = {
     "Performance": [
         SettingSpec("jobs", "Parallel jobs", "int"),
         SettingSpec("show_progress", "Show progress UI", "bool"),
+        SettingSpec("scan_batch_size", "Scan DB batch size", "int"),
+        SettingSpec("scan_commit_interval", "Scan commit interval (s)", "float"),
+        SettingSpec("scan_executor", "Scan executor (thread|process)", "str"),
+        SettingSpec("scan_chunk_size", "Scan process chunk size", "int"),
+        SettingSpec("scan_walk_jobs", "Concurrent directory listings", "int"),
+        SettingSpec("hash_chunk_size", "Hash read chunk size (bytes)", "int"),
+        SettingSpec("hash_mmap_threshold", "Hash mmap threshold (bytes)", "int"),
+        SettingSpec("hash_threads", "Hash threads per file (0 = auto)", "int"),
+        SettingSpec("fpcalc_length", "Fingerprint length (s)", "int"),
+        SettingSpec("fpcalc_timeout", "fpcalc timeout per file (s)", "float"),
+        SettingSpec("fpcalc_retries", "fpcalc retries per file", "int"),
+        SettingSpec("fpcalc_batch_size", "Files per fpcalc process", "int"),
+        SettingSpec("fpcalc_jobs", "Concurrent fpcalc processes (0 = jobs)", "int"),
+        SettingSpec("apply_jobs", "Apply and undo workers per device", "int"),
     ],
     "Advanced": [
         SettingSpec("db_path", "Cache database path", "path"),
         SettingSpec("journal_dir", "Journal directory", "path"),
+        SettingSpec("journal_fsync_batch", "Journal operations per fsync", "int"),
         SettingSpec("layout_template", "Layout template", "str"),
         SettingSpec("dedupe_mode", "Dedupe mode", "str"),
         SettingSpec("dupe_dir", "Duplicate move dir", "path"),
@@ -199,6 +218,11 @@ def _edit_value(config: Config, spec: SettingSpec) -> bool:
     ).run()
     if value is None:
         return True
+    if spec.key in CHOICES and value not in CHOICES[spec.key]:
+        message_dialog(
+            title="Invalid value", text=f"Use one of: {', '.join(CHOICES[spec.key])}."
+        ).run()
+        return True
     setattr(config, spec.key, value)
     return True
 
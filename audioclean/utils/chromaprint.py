@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import base64
+import sys
+from array import array
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Sequence
+
+DEFAULT_ALGORITHM = 1
+INDEX_SAMPLE = 16
+
+
+def decode_fingerprint(fingerprint: str) -> array:
+    """Decompress an fpcalc fingerprint string into its uint32 sub-fingerprints."""
+    data = base64.urlsafe_b64decode(fingerprint + "=" * (-len(fingerprint) % 4))
+    if len(data) < 4:
+        raise ValueError("fingerprint header is truncated")
+    count = int.from_bytes(data[1:4], "big")
+
+    normal: list[int] = []
+    reader = _unpack(data, 4, 3)
+    ends = 0
+    while ends < count:
+        value = next(reader, None)
+        if value is None:
+            raise ValueError("fingerprint body is truncated")
+        normal.append(value)
+        if value == 0:
+            ends += 1
+
+    # The 5-bit exception stream starts on the byte after the 3-bit stream.
+    reader = _unpack(data, 4 + (len(normal) * 3 + 7) // 8, 5)
+    for idx, value in enumerate(normal):
+        if value == 7:
+            extra = next(reader, None)
+            if extra is None:
+                raise ValueError("fingerprint exceptions are truncated")
+            normal[idx] = 7 + extra
+
+    values = array("I")
+    current = 0
+    last_bit = 0
+    previous = 0
+    for value in normal:
+        if value == 0:
+            previous ^= current
+            values.append(previous)
+            current = 0
+            last_bit = 0
+        else:
+            last_bit += value
+            current |= 1 << (last_bit - 1)
+    return values
+
+
+def encode_fingerprint(values: Iterable[int], algorithm: int = DEFAULT_ALGORITHM) -> str:
+    """Compress uint32 sub-fingerprints into the string format fpcalc prints."""
+    normal: list[int] = []
+    exceptions: list[int] = []
+    previous = 0
+    count = 0
+    for value in values:
+        value &= 0xFFFFFFFF
+        delta = value ^ previous
+        previous = value
+        count += 1
+        last_bit = 0
+        bit = 1
+        while delta:
+            if delta & 1:
+                step = bit - last_bit
+                if step >= 7:
+                    normal.append(7)
+                    exceptions.append(step - 7)
+                else:
+                    normal.append(step)
+                last_bit = bit
+            delta >>= 1
+            bit += 1
+        normal.append(0)
+    data = bytes([algorithm]) + count.to_bytes(3, "big")
+    data += _pack(normal, 3) + _pack(exceptions, 5)
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def raw_to_blob(values: Iterable[int]) -> bytes:
+    packed = values if isinstance(values, array) and values.typecode == "I" else array("I", values)
+    if sys.byteorder == "big":
+        packed = array("I", packed)
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def blob_to_raw(blob: bytes) -> memoryview | array:
+    """View a little-endian uint32 BLOB as integers, without copying where possible."""
+    if sys.byteorder == "little":
+        return memoryview(blob).cast("I")
+    values = array("I")
+    values.frombytes(blob)
+    values.byteswap()
+    return values
+
+
+@dataclass(frozen=True)
+class MatchSettings:
+    max_bit_error: float = 0.15
+    duration_tolerance: float = 3.0
+    max_offset: int = 8
+    block_frames: int = 120
+    min_shared_keys: int = 2
+
+
+def bit_error_rate(left: Sequence[int], right: Sequence[int], max_offset: int = 0) -> float:
+    """Lowest fraction of differing bits over alignments within ``max_offset`` frames.
+
+    Both sides are turned into one big integer per alignment so XOR and popcount
+    run over the whole overlap at once. Overlaps shorter than half the shorter
+    fingerprint are ignored.
+    """
+    shortest = min(len(left), len(right))
+    best = 1.0
+    for offset in range(-max_offset, max_offset + 1):
+        a = left[offset:] if offset > 0 else left
+        b = right[-offset:] if offset < 0 else right
+        frames = min(len(a), len(b))
+        if frames == 0 or frames * 2 < shortest:
+            continue
+        diff = int.from_bytes(a[:frames], "little") ^ int.from_bytes(b[:frames], "little")
+        best = min(best, diff.bit_count() / (32 * frames))
+    return best
+
+
+def block_keys(values: Sequence[int], frames: int) -> set[int]:
+    """Coarse keys from the leading frames, used to find candidate pairs."""
+    return {value >> 12 for value in values[:frames]}
+
+
+def index_keys(values: Sequence[int], sample: int = INDEX_SAMPLE) -> set[int]:
+    """Coarse keys for roughly one frame in ``sample``, chosen by content.
+
+    A frame is kept when its scrambled key falls in the lowest 1/``sample`` of
+    the range, so a shifted or trimmed copy keeps the same frames.
+    """
+    cutoff = (1 << 32) // max(1, sample)
+    keys = set()
+    for value in values:
+        key = value >> 12
+        if (key * 0x9E3779B1) & 0xFFFFFFFF < cutoff:
+            keys.add(key)
+    return keys
+
+
+def _pack(values: list[int], width: int) -> bytes:
+    out = bytearray()
+    accumulator = 0
+    bits = 0
+    for value in values:
+        accumulator |= value << bits
+        bits += width
+        while bits >= 8:
+            out.append(accumulator & 0xFF)
+            accumulator >>= 8
+            bits -= 8
+    if bits:
+        out.append(accumulator)
+    return bytes(out)
+
+
+def _unpack(data: bytes, offset: int, width: int) -> Iterator[int]:
+    mask = (1 << width) - 1
+    accumulator = 0
+    bits = 0
+    for byte in data[offset:]:
+        accumulator |= byte << bits
+        bits += 8
+        while bits >= width:
+            yield accumulator & mask
+            accumulator >>= width
+            bits -= width
@@ -1,30 +1,144 @@
 from __future__ import annotations
 
 import json
+from array import array
+import shutil
 import subprocess
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from itertools import islice
 from pathlib import Path
+from typing import Iterable, Iterator
+
+from audioclean.utils.chromaprint import (
+    blob_to_raw,
+    decode_fingerprint,
+    encode_fingerprint,
+    raw_to_blob,
+)
 
 
 class FingerprintError(RuntimeError):
     pass
 
 
-def chromaprint(path: Path) -> str:
+@dataclass(frozen=True)
+class FpcalcSettings:
+    length: int = 120
+    timeout: float = 60.0
+    retries: int = 1
+    batch_size: int = 8
+    jobs: int = 4
+
+
+@dataclass
+class FingerprintResult:
+    path: Path
+    raw: bytes | None = None
+    duration: float | None = None
+    error: str | None = None
+
+    @property
+    def fingerprint(self) -> str | None:
+        """The compressed string fpcalc prints by default, built on demand."""
+        return encode_fingerprint(blob_to_raw(self.raw)) if self.raw else None
+
+
+def chromaprint(path: Path, settings: FpcalcSettings | None = None) -> str:
+    result = _run_single(path, settings or FpcalcSettings())
+    fingerprint = result.fingerprint
+    if fingerprint is None:
+        raise FingerprintError(result.error or "fpcalc failed")
+    return fingerprint
+
+
+def fingerprint_many(
+    paths: Iterable[Path], settings: FpcalcSettings | None = None
+) -> Iterator[FingerprintResult]:
+    """Fingerprint files with up to ``settings.jobs`` concurrent fpcalc processes.
+
+    Each process is given ``settings.batch_size`` files. A batch that fails or
+    times out is retried file by file, each file getting ``settings.retries``
+    extra attempts. ``paths`` is read lazily and at most two batches per job
+    are in flight; results are yielded as batches finish.
+    """
+    settings = settings or FpcalcSettings()
+    if shutil.which("fpcalc") is None:
+        for path in paths:
+            yield FingerprintResult(path=path, error="fpcalc not found in PATH")
+        return
+    jobs = max(1, settings.jobs)
+    batch_size = max(1, settings.batch_size)
+    remaining = iter(paths)
+    pending: set[Future] = set()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while True:
+            while len(pending) < jobs * 2 and (batch := list(islice(remaining, batch_size))):
+                pending.add(executor.submit(_run_batch, batch, settings))
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+
+
+def _run_batch(paths: list[Path], settings: FpcalcSettings) -> list[FingerprintResult]:
+    if len(paths) > 1:
+        try:
+            return _invoke(paths, settings)
+        except FingerprintError:
+            pass
+    return [_run_single(path, settings) for path in paths]
+
+
+def _run_single(path: Path, settings: FpcalcSettings) -> FingerprintResult:
+    error = "fpcalc failed"
+    for _ in range(1 + max(0, settings.retries)):
+        try:
+            return _invoke([path], settings)[0]
+        except FingerprintError as exc:
+            error = str(exc)
+    return FingerprintResult(path=path, error=error)
+
+
+def _invoke(paths: list[Path], settings: FpcalcSettings) -> list[FingerprintResult]:
+    # Raw output is plain JSON integers; the compressed string would cost a
+    # pure-Python decode per file on the fingerprinting threads.
+    command = ["fpcalc", "-json", "-raw", "-length", str(settings.length)]
+    command.extend(str(path) for path in paths)
     try:
         result = subprocess.run(
-            ["fpcalc", "-json", str(path)],
+            command,
             capture_output=True,
             text=True,
             check=False,
+            timeout=settings.timeout * len(paths),
         )
     except FileNotFoundError as exc:
         raise FingerprintError("fpcalc not found in PATH") from exc
+    except subprocess.TimeoutExpired as exc:
+        raise FingerprintError(f"fpcalc timed out after {exc.timeout:.0f}s") from exc
 
-    if result.returncode != 0:
+    # fpcalc prints one JSON object per successfully decoded file and skips failures.
+    documents = [line for line in result.stdout.splitlines() if line.startswith("{")]
+    if result.returncode != 0 or len(documents) != len(paths):
         raise FingerprintError(result.stderr.strip() or "fpcalc failed")
 
-    data = json.loads(result.stdout)
-    fingerprint = data.get("fingerprint")
-    if not fingerprint:
-        raise FingerprintError("fpcalc did not return a fingerprint")
-    return fingerprint
+    results = []
+    for path, document in zip(paths, documents):
+        data = json.loads(document)
+        fingerprint = data.get("fingerprint")
+        if not fingerprint:
+            raise FingerprintError("fpcalc did not return a fingerprint")
+        if isinstance(fingerprint, list):
+            # Raw values are signed in some fpcalc releases.
+            values = array("I", (value & 0xFFFFFFFF for value in fingerprint))
+        else:
+            try:
+                values = decode_fingerprint(fingerprint)
+            except ValueError as exc:
+                raise FingerprintError(f"fpcalc returned a bad fingerprint: {exc}") from exc
+        results.append(
+            FingerprintResult(path=path, raw=raw_to_blob(values), duration=data.get("duration"))
+        )
+    return results
@@ -1,13 +1,23 @@
 from __future__ import annotations
 
+import errno
+import os
 import re
+import shutil
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 from audioclean.utils.tags import TagInfo
 
 
 _INVALID_CHARS = re.compile(r'[<>:"/\\\\|?*]')
 _WHITESPACE = re.compile(r"\s+")
+# Linux FICLONE ioctl: share the source's extents instead of copying them (btrfs, XFS, bcachefs).
+_FICLONE = 0x40049409
 
 
 def sanitize_component(value: str) -> str:
@@ -46,3 +56,74 @@ def format_bytes(num_bytes: int) -> str:
             return f"{size:.1f} {unit}"
         size /= 1024.0
     return f"{size:.1f} TB"
+
+
+def move_file(src: Path, dst: Path, keep_existing: bool = False) -> tuple[str, int]:
+    """Move ``src`` to ``dst`` and return the strategy used and the bytes copied.
+
+    Within a filesystem this is an ``os.rename``, or with ``keep_existing`` an
+    ``os.link`` followed by unlinking ``src``, which fails rather than replace
+    an existing ``dst``. Across filesystems the data is reflinked where
+    supported, copied otherwise, and renamed into place once complete.
+    """
+    try:
+        if keep_existing:
+            return _link_move(src, dst), 0
+        os.rename(src, dst)
+        return "rename", 0
+    except OSError as exc:
+        if exc.errno != errno.EXDEV:
+            raise
+
+    if keep_existing and dst.exists():
+        raise FileExistsError(errno.EEXIST, "Target already exists", str(dst))
+    partial = dst.with_name(f".{dst.name}.partial")
+    with src.open("rb") as source, partial.open("wb") as target:
+        cloned = _clone(source.fileno(), target.fileno())
+    strategy, copied = "reflink", 0
+    if not cloned:
+        shutil.copyfile(src, partial)
+        strategy, copied = "copy", partial.stat().st_size
+    shutil.copystat(src, partial)
+    if keep_existing:
+        os.link(partial, dst)
+        partial.unlink()
+    else:
+        os.replace(partial, dst)
+    src.unlink()
+    return strategy, copied
+
+
+def same_device(src: Path, dst: Path) -> bool:
+    """Whether ``src`` could be renamed to ``dst``; missing parents of ``dst`` are skipped."""
+    probe = dst.parent
+    while not probe.exists() and probe != probe.parent:
+        probe = probe.parent
+    return os.stat(src).st_dev == os.stat(probe).st_dev
+
+
+def _link_move(src: Path, dst: Path) -> str:
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        # A crash between link and unlink leaves both names on the same inode.
+        if not os.path.samefile(src, dst):
+            raise
+    except OSError as exc:
+        # Filesystems without hard links (FAT, some network shares) can still rename.
+        if exc.errno not in (errno.EPERM, errno.EOPNOTSUPP, errno.ENOTSUP) or dst.exists():
+            raise
+        os.rename(src, dst)
+        return "rename"
+    src.unlink()
+    return "link"
+
+
+def _clone(source_fd: int, target_fd: int) -> bool:
+    if fcntl is None:
+        return False
+    try:
+        fcntl.ioctl(target_fd, _FICLONE, source_fd)
+    except OSError:
+        return False
+    return True
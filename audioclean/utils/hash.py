@@ -1,16 +1,67 @@
 from __future__ import annotations
 
+import mmap
+from dataclasses import dataclass
 from pathlib import Path
 
 from blake3 import blake3
 
 
-def blake3_file(path: Path, chunk_size: int = 1024 * 1024) -> str:
-    hasher = blake3()
+SAMPLE_BLOCK_SIZE = 64 * 1024
+
+
+@dataclass(frozen=True)
+class HashSettings:
+    chunk_size: int = 1024 * 1024
+    mmap_threshold: int = 32 * 1024 * 1024
+    max_threads: int = 0
+
+
+def blake3_file(
+    path: Path,
+    chunk_size: int = 1024 * 1024,
+    mmap_threshold: int | None = None,
+    max_threads: int = 0,
+) -> str:
+    """Hash a file; files of at least ``mmap_threshold`` bytes are mapped and hashed
+    with blake3's internal thread pool (``max_threads`` 0 = one per core)."""
     with path.open("rb") as handle:
+        size = handle.seek(0, 2)
+        handle.seek(0)
+        if mmap_threshold is not None and size and size >= mmap_threshold:
+            hasher = blake3(max_threads=max_threads or blake3.AUTO)
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                hasher.update(mapped)
+            return hasher.hexdigest()
+        hasher = blake3()
         while True:
             chunk = handle.read(chunk_size)
             if not chunk:
                 break
             hasher.update(chunk)
     return hasher.hexdigest()
+
+
+def blake3_with(path: Path, settings: HashSettings) -> str:
+    return blake3_file(
+        path,
+        chunk_size=settings.chunk_size,
+        mmap_threshold=settings.mmap_threshold,
+        max_threads=settings.max_threads,
+    )
+
+
+def sample_covers_file(size: int, block_size: int = SAMPLE_BLOCK_SIZE) -> bool:
+    return size <= block_size * 3
+
+
+def blake3_sample(path: Path, size: int, block_size: int = SAMPLE_BLOCK_SIZE) -> str:
+    """Hash the head, middle and tail blocks; for small files this is the full BLAKE3."""
+    if sample_covers_file(size, block_size):
+        return blake3_file(path)
+    hasher = blake3()
+    with path.open("rb") as handle:
+        for offset in (0, (size - block_size) // 2, size - block_size):
+            handle.seek(offset)
+            hasher.update(handle.read(block_size))
+    return hasher.hexdigest()
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import struct
+from pathlib import Path
+from typing import BinaryIO
+
+from blake3 import blake3
+
+
+def audio_payload_ranges(handle: BinaryIO) -> list[tuple[int, int]] | None:
+    """Return (offset, length) spans holding only audio data, or None if unknown.
+
+    Skips leading ID3v2 tags, FLAC metadata blocks, trailing APEv2/ID3v1 tags,
+    every MP4 atom except ``mdat``, and Ogg header pages and page framing.
+    """
+    try:
+        return _payload_ranges(handle)
+    except struct.error:
+        return None
+
+
+def _payload_ranges(handle: BinaryIO) -> list[tuple[int, int]] | None:
+    size = handle.seek(0, 2)
+    start = _skip_id3v2(handle, 0, size)
+    handle.seek(start)
+    magic = handle.read(8)
+    if magic[:4] == b"fLaC":
+        start = _skip_flac_metadata(handle, start + 4, size)
+        if start is None:
+            return None
+    elif magic[4:8] == b"ftyp":
+        return _mp4_mdat_ranges(handle, start, size)
+    elif magic[:4] == b"OggS":
+        return _ogg_audio_ranges(handle, start, size)
+    end = _strip_trailing_tags(handle, start, size)
+    return [(start, end - start)] if end > start else []
+
+
+def audio_payload_size(ranges: list[tuple[int, int]] | None) -> int:
+    """Total audio bytes, or -1 when the container is not understood."""
+    if ranges is None:
+        return -1
+    return sum(length for _, length in ranges)
+
+
+def file_audio_payload_size(path: Path) -> int:
+    with path.open("rb") as handle:
+        return audio_payload_size(audio_payload_ranges(handle))
+
+
+def blake3_audio(path: Path, chunk_size: int = 1024 * 1024) -> str | None:
+    with path.open("rb") as handle:
+        ranges = audio_payload_ranges(handle)
+        if ranges is None:
+            return None
+        hasher = blake3()
+        for offset, length in ranges:
+            handle.seek(offset)
+            remaining = length
+            while remaining > 0:
+                chunk = handle.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                remaining -= len(chunk)
+    return hasher.hexdigest()
+
+
+def _skip_id3v2(handle: BinaryIO, offset: int, size: int) -> int:
+    while offset + 10 <= size:
+        handle.seek(offset)
+        header = handle.read(10)
+        if header[:3] != b"ID3":
+            break
+        tag_size = _syncsafe(header[6:10])
+        footer = 10 if header[5] & 0x10 else 0
+        offset += 10 + tag_size + footer
+    return min(offset, size)
+
+
+def _skip_flac_metadata(handle: BinaryIO, offset: int, size: int) -> int | None:
+    while offset + 4 <= size:
+        handle.seek(offset)
+        header = handle.read(4)
+        length = int.from_bytes(header[1:4], "big")
+        offset += 4 + length
+        if header[0] & 0x80:
+            return offset
+    return None
+
+
+def _strip_trailing_tags(handle: BinaryIO, start: int, end: int) -> int:
+    while end - start >= 32:
+        if end - start >= 128:
+            handle.seek(end - 128)
+            if handle.read(3) == b"TAG":
+                end -= 128
+                continue
+        handle.seek(end - 32)
+        footer = handle.read(32)
+        if footer[:8] != b"APETAGEX":
+            break
+        tag_size, _, flags = struct.unpack("<III", footer[12:24])
+        end -= tag_size + (32 if flags & 0x80000000 else 0)
+    return max(end, start)
+
+
+def _mp4_mdat_ranges(handle: BinaryIO, offset: int, size: int) -> list[tuple[int, int]] | None:
+    ranges: list[tuple[int, int]] = []
+    while offset + 8 <= size:
+        handle.seek(offset)
+        header = handle.read(16)
+        atom_size = int.from_bytes(header[0:4], "big")
+        header_size = 8
+        if atom_size == 1:
+            atom_size = int.from_bytes(header[8:16], "big")
+            header_size = 16
+        elif atom_size == 0:
+            atom_size = size - offset
+        if atom_size < header_size:
+            return None
+        if header[4:8] == b"mdat":
+            ranges.append((offset + header_size, min(atom_size, size - offset) - header_size))
+        offset += atom_size
+    return ranges or None
+
+
+def _ogg_audio_ranges(handle: BinaryIO, offset: int, size: int) -> list[tuple[int, int]] | None:
+    ranges: list[tuple[int, int]] = []
+    # Header packets left to skip; None when the codec's header count is unknown.
+    headers: int | None = None
+    audio_seen = False
+    while offset + 27 <= size:
+        handle.seek(offset)
+        header = handle.read(27)
+        if header[:4] != b"OggS":
+            return None
+        granule = int.from_bytes(header[6:14], "little")
+        lacing = handle.read(header[26])
+        body = offset + 27 + len(lacing)
+        length = sum(lacing)
+        offset = body + length
+        if header[5] & 0x02:
+            handle.seek(body)
+            headers = _ogg_header_packets(handle.read(min(length, 16)))
+            audio_seen = False
+        start = body
+        if headers:
+            # Skip whole packets: one ends at every lacing value below 255.
+            for value in lacing:
+                start += value
+                if value < 255:
+                    headers -= 1
+                    if not headers:
+                        break
+            if headers:
+                continue
+        elif headers is None and not audio_seen:
+            # Granule 0 ends a header packet, -1 (no packet ends here) continues one.
+            if granule in (0, _OGG_NO_GRANULE):
+                continue
+            audio_seen = True
+        if offset > start:
+            ranges.append((start, offset - start))
+    return ranges
+
+
+_OGG_NO_GRANULE = (1 << 64) - 1
+
+
+def _ogg_header_packets(packet: bytes) -> int | None:
+    """Number of header packets for the codec whose first packet starts with ``packet``."""
+    if packet.startswith(b"\x01vorbis"):
+        return 3
+    if packet.startswith(b"OpusHead"):
+        return 2
+    if packet.startswith(b"\x7fFLAC") and len(packet) >= 9:
+        # Mapping header, then the count of metadata packets that follow it (0 if unknown).
+        count = int.from_bytes(packet[7:9], "big")
+        return count + 1 if count else None
+    return None
+
+
+def _syncsafe(data: bytes) -> int:
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
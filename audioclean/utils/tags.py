@@ -1,7 +1,8 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import BinaryIO
 
 from mutagen import File
 
@@ -36,8 +37,44 @@ def parse_track(value: str | None) -> int | None:
         return None
 
 
+@dataclass
+class MediaInfo:
+    codec: str | None = None
+    container: str | None = None
+    duration: float | None = None
+    bitrate: int | None = None
+    sample_rate: int | None = None
+    channels: int | None = None
+    has_art: bool = False
+    tags: TagInfo = field(default_factory=TagInfo)
+
+
+def read_media(source: Path | BinaryIO) -> MediaInfo:
+    audio = File(source)
+    if audio is None:
+        return MediaInfo()
+    info = audio.info
+    return MediaInfo(
+        codec=audio.mime[0] if audio.mime else None,
+        container=audio.__class__.__name__,
+        duration=float(info.length) if info else None,
+        bitrate=int(info.bitrate) if info and hasattr(info, "bitrate") else None,
+        sample_rate=int(info.sample_rate) if info and hasattr(info, "sample_rate") else None,
+        channels=int(info.channels) if info and hasattr(info, "channels") else None,
+        has_art=_has_art(audio),
+        tags=_tag_info(audio),
+    )
+
+
 def read_tags(path: Path) -> TagInfo:
-    audio = File(path)
+    return _tag_info(File(path))
+
+
+def has_embedded_art(path: Path) -> bool:
+    return _has_art(File(path))
+
+
+def _tag_info(audio) -> TagInfo:
     if audio is None or not hasattr(audio, "tags") or audio.tags is None:
         return TagInfo()
 
@@ -67,8 +104,7 @@ def read_tags(path: Path) -> TagInfo:
     )
 
 
-def has_embedded_art(path: Path) -> bool:
-    audio = File(path)
+def _has_art(audio) -> bool:
     if audio is None or not hasattr(audio, "tags") or audio.tags is None:
         return False
     tags = audio.tags
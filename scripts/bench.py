@@ -0,0 +1,873 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from audioclean.core import db as db_layer  # noqa: E402
+from audioclean.core.journal import index_journals, journal_paths, read_journal  # noqa: E402
+from audioclean.core.models import FileRecord, Operation, Plan  # noqa: E402
+from audioclean.core.reporter import Reporter  # noqa: E402
+from audioclean.core.writer import ScanWriter  # noqa: E402
+from audioclean.engine.acoustic import find_acoustic_groups  # noqa: E402
+from audioclean.engine import applier  # noqa: E402
+from audioclean.engine.applier import apply_plan, undo  # noqa: E402
+from audioclean.engine.duplicates import refresh_duplicate_groups  # noqa: E402
+from audioclean.engine.planner import _plan_dedupe  # noqa: E402
+from audioclean.engine.scanner import discover_files, scan  # noqa: E402
+from audioclean.utils.chromaprint import (  # noqa: E402
+    blob_to_raw,
+    decode_fingerprint,
+    encode_fingerprint,
+    raw_to_blob,
+)
+from audioclean.utils.hash import blake3_file  # noqa: E402
+from audioclean.utils.tags import TagInfo  # noqa: E402
+
+
+def mp3_payload(frames: int = 40) -> bytes:
+    from mutagen.id3 import ID3, TALB, TIT2, TPE1, TRCK
+
+    frame = bytes([0xFF, 0xFB, 0x90, 0x64]) + bytes(413)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "template.mp3"
+        path.write_bytes(frame * frames)
+        tags = ID3()
+        tags.add(TIT2(encoding=3, text="Title"))
+        tags.add(TPE1(encoding=3, text="Artist"))
+        tags.add(TALB(encoding=3, text="Album"))
+        tags.add(TRCK(encoding=3, text="1"))
+        tags.save(path)
+        return path.read_bytes()
+
+
+def make_library(root: Path, count: int, per_dir: int = 100, frames: int = 40) -> list[Path]:
+    payload = bytearray(mp3_payload(frames))
+    files: list[Path] = []
+    for idx in range(count):
+        folder = root / f"artist{idx // (per_dir * 10):04}" / f"album{idx // per_dir:05}"
+        folder.mkdir(parents=True, exist_ok=True)
+        path = folder / f"{idx % per_dir:03} track.mp3"
+        payload[-4:] = idx.to_bytes(4, "little")
+        path.write_bytes(payload)
+        files.append(path)
+    return files
+
+
+def seed_db(conn, files: list[Path]) -> None:
+    for path in files:
+        stat = path.stat()
+        db_layer.upsert_file(
+            conn,
+            FileRecord(
+                id=None,
+                path=path,
+                size=stat.st_size,
+                mtime=stat.st_mtime,
+                blake3=str(path),
+                sample_hash=str(path),
+                hash_level="full",
+                tags=TagInfo(),
+            ),
+        )
+    conn.commit()
+
+
+def bench_rescan(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        if args.library:
+            roots = [args.library]
+            files = list(discover_files(roots))
+        else:
+            roots = [tmp_path / "library"]
+            files = make_library(roots[0], args.files)
+        conn = db_layer.connect(tmp_path / "cache.sqlite3")
+        seed_db(conn, files)
+        reporter = Reporter(quiet=True, progress=False)
+        for run in range(1, args.runs + 1):
+            started = time.perf_counter()
+            stats = scan(roots, conn, args.jobs, reporter)
+            elapsed = time.perf_counter() - started
+            print(
+                f"rescan run {run}: {len(files)} files unchanged in {elapsed:.3f}s "
+                f"({len(files) / elapsed:,.0f} files/s, rescanned {stats['hashes_computed']})"
+            )
+
+
+def bench_walk(args: argparse.Namespace) -> None:
+    if args.latency_ms:
+        # Model a network mount: every directory listing waits on a round trip.
+        scandir = os.scandir
+
+        def slow_scandir(path: str = ".") -> object:
+            time.sleep(args.latency_ms / 1000)
+            return scandir(path)
+
+        os.scandir = slow_scandir
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        library = tmp_path / "library"
+        make_library(library, args.files, per_dir=args.per_dir)
+        reporter = Reporter(quiet=True, progress=False)
+        for walk_jobs in args.walk_jobs:
+            conn = db_layer.connect(tmp_path / f"walk{walk_jobs}.sqlite3")
+            started = time.perf_counter()
+            stats = scan([library], conn, args.jobs, reporter, walk_jobs=walk_jobs)
+            elapsed = time.perf_counter() - started
+            print(
+                f"walk_jobs={walk_jobs}: first scan of {stats['files_scanned']} files "
+                f"in {elapsed:.2f}s ({stats['dirs_listed']} directories listed)"
+            )
+
+
+def bench_moves(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        library = tmp_path / "library"
+        files = make_library(library, args.files, per_dir=args.per_dir)
+        conn = db_layer.connect(tmp_path / "cache.sqlite3")
+        reporter = Reporter(quiet=True, progress=False)
+        scan([library], conn, args.jobs, reporter)
+        albums = sorted({path.parent for path in files})
+        moved = albums[: int(len(albums) * args.fraction)]
+        target = library / "reorganised"
+        target.mkdir()
+        for album in moved:
+            album.rename(target / album.name)
+        for path in files[1 :: args.delete_every]:
+            path.unlink(missing_ok=True)
+        started = time.perf_counter()
+        stats = scan([library], conn, args.jobs, reporter)
+        elapsed = time.perf_counter() - started
+        print(
+            f"rescan after moving {len(moved)}/{len(albums)} albums: {elapsed:.2f}s, "
+            f"{stats['files_moved']} moved, {stats['files_pruned']} pruned, "
+            f"{stats['db_rows_written']} rows rewritten, {db_layer.count_files(conn)} cached"
+        )
+
+
+def synthetic_records(count: int) -> list[FileRecord]:
+    return [
+        FileRecord(
+            id=None,
+            path=Path(f"/bench/library/album{idx // 12:05}/{idx % 12:02} track.flac"),
+            size=30_000_000 + idx,
+            mtime=1_700_000_000.0 + idx,
+            blake3=f"{idx:064x}",
+            codec="audio/flac",
+            container="FLAC",
+            duration=240.0,
+            bitrate=900_000,
+            sample_rate=44100,
+            channels=2,
+        )
+        for idx in range(count)
+    ]
+
+
+def bench_writer(args: argparse.Namespace) -> None:
+    if args.crash_after is not None:
+        conn = db_layer.connect(args.db)
+        writer = ScanWriter(conn, batch_size=args.batch_size, commit_interval=args.commit_interval)
+        writer.start()
+        for record in synthetic_records(args.crash_after):
+            writer.put(record)
+        time.sleep(args.commit_interval / 2)
+        os._exit(1)
+
+    records = synthetic_records(args.rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = db_layer.connect(Path(tmp) / "row.sqlite3")
+        started = time.perf_counter()
+        for record in records:
+            db_layer.write_scan_batch(conn, [record])
+        conn.commit()
+        elapsed = time.perf_counter() - started
+        print(f"row-at-a-time, single commit: {len(records) / elapsed:,.0f} rows/s")
+
+        for batch_size in args.batch_sizes:
+            conn = db_layer.connect(Path(tmp) / f"batch{batch_size}.sqlite3")
+            started = time.perf_counter()
+            writer = ScanWriter(
+                conn, batch_size=batch_size, commit_interval=args.commit_interval
+            )
+            with writer:
+                for record in records:
+                    writer.put(record)
+            elapsed = time.perf_counter() - started
+            print(
+                f"writer batch={batch_size}: {len(records) / elapsed:,.0f} rows/s, "
+                f"{writer.stats['batches_committed']} commits"
+            )
+
+        for batch_size in args.batch_sizes:
+            db = Path(tmp) / f"crash{batch_size}.sqlite3"
+            subprocess.run(
+                [
+                    sys.executable,
+                    __file__,
+                    "writer",
+                    "--db",
+                    str(db),
+                    "--batch-size",
+                    str(batch_size),
+                    "--commit-interval",
+                    str(args.commit_interval),
+                    "--crash-after",
+                    str(args.crash_rows),
+                ],
+                check=False,
+            )
+            kept = db_layer.connect(db).execute("SELECT COUNT(*) AS c FROM files").fetchone()["c"]
+            print(
+                f"crash after {args.crash_rows} queued rows, batch={batch_size}: "
+                f"{kept} committed, {args.crash_rows - kept} lost"
+            )
+
+
+def bench_executor(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        if args.library:
+            roots = [args.library]
+        else:
+            roots = [tmp_path / "library"]
+            make_library(roots[0], args.files, frames=args.frames)
+        reporter = Reporter(quiet=True, progress=False)
+        for jobs in args.jobs:
+            for executor in ("thread", "process"):
+                db = tmp_path / f"{executor}-{jobs}.sqlite3"
+                conn = db_layer.connect(db)
+                started = time.perf_counter()
+                stats = scan(
+                    roots, conn, jobs, reporter, executor=executor, chunk_size=args.chunk_size
+                )
+                elapsed = time.perf_counter() - started
+                print(
+                    f"{executor:>7} jobs={jobs:<3} {stats['files_scanned']} files "
+                    f"in {elapsed:.2f}s ({stats['files_scanned'] / elapsed:,.0f} files/s)"
+                )
+
+
+def bench_hash(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.file
+        if path is None:
+            path = Path(tmp) / "large.flac"
+            with path.open("wb") as handle:
+                for _ in range(args.size_mb):
+                    handle.write(os.urandom(1024 * 1024))
+        size_mb = path.stat().st_size / (1024 * 1024)
+        variants = [
+            (f"read chunk={chunk // 1024}KiB", {"chunk_size": chunk}) for chunk in args.chunks
+        ]
+        variants.append(("mmap 1 thread", {"mmap_threshold": 0, "max_threads": 1}))
+        variants.append(("mmap auto threads", {"mmap_threshold": 0, "max_threads": 0}))
+        for label, options in variants:
+            best = None
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                blake3_file(path, **options)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            print(f"{label:>22}: {size_mb / best:,.0f} MB/s ({size_mb:.0f} MB in {best:.3f}s)")
+
+
+def synthetic_fingerprint(rng: random.Random, length: int) -> list[int]:
+    # Adjacent Chromaprint frames differ in a handful of bits.
+    value = rng.getrandbits(32)
+    values = []
+    for _ in range(length):
+        for _ in range(rng.randint(2, 10)):
+            value ^= 1 << rng.randrange(32)
+        values.append(value)
+    return values
+
+
+def bench_fingerprints(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Path(tmp) / "fingerprints.sqlite3"
+        conn = db_layer.connect(db)
+        templates = [synthetic_fingerprint(rng, args.length) for _ in range(args.distinct)]
+        encoded = [(encode_fingerprint(values), raw_to_blob(values)) for values in templates]
+        for start in range(0, args.files, 5000):
+            count = min(5000, args.files - start)
+            conn.executemany(
+                "INSERT INTO files (id, path, size, mtime) VALUES (?, ?, 0, 0)",
+                [(idx, f"/bench/{idx:07}.flac") for idx in range(start, start + count)],
+            )
+            conn.executemany(
+                "INSERT INTO fingerprints (file_id, chromaprint, raw) VALUES (?, ?, ?)",
+                [(idx,) + encoded[idx % len(encoded)] for idx in range(start, start + count)],
+            )
+        conn.commit()
+        sizes = conn.execute(
+            "SELECT SUM(length(chromaprint)) AS text_bytes, SUM(length(raw)) AS raw_bytes "
+            "FROM fingerprints"
+        ).fetchone()
+        conn.execute("VACUUM")
+        print(
+            f"{args.files} fingerprints x {args.length} frames: "
+            f"text {sizes['text_bytes'] / 1e6:,.1f} MB, raw {sizes['raw_bytes'] / 1e6:,.1f} MB, "
+            f"db file {db.stat().st_size / 1e6:,.1f} MB"
+        )
+
+        def _load(label: str, column: str, decode) -> None:
+            started = time.perf_counter()
+            for row in conn.execute(f"SELECT file_id, {column} AS value FROM fingerprints"):
+                decode(row["value"])
+            elapsed = time.perf_counter() - started
+            print(f"{label:>28}: {elapsed:.2f}s ({args.files / elapsed:,.0f} fingerprints/s)")
+
+        _load("decode chromaprint text", "chromaprint", decode_fingerprint)
+        _load("raw BLOB to array('I')", "raw", lambda blob: array("I").frombytes(blob))
+        _load("raw BLOB memoryview", "raw", blob_to_raw)
+
+
+def _noise_mask(rng: random.Random, bits: int) -> int:
+    # Each bit survives the AND of ``bits`` random words with probability 2 ** -bits.
+    mask = rng.getrandbits(32)
+    for _ in range(bits - 1):
+        mask &= rng.getrandbits(32)
+    return mask
+
+
+def bench_acoustic(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    recordings = args.files // args.copies
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = db_layer.connect(Path(tmp) / "acoustic.sqlite3")
+        file_id = 0
+        for start in range(0, recordings, 1000):
+            files = []
+            fingerprints = []
+            for recording in range(start, min(start + 1000, recordings)):
+                values = synthetic_fingerprint(rng, args.length)
+                duration = rng.uniform(90.0, 480.0)
+                for copy in range(args.copies):
+                    # Re-encodes flip a few percent of bits and may shift a frame or two.
+                    shift = rng.randint(0, 2) if copy else 0
+                    noisy = [value ^ _noise_mask(rng, args.noise_bits) for value in values[shift:]]
+                    path = f"/bench/{recording:07}-{copy}.flac"
+                    files.append((file_id, path, duration + copy))
+                    fingerprints.append(
+                        (file_id, encode_fingerprint(noisy[:8]), raw_to_blob(noisy))
+                    )
+                    file_id += 1
+            conn.executemany(
+                "INSERT INTO files (id, path, size, mtime, duration) VALUES (?, ?, 0, 0, ?)", files
+            )
+            conn.executemany(
+                "INSERT INTO fingerprints (file_id, chromaprint, raw) VALUES (?, ?, ?)",
+                fingerprints,
+            )
+        conn.commit()
+        started = time.perf_counter()
+        groups = find_acoustic_groups(conn)
+        elapsed = time.perf_counter() - started
+        exact = sum(
+            1
+            for file_ids, _ in groups
+            if len(file_ids) == args.copies
+            and len({file_id // args.copies for file_id in file_ids}) == 1
+        )
+        print(
+            f"{file_id} fingerprints: {len(groups)} groups ({exact} of {recordings} recordings "
+            f"recovered exactly) in {elapsed:.1f}s ({file_id / elapsed:,.0f} files/s)"
+        )
+
+
+def bench_groups(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = db_layer.connect(Path(tmp) / "groups.sqlite3")
+        total = args.groups * args.copies + args.unique
+        rows = []
+        for idx in range(total):
+            group = idx // args.copies if idx < args.groups * args.copies else None
+            digest = f"{group:064x}" if group is not None else f"u{idx:063x}"
+            rows.append((f"/bench/{idx:08}.mp3", 4_000_000 + idx, 0.0, digest, "full"))
+        # Insert out of hash order so groups are scattered across the table, as in a real scan.
+        random.Random(args.seed).shuffle(rows)
+        conn.executemany(
+            "INSERT INTO files (path, size, mtime, blake3, hash_level) VALUES (?, ?, ?, ?, ?)", rows
+        )
+        conn.commit()
+
+        started = time.perf_counter()
+        streamed = sum(1 for _ in db_layer.iter_duplicates_by_hash(conn))
+        elapsed = time.perf_counter() - started
+        print(f"streamed single query: {streamed} groups in {elapsed:.2f}s")
+
+        for label in ("initial build", "no-op refresh"):
+            started = time.perf_counter()
+            regrouped = refresh_duplicate_groups(conn, True)
+            elapsed = time.perf_counter() - started
+            print(f"materialized {label}: {regrouped} groups in {elapsed:.2f}s")
+        conn.execute("UPDATE files SET blake3 = ? WHERE path = ?", (f"{0:064x}", rows[0][0]))
+        conn.commit()
+        started = time.perf_counter()
+        regrouped = refresh_duplicate_groups(conn, True)
+        elapsed = time.perf_counter() - started
+        print(f"materialized refresh after one change: {regrouped} hashes in {elapsed:.3f}s")
+
+        conn.executemany(
+            "INSERT INTO group_overrides (group_hash, path, action, updated_at) "
+            "VALUES (?, ?, 'KEEP', '')",
+            ((f"{group:064x}", f"/bench/{group:08}.mp3") for group in range(0, args.groups, 50)),
+        )
+        conn.commit()
+        statements = 0
+
+        def count(_: str) -> None:
+            nonlocal statements
+            statements += 1
+
+        conn.set_trace_callback(count)
+        started = time.perf_counter()
+        reporter = Reporter(quiet=True, progress=False)
+        operations = list(_plan_dedupe(conn, "move", Path("/dupes"), True, reporter, 0.9, 0.5, {}))
+        elapsed = time.perf_counter() - started
+        conn.set_trace_callback(None)
+        print(
+            f"dedupe planning: {len(operations)} operations in {elapsed:.2f}s, "
+            f"{statements} SQL statements"
+        )
+
+        if args.legacy:
+            conn.execute("DROP INDEX idx_files_blake3")
+            started = time.perf_counter()
+            hashes = conn.execute(
+                "SELECT blake3 FROM files WHERE blake3 IS NOT NULL "
+                "GROUP BY blake3 HAVING COUNT(*) > 1"
+            ).fetchall()
+            legacy = 0
+            for row in hashes:
+                query = db_layer.FILES_WITH_TAGS + "WHERE files.blake3 = ?"
+                conn.execute(query, (row[0],)).fetchall()
+                legacy += 1
+                if time.perf_counter() - started > args.legacy_timeout:
+                    break
+            elapsed = time.perf_counter() - started
+            print(
+                f"query per group, no index: {legacy} of {len(hashes)} groups in {elapsed:.2f}s "
+                f"(~{elapsed / legacy * len(hashes):,.0f}s projected)"
+            )
+
+
+def bench_db(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        path = Path(tmp) / "db.sqlite3"
+        conn = db_layer.connect(path)
+        rng = random.Random(args.seed)
+        conn.executemany(
+            "INSERT INTO files (path, size, mtime, blake3, has_art, hash_level) "
+            "VALUES (?, ?, ?, ?, ?, 'full')",
+            (
+                (f"/bench/{idx:08}.mp3", 4_000_000, 0.0, f"{rng.getrandbits(256):064x}", idx % 2)
+                for idx in range(args.files)
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO operations (op_id, plan_id, op_type, path, status) "
+            "VALUES (?, ?, 'move', ?, 'applied')",
+            ((f"op{idx}", f"plan{idx % args.plans}", f"/bench/{idx:08}.mp3")
+             for idx in range(args.operations)),
+        )
+        conn.executemany(
+            "INSERT INTO group_overrides (group_hash, path, action, updated_at) "
+            "VALUES (?, ?, 'KEEP', '')",
+            ((f"{idx // 2:064x}", f"/bench/{idx:08}.mp3") for idx in range(args.overrides)),
+        )
+        conn.commit()
+        conn.close()
+        # "before" is the pre-versioning layout: default pragmas, no lookup indexes, and
+        # the whole setup script run on every connect.
+        for label, baseline in (("before", True), ("after", False)):
+            print(f"-- {label}")
+            _bench_db_state(path, args, baseline)
+
+
+def _bench_db_state(path: Path, args: argparse.Namespace, baseline: bool) -> None:
+    def connect() -> sqlite3.Connection:
+        if not baseline:
+            return db_layer.connect(path)
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        conn.execute("BEGIN")
+        db_layer._migrate_baseline(conn)
+        conn.commit()
+        return conn
+
+    conn = sqlite3.connect(path)
+    if baseline:
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.execute("DROP INDEX IF EXISTS idx_files_missing_art")
+        conn.execute("DROP INDEX IF EXISTS idx_operations_plan")
+    else:
+        conn.execute("BEGIN")
+        db_layer._migrate_lookup_indexes(conn)
+        conn.commit()
+    conn.close()
+
+    started = time.perf_counter()
+    for _ in range(args.runs):
+        connect().close()
+    elapsed = (time.perf_counter() - started) / args.runs
+    print(f"connect: {elapsed * 1000:.2f} ms")
+
+    conn = connect()
+    mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    print(f"journal_mode={mode}")
+    queries = [
+        ("files missing art", "SELECT * FROM files WHERE has_art = 0 ORDER BY path", 1),
+        ("file by blake3", "SELECT * FROM files WHERE blake3 = ?", 1000),
+        ("operations by plan", "SELECT * FROM operations WHERE plan_id = ?", 100),
+        ("overrides by group", "SELECT * FROM group_overrides WHERE group_hash = ?", 1000),
+    ]
+    keys = {
+        "file by blake3": [row[0] for row in conn.execute("SELECT blake3 FROM files LIMIT 1000")],
+        "operations by plan": [f"plan{idx % args.plans}" for idx in range(100)],
+        "overrides by group": [f"{idx:064x}" for idx in range(1000)],
+    }
+    for label, query, count in queries:
+        started = time.perf_counter()
+        for idx in range(count):
+            params = (keys[label][idx],) if label in keys else ()
+            conn.execute(query, params).fetchall()
+        elapsed = time.perf_counter() - started
+        print(f"{label}: {count} queries in {elapsed * 1000:.1f} ms")
+
+    started = time.perf_counter()
+    for start in range(0, args.files, 500):
+        conn.executemany(
+            "UPDATE files SET mtime = ? WHERE id = ?",
+            ((1.0, idx + 1) for idx in range(start, min(start + 500, args.files))),
+        )
+        conn.commit()
+    elapsed = time.perf_counter() - started
+    print(f"update {args.files} rows in 500-row commits: {elapsed:.2f}s")
+    conn.close()
+
+
+def bench_plan(args: argparse.Namespace) -> None:
+    def operations():
+        for idx in range(args.operations):
+            yield Operation.create(
+                "move",
+                Path(f"/music/artist{idx // 1000:05}/{idx:08} track.flac"),
+                Path(f"/music/_dupes/{idx:08} track.flac"),
+                "Exact duplicate by blake3",
+                confidence=0.99,
+                sources=["hash"],
+                metadata={"group_id": idx // 2, "group_hash": f"{idx // 2:064x}"},
+            )
+
+    def measure(label: str, action) -> None:
+        tracemalloc.start()
+        started = time.perf_counter()
+        action()
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{label}: {elapsed:.2f}s, peak {peak / 1e6:,.1f} MB")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = Path(tmp) / "plan.json"
+        stream = Path(tmp) / "plan.ndjson"
+
+        def write_legacy() -> None:
+            legacy.write_text(Plan.create([Path("/music")], list(operations())).to_json())
+
+        def read_legacy() -> None:
+            plan = Plan.from_dict(json.loads(legacy.read_text()))
+            for _ in plan.operations:
+                pass
+
+        def write_stream() -> None:
+            with stream.open("w", encoding="utf-8") as handle:
+                Plan.create([Path("/music")], operations()).write_ndjson(handle)
+
+        def read_stream() -> None:
+            for _ in Plan.load(stream).operations:
+                pass
+
+        print(f"{args.operations} operations")
+        measure("JSON document write", write_legacy)
+        measure("JSON document read", read_legacy)
+        measure("NDJSON write", write_stream)
+        measure("NDJSON read", read_stream)
+        size = legacy.stat().st_size, stream.stat().st_size
+        print(f"file size: JSON {size[0] / 1e6:,.0f} MB, NDJSON {size[1] / 1e6:,.0f} MB")
+
+
+def bench_journal(args: argparse.Namespace) -> None:
+    reporter = Reporter(quiet=True, progress=False)
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        root = Path(tmp)
+        conn = db_layer.connect(root / "journal.sqlite3")
+        for batch in args.fsync_batches:
+            library = root / f"lib{batch}"
+            library.mkdir()
+            operations = []
+            for idx in range(args.operations):
+                path = library / f"{idx:06}.mp3"
+                path.write_bytes(b"x")
+                operations.append(
+                    Operation.create(
+                        "rename", path, library / "renamed" / path.name, "bench", confidence=1.0
+                    )
+                )
+            plan = Plan.create([library], operations)
+            started = time.perf_counter()
+            apply_plan(plan, conn, reporter, root / "journal", fsync_batch=batch)
+            elapsed = time.perf_counter() - started
+            print(
+                f"fsync every {batch} ops: {args.operations / elapsed:,.0f} ops/s "
+                f"({elapsed:.2f}s, {-(-args.operations // batch) + 2} fsyncs)"
+            )
+
+
+def bench_journals(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        journal_dir = Path(tmp) / "journal"
+        journal_dir.mkdir()
+        entry = json.dumps({"type": "result", "op_id": "x" * 36, "path": "/music/" + "y" * 60})
+        body = "\n".join([entry] * args.entries) + "\n"
+        for idx in range(args.journals):
+            journal_id = f"{idx:08}-journal"
+            header = {"type": "header", "journal_id": journal_id, "plan_id": f"plan-{idx}"}
+            header["created_at"] = f"2025-01-01T00:00:00.{idx:08}Z"
+            (journal_dir / f"{journal_id}.jsonl").write_text(
+                json.dumps(header) + "\n" + body + '{"type": "complete"}\n', encoding="utf-8"
+            )
+        conn = db_layer.connect(Path(tmp) / "journals.sqlite3")
+        started = time.perf_counter()
+        index_journals(conn, journal_dir)
+        print(f"one-off reindex of {args.journals} journals: {time.perf_counter() - started:.2f}s")
+
+        plan_id = f"plan-{args.journals // 2}"
+        started = time.perf_counter()
+        newest = journal_paths(journal_dir)[0]
+        directory_last = time.perf_counter() - started
+        started = time.perf_counter()
+        matching = [
+            path for path in journal_paths(journal_dir) if read_journal(path).plan_id == plan_id
+        ]
+        directory_plan = time.perf_counter() - started
+        started = time.perf_counter()
+        row = db_layer.latest_journal(conn)
+        indexed_last = time.perf_counter() - started
+        started = time.perf_counter()
+        rows = db_layer.list_journals(conn, plan_id=plan_id)
+        indexed_plan = time.perf_counter() - started
+        assert Path(row["path"]).name == newest.name and len(rows) == len(matching) == 1
+        print(
+            f"last journal:    directory {directory_last * 1000:,.1f} ms, "
+            f"index {indexed_last * 1000:,.2f} ms"
+        )
+        print(
+            f"journal by plan: directory {directory_plan * 1000:,.1f} ms, "
+            f"index {indexed_plan * 1000:,.2f} ms"
+        )
+
+
+def bench_apply(args: argparse.Namespace) -> None:
+    reporter = Reporter(quiet=True, progress=False)
+    if args.latency_ms:
+        # Model a network mount: every move waits on a round trip before it completes.
+        move = applier.move_file
+
+        def slow_move(src: Path, dst: Path, keep_existing: bool = False) -> tuple[str, int]:
+            time.sleep(args.latency_ms / 1000)
+            return move(src, dst, keep_existing)
+
+        applier.move_file = slow_move
+    payload = os.urandom(args.size_kb * 1024)
+    with tempfile.TemporaryDirectory(dir=args.src) as src, tempfile.TemporaryDirectory(
+        dir=args.dst
+    ) as dst:
+        conn = db_layer.connect(Path(src) / "apply.sqlite3")
+        for jobs in args.jobs:
+            library = Path(src) / f"lib{jobs}"
+            operations = []
+            for idx in range(args.files):
+                path = library / f"album{idx % 50:02}" / f"{idx:05}.flac"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(payload)
+                target = Path(dst) / f"jobs{jobs}" / path.parent.name / path.name
+                if args.quarantine:
+                    operations.append(Operation.create("delete", path, None, "bench", 1.0))
+                else:
+                    operations.append(Operation.create("move", path, target, "bench", 1.0))
+            digest = blake3_file(operations[0].path)
+            for op in operations:
+                stat = op.path.stat()
+                record = FileRecord(None, op.path, stat.st_size, stat.st_mtime, blake3=digest)
+                db_layer.upsert_file(conn, record)
+            conn.commit()
+            plan = Plan.create([library], operations)
+            started = time.perf_counter()
+            applied = apply_plan(
+                plan,
+                conn,
+                reporter,
+                Path(src) / "journal",
+                quarantine_enabled=args.quarantine,
+                quarantine_dir=Path(dst) / f"jobs{jobs}",
+                jobs=jobs,
+            )
+            elapsed = time.perf_counter() - started
+            megabytes = args.files * args.size_kb / 1024
+            strategies = applied["strategies"]
+            copied = applied["bytes_copied"]
+            print(
+                f"jobs={jobs}: {args.files / elapsed:,.0f} files/s, "
+                f"{megabytes / elapsed:,.0f} MB/s ({elapsed:.2f}s), "
+                f"strategies {strategies}, {copied / 1024 / 1024:,.0f} MB copied"
+            )
+            summary = undo(
+                applied["journal_id"], conn, reporter, Path(src) / "journal", jobs=jobs, verify=True
+            )
+            print(
+                f"  undo --verify: {summary['restored'] / summary['seconds']:,.0f} files/s "
+                f"({summary['seconds']:.2f}s, {summary['verified']} verified, "
+                f"{summary['rehashed']} re-hashed)"
+            )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="audioclean micro-benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    rescan = sub.add_parser("rescan", help="Rescan time on an unchanged library")
+    rescan.add_argument("--files", type=int, default=20000)
+    rescan.add_argument("--library", type=Path, default=None)
+    rescan.add_argument("--jobs", type=int, default=4)
+    rescan.add_argument("--runs", type=int, default=3)
+    rescan.set_defaults(func=bench_rescan)
+
+    walk = sub.add_parser("walk", help="First scan time by directory listing workers")
+    walk.add_argument("--files", type=int, default=4000)
+    walk.add_argument("--per-dir", type=int, default=10)
+    walk.add_argument("--jobs", type=int, default=4)
+    walk.add_argument("--walk-jobs", type=int, nargs="+", default=[1, 8, 16])
+    walk.add_argument("--latency-ms", type=float, default=5.0, help="Added delay per listing")
+    walk.set_defaults(func=bench_walk)
+
+    moves = sub.add_parser("moves", help="Rescan after moving and deleting library files")
+    moves.add_argument("--files", type=int, default=4000)
+    moves.add_argument("--per-dir", type=int, default=20)
+    moves.add_argument("--jobs", type=int, default=4)
+    moves.add_argument("--fraction", type=float, default=0.5, help="Share of albums moved")
+    moves.add_argument("--delete-every", type=int, default=10)
+    moves.set_defaults(func=bench_moves)
+
+    writer = sub.add_parser("writer", help="Scan DB writer throughput and crash loss")
+    writer.add_argument("--rows", type=int, default=20000)
+    writer.add_argument("--batch-sizes", type=int, nargs="+", default=[100, 500, 2000])
+    writer.add_argument("--batch-size", type=int, default=500)
+    writer.add_argument("--commit-interval", type=float, default=2.0)
+    writer.add_argument("--crash-rows", type=int, default=5250)
+    writer.add_argument("--crash-after", type=int, default=None, help=argparse.SUPPRESS)
+    writer.add_argument("--db", type=Path, default=None, help=argparse.SUPPRESS)
+    writer.set_defaults(func=bench_writer)
+
+    executor = sub.add_parser("executor", help="Thread vs process scan scaling")
+    executor.add_argument("--files", type=int, default=4000)
+    executor.add_argument("--frames", type=int, default=400)
+    executor.add_argument("--library", type=Path, default=None)
+    executor.add_argument("--jobs", type=int, nargs="+", default=[4, 8, 16, 32])
+    executor.add_argument("--chunk-size", type=int, default=64)
+    executor.set_defaults(func=bench_executor)
+
+    hashing = sub.add_parser("hash", help="BLAKE3 file hashing throughput in MB/s")
+    hashing.add_argument("--file", type=Path, default=None)
+    hashing.add_argument("--size-mb", type=int, default=512)
+    hashing.add_argument("--chunks", type=int, nargs="+", default=[65536, 1048576, 8388608])
+    hashing.add_argument("--runs", type=int, default=3)
+    hashing.set_defaults(func=bench_hash)
+
+    fingerprints = sub.add_parser("fingerprints", help="Fingerprint storage size and load time")
+    fingerprints.add_argument("--files", type=int, default=100000)
+    fingerprints.add_argument("--length", type=int, default=950, help="Sub-fingerprints per file")
+    fingerprints.add_argument("--distinct", type=int, default=1000)
+    fingerprints.add_argument("--seed", type=int, default=1)
+    fingerprints.set_defaults(func=bench_fingerprints)
+
+    acoustic = sub.add_parser("acoustic", help="Fingerprint near-duplicate grouping time")
+    acoustic.add_argument("--files", type=int, default=50000)
+    acoustic.add_argument("--copies", type=int, default=2, help="Encodes per recording")
+    acoustic.add_argument("--length", type=int, default=950)
+    acoustic.add_argument(
+        "--noise-bits", type=int, default=4, help="Flip each bit with probability 2**-N"
+    )
+    acoustic.add_argument("--seed", type=int, default=1)
+    acoustic.set_defaults(func=bench_acoustic)
+
+    groups = sub.add_parser("groups", help="Duplicate grouping query time")
+    groups.add_argument("--groups", type=int, default=80000)
+    groups.add_argument("--copies", type=int, default=2)
+    groups.add_argument("--unique", type=int, default=200000)
+    groups.add_argument("--seed", type=int, default=1)
+    groups.add_argument("--legacy", action="store_true", help="Also time one query per group")
+    groups.add_argument("--legacy-timeout", type=float, default=30.0)
+    groups.set_defaults(func=bench_groups)
+
+    database = sub.add_parser("db", help="Cache DB connect, query and commit time")
+    database.add_argument("--files", type=int, default=200000)
+    database.add_argument("--operations", type=int, default=100000)
+    database.add_argument("--plans", type=int, default=200)
+    database.add_argument("--overrides", type=int, default=20000)
+    database.add_argument("--runs", type=int, default=50)
+    database.add_argument("--seed", type=int, default=1)
+    database.add_argument("--dir", type=Path, default=None, help="Directory for the test DB")
+    database.set_defaults(func=bench_db)
+
+    planning = sub.add_parser("plan", help="Plan file write/read time and peak memory")
+    planning.add_argument("--operations", type=int, default=200000)
+    planning.set_defaults(func=bench_plan)
+
+    journal = sub.add_parser("journal", help="Apply throughput by journal fsync batch size")
+    journal.add_argument("--operations", type=int, default=5000)
+    journal.add_argument("--fsync-batches", type=int, nargs="+", default=[1, 16, 64, 256])
+    journal.add_argument("--dir", type=Path, default=None, help="Directory for the test files")
+    journal.set_defaults(func=bench_journal)
+
+    journals = sub.add_parser("journals", help="Journal lookup by directory scan vs index")
+    journals.add_argument("--journals", type=int, default=3000)
+    journals.add_argument("--entries", type=int, default=200)
+    journals.add_argument("--dir", type=Path, default=None, help="Directory for the test files")
+    journals.set_defaults(func=bench_journals)
+
+    applying = sub.add_parser("apply", help="Apply throughput by workers per device")
+    applying.add_argument("--files", type=int, default=400)
+    applying.add_argument("--size-kb", type=int, default=1024)
+    applying.add_argument("--jobs", type=int, nargs="+", default=[1, 4, 8])
+    applying.add_argument("--src", type=Path, default=None, help="Source directory")
+    applying.add_argument("--dst", type=Path, default=None, help="Destination directory")
+    applying.add_argument("--latency-ms", type=float, default=0.0, help="Added delay per move")
+    applying.add_argument("--quarantine", action="store_true", help="Quarantine deletes instead")
+    applying.set_defaults(func=bench_apply)
+
+    args = parser.parse_args()
+    args.func(args)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
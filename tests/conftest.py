@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+from typing import Callable, Iterator
+
+import pytest
+
+from audioclean.core import db as db_layer
+from audioclean.core.reporter import Reporter
+
+MP3_FRAME = bytes([0xFF, 0xFB, 0x90, 0x64]) + bytes(413)
+
+
+def write_mp3(
+    path: Path,
+    title: str = "Title",
+    artist: str = "Artist",
+    album: str = "Album",
+    frames: int = 40,
+    seed: int = 0,
+) -> Path:
+    """Write a tagged MPEG frame stream; ``seed`` varies the audio bytes."""
+    from mutagen.id3 import ID3, TALB, TIT2, TPE1, TRCK
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    audio = bytearray(MP3_FRAME * frames)
+    audio[-4:] = seed.to_bytes(4, "little")
+    path.write_bytes(bytes(audio))
+    tags = ID3()
+    tags.add(TIT2(encoding=3, text=title))
+    tags.add(TPE1(encoding=3, text=artist))
+    tags.add(TALB(encoding=3, text=album))
+    tags.add(TRCK(encoding=3, text="1"))
+    tags.save(path)
+    return path
+
+
+@pytest.fixture
+def make_mp3() -> Callable[..., Path]:
+    return write_mp3
+
+
+@pytest.fixture
+def conn(tmp_path: Path) -> Iterator[sqlite3.Connection]:
+    connection = db_layer.connect(tmp_path / "cache.db")
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def reporter() -> Reporter:
+    return Reporter(quiet=True, progress=False)
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import random
+from array import array
+from pathlib import Path
+
+from audioclean.core import db as db_layer
+from audioclean.core.models import FileRecord
+from audioclean.engine.acoustic import find_acoustic_groups
+from audioclean.engine.duplicates import list_duplicate_groups, refresh_duplicate_groups
+from audioclean.utils.chromaprint import raw_to_blob
+
+
+def fingerprint(seed: int, frames: int = 600) -> array:
+    rng = random.Random(seed)
+    return array("I", (rng.getrandbits(32) for _ in range(frames)))
+
+
+def noisy(values: array, seed: int) -> array:
+    # One of 32 bits flips per frame, a ~3% bit error rate.
+    rng = random.Random(seed)
+    return array("I", (value ^ (1 << rng.randrange(32)) for value in values))
+
+
+def add_file(conn, name: str, values: array, duration: float) -> int:
+    path = Path("/music") / name
+    file_id = db_layer.upsert_file(
+        conn, FileRecord(id=None, path=path, size=1000, mtime=1.0, duration=duration)
+    )
+    db_layer.write_fingerprints(conn, [(path, raw_to_blob(values))])
+    conn.commit()
+    return file_id
+
+
+def test_near_duplicates_group_within_duration_tolerance(conn) -> None:
+    song = fingerprint(1)
+    original = add_file(conn, "original.flac", song, 80.0)
+    reencode = add_file(conn, "reencode.mp3", noisy(song, 2), 81.0)
+    add_file(conn, "other.mp3", fingerprint(3), 80.5)
+    add_file(conn, "long edit.mp3", song, 95.0)
+
+    groups = find_acoustic_groups(conn)
+
+    assert [sorted(file_ids) for file_ids, _ in groups] == [[original, reencode]]
+    assert 0.9 < groups[0][1] < 1.0
+
+
+def test_fingerprint_group_keeps_its_key_and_overrides_as_it_grows(conn) -> None:
+    song = fingerprint(4)
+    first = add_file(conn, "a.flac", song, 80.0)
+    add_file(conn, "b.mp3", noisy(song, 5), 80.0)
+    refresh_duplicate_groups(conn, True, "fingerprint")
+    [group] = list_duplicate_groups(conn, True, match="fingerprint")
+    db_layer.upsert_group_override(
+        conn, group.group_hash, Path("/music/b.mp3"), "keep", None, "2026-01-01T00:00:00Z"
+    )
+    conn.commit()
+
+    add_file(conn, "c.ogg", noisy(song, 6), 80.0)
+    refresh_duplicate_groups(conn, True, "fingerprint")
+    [grown] = list_duplicate_groups(conn, True, match="fingerprint")
+
+    assert grown.group_hash == group.group_hash == f"fp-{first}"
+    assert len(grown.members) == 3
+    assert list(db_layer.get_group_overrides(conn, grown.group_hash)) == ["/music/b.mp3"]
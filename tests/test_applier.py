@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from audioclean.core import db as db_layer
+from audioclean.core.journal import JournalWriter, read_journal
+from audioclean.core.models import Journal, Operation, Plan
+from audioclean.core.reporter import Reporter
+from audioclean.engine.applier import _identity, _recover_operation, apply_plan, undo
+
+
+def test_quarantine_collision_is_a_conflict_for_that_delete_only(tmp_path: Path) -> None:
+    library = tmp_path / "library"
+    quarantine = tmp_path / "quarantine"
+    library.mkdir()
+    quarantine.mkdir()
+    for name in ("taken.mp3", "free.mp3"):
+        (library / name).write_bytes(name.encode())
+    (quarantine / "taken.mp3").write_bytes(b"quarantined earlier")
+    plan = Plan.create([library], [])
+    plan.operations = [
+        Operation.create("delete", library / name, None, "duplicate", 1.0)
+        for name in ("taken.mp3", "free.mp3")
+    ]
+    conn = db_layer.connect(tmp_path / "cache.db")
+
+    summary = apply_plan(
+        plan,
+        conn,
+        Reporter(quiet=True, progress=False),
+        tmp_path / "journals",
+        quarantine_enabled=True,
+        quarantine_dir=quarantine,
+    )
+
+    assert summary["statuses"] == {"conflict": 1, "quarantined": 1}
+    assert (library / "taken.mp3").read_bytes() == b"taken.mp3"
+    assert (quarantine / "taken.mp3").read_bytes() == b"quarantined earlier"
+    assert (quarantine / "free.mp3").exists() and not (library / "free.mp3").exists()
+    state = read_journal(Path(summary["journal_path"]))
+    assert state.complete and not state.pending
+
+
+def test_failed_rename_is_journaled_and_undo_moves_nothing_else(tmp_path: Path) -> None:
+    library = tmp_path / "lib"
+    quarantine = tmp_path / "quarantine"
+    for name, content in (("a/t0.flac", b"t0"), ("b/dup0.flac", b"dup0")):
+        (library / name).parent.mkdir(parents=True, exist_ok=True)
+        (library / name).write_bytes(content)
+    plan = Plan.create([library], [])
+    plan.operations = [
+        Operation.create("delete", library / "b/dup0.flac", None, "duplicate", 1.0),
+        Operation.create("rename", library / "a/t0.flac", library / "A/T0.flac", "layout", 1.0),
+        Operation.create("rename", library / "b/dup0.flac", library / "A/T0.flac", "layout", 1.0),
+    ]
+    conn = db_layer.connect(tmp_path / "cache.db")
+    reporter = Reporter(quiet=True, progress=False)
+
+    with pytest.raises(FileNotFoundError):
+        apply_plan(
+            plan,
+            conn,
+            reporter,
+            tmp_path / "journals",
+            quarantine_enabled=True,
+            quarantine_dir=quarantine,
+        )
+    [row] = db_layer.list_journals(conn)
+    state = read_journal(Path(row["path"]))
+    assert [entry["status"] for entry in state.entries] == ["quarantined", "moved", "failed"]
+    assert not state.pending
+
+    summary = undo("last", conn, reporter, tmp_path / "journals", verify=True)
+
+    assert summary["restored"] == 2 and summary["conflict"] == 0
+    assert (library / "a/t0.flac").read_bytes() == b"t0"
+    assert (library / "b/dup0.flac").read_bytes() == b"dup0"
+    assert not (library / "A/T0.flac").exists()
+
+
+def test_interrupted_intent_is_only_restored_from_its_own_file(tmp_path: Path) -> None:
+    library = tmp_path / "lib"
+    library.mkdir()
+    (library / "t0.flac").write_bytes(b"t0")
+    (library / "other.flac").write_bytes(b"other")
+    op = Operation.create("rename", library / "t0.flac", library / "T0.flac", "layout", 1.0)
+    journal = Journal.create("plan")
+    # A crash after the intent was synced; another file then took the target.
+    with JournalWriter.create(tmp_path / "journals", journal) as writer:
+        writer.intent(op, op.new_path, _identity(op.path))
+        writer.sync()
+    (library / "t0.flac").rename(library / "moved-away.flac")
+    (library / "other.flac").rename(library / "T0.flac")
+    conn = db_layer.connect(tmp_path / "cache.db")
+
+    recovered = _recover_operation(op, read_journal(writer.path).pending[op.op_id])
+    reporter = Reporter(quiet=True, progress=False)
+    summary = undo(journal.journal_id, conn, reporter, tmp_path / "journals")
+
+    assert recovered["status"] == "conflict"
+    assert summary["conflict"] == 1 and summary["restored"] == 0
+    assert (library / "T0.flac").read_bytes() == b"other"
+    assert not (library / "t0.flac").exists()
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import random
+from array import array
+from pathlib import Path
+
+from audioclean.core import db as db_layer
+from audioclean.core.models import FileRecord
+from audioclean.engine.scanner import scan
+from audioclean.utils.chromaprint import (
+    blob_to_raw,
+    decode_fingerprint,
+    encode_fingerprint,
+    raw_to_blob,
+)
+
+
+def random_raw(count: int = 300, seed: int = 0) -> array:
+    rng = random.Random(seed)
+    return array("I", (rng.getrandbits(32) for _ in range(count)))
+
+
+def test_raw_blob_is_four_bytes_per_value() -> None:
+    values = random_raw()
+    blob = raw_to_blob(values)
+
+    assert len(blob) == 4 * len(values)
+    assert list(blob_to_raw(blob)) == list(values)
+
+
+def test_compressed_fingerprint_round_trips() -> None:
+    values = random_raw(seed=1)
+
+    assert list(decode_fingerprint(encode_fingerprint(values))) == list(values)
+
+
+def test_scan_backfills_raw_blob_for_text_fingerprints(tmp_path: Path, conn, reporter) -> None:
+    values = random_raw(seed=2)
+    file_id = db_layer.upsert_file(
+        conn, FileRecord(id=None, path=tmp_path / "old.flac", size=1, mtime=1.0)
+    )
+    conn.execute(
+        "INSERT INTO fingerprints (file_id, chromaprint, raw) VALUES (?, ?, NULL)",
+        (file_id, encode_fingerprint(values)),
+    )
+    conn.commit()
+
+    scan([tmp_path / "empty"], conn, 1, reporter)
+
+    raws = db_layer.get_raw_fingerprints(conn, [file_id])
+    assert list(raws[file_id]) == list(values)
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from audioclean.core.config import load_config
+
+
+@pytest.mark.parametrize(
+    ("key", "value"), [("scan_executor", "fork"), ("duplicate_match", "name")]
+)
+def test_load_config_rejects_unknown_choice(tmp_path: Path, key: str, value: str) -> None:
+    path = tmp_path / "config.toml"
+    path.write_text(f"{key} = '{value}'\n", encoding="utf-8")
+
+    with pytest.raises(ValueError, match=key):
+        load_config(path)
+
+
+def test_load_config_accepts_process_executor(tmp_path: Path) -> None:
+    path = tmp_path / "config.toml"
+    path.write_text("scan_executor = 'process'\n", encoding="utf-8")
+
+    assert load_config(path).scan_executor == "process"
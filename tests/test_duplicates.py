@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from audioclean.core import db as db_layer
+from audioclean.core.models import FileRecord
+from audioclean.engine.duplicates import list_duplicate_groups, refresh_duplicate_groups
+from audioclean.engine.planner import _plan_dedupe
+
+
+def add_file(conn, name: str, blake3: str | None, size: int = 1000, codec: str = "mp3") -> int:
+    record = FileRecord(
+        id=None,
+        path=Path("/music") / name,
+        size=size,
+        mtime=1.0,
+        blake3=blake3,
+        hash_level="full" if blake3 else "size",
+        container=codec.upper(),
+        codec=f"audio/{codec}",
+    )
+    return db_layer.upsert_file(conn, record)
+
+
+def test_duplicates_stream_as_groups_in_hash_order(conn) -> None:
+    add_file(conn, "b1.mp3", "bb")
+    add_file(conn, "a1.mp3", "aa")
+    add_file(conn, "lonely.mp3", "cc")
+    add_file(conn, "b2.mp3", "bb")
+    add_file(conn, "a2.mp3", "aa")
+    add_file(conn, "unhashed.mp3", None)
+    add_file(conn, "b3.mp3", "bb")
+
+    groups = [
+        [Path(row["path"]).name for row in rows] for rows in db_layer.iter_duplicates_by_hash(conn)
+    ]
+
+    assert groups == [["a1.mp3", "a2.mp3"], ["b1.mp3", "b2.mp3", "b3.mp3"]]
+
+
+def test_stored_groups_keep_their_ids_as_members_change(conn) -> None:
+    add_file(conn, "a1.mp3", "aa")
+    add_file(conn, "a2.flac", "aa", codec="flac")
+    add_file(conn, "b1.mp3", "bb")
+    b2 = add_file(conn, "b2.mp3", "bb")
+    assert refresh_duplicate_groups(conn, True) == 2
+    before = {group.group_hash: group for group in list_duplicate_groups(conn, True)}
+    assert Path(before["aa"].canonical["path"]).name == "a2.flac"
+
+    add_file(conn, "a3.mp3", "aa")
+    db_layer.delete_files(conn, [b2])
+    conn.commit()
+    # Listing reads the stored groups as they were; only a refresh regroups.
+    [stale] = list_duplicate_groups(conn, True)
+    assert (stale.group_hash, len(stale.members)) == ("aa", 2)
+
+    assert refresh_duplicate_groups(conn, True) == 2
+    after = {group.group_hash: group for group in list_duplicate_groups(conn, True)}
+    assert list(after) == ["aa"]
+    assert after["aa"].group_id == before["aa"].group_id
+    assert len(after["aa"].members) == 3
+    assert refresh_duplicate_groups(conn, True) == 0
+
+
+def test_dedupe_planning_loads_overrides_in_one_query(conn, reporter) -> None:
+    for group in range(20):
+        add_file(conn, f"{group:02}.flac", f"{group:02}", codec="flac")
+        add_file(conn, f"{group:02}.mp3", f"{group:02}")
+    db_layer.upsert_group_override(
+        conn, "07", Path("/music/07.mp3"), "keep", None, "2026-01-01T00:00:00Z"
+    )
+    conn.commit()
+    refresh_duplicate_groups(conn, True)
+    statements = []
+    conn.set_trace_callback(statements.append)
+
+    ops = list(_plan_dedupe(conn, "delete", None, True, reporter, 0.9, 0.75, {}))
+
+    conn.set_trace_callback(None)
+    assert len([sql for sql in statements if "group_overrides" in sql]) == 1
+    deleted = sorted(op.path.name for op in ops if op.op_type == "delete")
+    assert deleted == [f"{group:02}.mp3" for group in range(20) if group != 7]
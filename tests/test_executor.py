@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+from audioclean.core.models import Operation
+from audioclean.engine.executor import DeviceExecutor
+
+
+def test_slow_target_device_does_not_hold_up_other_targets(monkeypatch) -> None:
+    devices = {"src": 1, "slow": 2, "fast": 3}
+    monkeypatch.setattr(DeviceExecutor, "device", lambda self, path: devices[path.parent.name])
+    batch = [
+        Operation.create("move", Path(f"src/a{idx}.mp3"), None, "test", 1.0) for idx in range(8)
+    ]
+    targets = [Path("slow" if idx % 4 < 2 else "fast") / f"b{idx}.mp3" for idx in range(8)]
+    started = time.monotonic()
+    finished: dict[Path, float] = {}
+
+    def apply_one(op: Operation, target: Path | None) -> dict:
+        if target.parent.name == "slow":
+            time.sleep(0.1)
+        finished[target] = time.monotonic() - started
+        return {}
+
+    with DeviceExecutor(2) as executor:
+        results, error = executor.run(batch, targets, apply_one)
+        assert sorted(executor._pools) == [(1, 2), (1, 3)]
+    assert error is None and len(results) == 8
+    assert max(finished[target] for target in targets if target.parent.name == "fast") < 0.1
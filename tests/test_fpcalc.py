@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import os
+import sys
+from array import array
+from pathlib import Path
+
+import pytest
+
+from audioclean.utils.chromaprint import blob_to_raw
+from audioclean.utils.fpcalc import FpcalcSettings, fingerprint_many
+
+FAKE_FPCALC = """
+import json, sys
+paths = [arg for arg in sys.argv[1:] if not arg.startswith("-") and not arg.isdigit()]
+failed = False
+for path in paths:
+    if "bad" in path:
+        failed = True
+        continue
+    print(json.dumps({"duration": 1.5, "fingerprint": [len(path), -1]}))
+sys.exit(1 if failed else 0)
+"""
+
+
+@pytest.fixture
+def fake_fpcalc(tmp_path: Path, monkeypatch) -> None:
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "fpcalc"
+    script.write_text(f"#!{sys.executable}\n{FAKE_FPCALC}", encoding="utf-8")
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+
+@pytest.mark.usefixtures("fake_fpcalc")
+def test_paths_are_read_lazily_with_bounded_batches_in_flight(tmp_path: Path) -> None:
+    settings = FpcalcSettings(batch_size=3, jobs=2)
+    consumed = []
+
+    def paths():
+        for idx in range(40):
+            consumed.append(idx)
+            yield tmp_path / f"{idx:02}.mp3"
+
+    results = []
+    for result in fingerprint_many(paths(), settings):
+        results.append(result)
+        assert len(consumed) <= len(results) + settings.jobs * 2 * settings.batch_size
+
+    assert sorted(result.path.name for result in results) == [f"{idx:02}.mp3" for idx in range(40)]
+    first = results[0]
+    assert blob_to_raw(first.raw) == array("I", [len(str(first.path)), 0xFFFFFFFF])
+    assert first.duration == 1.5
+
+
+@pytest.mark.usefixtures("fake_fpcalc")
+def test_failed_batch_is_retried_file_by_file(tmp_path: Path) -> None:
+    paths = [tmp_path / "good.mp3", tmp_path / "bad.mp3", tmp_path / "fine.mp3"]
+
+    results = {result.path.name: result for result in fingerprint_many(paths, FpcalcSettings())}
+
+    assert results["good.mp3"].raw and results["fine.mp3"].raw
+    assert results["bad.mp3"].raw is None and results["bad.mp3"].error
+
+
+def test_missing_fpcalc_reports_every_path(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("PATH", str(tmp_path))
+
+    results = list(fingerprint_many(iter([tmp_path / "a.mp3", tmp_path / "b.mp3"])))
+
+    assert [result.error for result in results] == ["fpcalc not found in PATH"] * 2
+    assert [result.path.name for result in results] == ["a.mp3", "b.mp3"]
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import shutil
+from pathlib import Path
+
+from blake3 import blake3
+
+from audioclean.engine.scanner import scan
+from audioclean.utils.hash import HashSettings, blake3_file, blake3_with
+
+
+def hash_rows(conn) -> dict[str, tuple]:
+    rows = conn.execute("SELECT path, sample_hash, blake3, hash_level FROM files")
+    return {Path(row["path"]).name: tuple(row)[1:] for row in rows}
+
+
+def test_only_sample_collisions_are_fully_hashed(tmp_path: Path, conn, reporter, make_mp3):
+    library = tmp_path / "lib"
+    original = make_mp3(library / "a.mp3", frames=600)
+    shutil.copy(original, library / "copy.mp3")
+    make_mp3(library / "tail.mp3", frames=600, seed=1)
+    # Differs only between the sampled head and middle blocks.
+    between = bytearray(original.read_bytes())
+    between[70_000] ^= 0xFF
+    (library / "between.mp3").write_bytes(bytes(between))
+    make_mp3(library / "unique.mp3", frames=700)
+
+    scan([library], conn, 2, reporter)
+    rows = hash_rows(conn)
+
+    assert rows["unique.mp3"] == (None, None, "size")
+    assert rows["tail.mp3"][1:] == (None, "sample")
+    assert rows["a.mp3"][0] == rows["between.mp3"][0] == rows["copy.mp3"][0]
+    assert rows["a.mp3"][1:] == (blake3_file(original), "full")
+    assert rows["copy.mp3"][1] == rows["a.mp3"][1] != rows["between.mp3"][1]
+
+
+def test_mapped_threaded_hash_matches_streamed_hash(tmp_path: Path) -> None:
+    path = tmp_path / "large.flac"
+    path.write_bytes(bytes(range(256)) * 20_000)
+    streamed = blake3_file(path, chunk_size=4096)
+
+    assert blake3_file(path, mmap_threshold=1024, max_threads=2) == streamed
+    assert blake3_with(path, HashSettings(chunk_size=65536, mmap_threshold=1024)) == streamed
+    assert blake3_file(path, chunk_size=4096) == blake3(path.read_bytes()).hexdigest()
+
+
+def test_empty_file_is_hashed_without_mapping(tmp_path: Path) -> None:
+    path = tmp_path / "empty.mp3"
+    path.write_bytes(b"")
+
+    assert blake3_file(path, mmap_threshold=0) == blake3(b"").hexdigest()
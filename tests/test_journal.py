@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+from audioclean.core import db as db_layer
+from audioclean.core.journal import ensure_journal_index, index_journals
+from audioclean.core.models import FileRecord, Journal, Operation, Plan
+from audioclean.engine.applier import apply_plan, undo
+from audioclean.utils.hash import HashSettings, blake3_with
+
+
+def rename_plan(library: Path, name: str) -> Plan:
+    (library / name).write_bytes(name.encode())
+    plan = Plan.create([library], [])
+    plan.operations = [
+        Operation.create("rename", library / name, library / f"new-{name}", "layout", 1.0)
+    ]
+    return plan
+
+
+def test_apply_registers_journals_and_old_files_are_indexed(tmp_path: Path, reporter) -> None:
+    library = tmp_path / "library"
+    library.mkdir()
+    journals = tmp_path / "journals"
+    journals.mkdir()
+    legacy = Journal.create("old-plan")
+    legacy.entries = [{"op_id": "1", "status": "moved", "path": "a", "new_path": "b"}]
+    (journals / f"{legacy.journal_id}.json").write_text(json.dumps(legacy.to_dict()))
+    conn = db_layer.connect(tmp_path / "cache.db")
+    ensure_journal_index(conn, journals)
+    [row] = db_layer.list_journals(conn)
+    assert (row["journal_id"], row["entries"], row["status"]) == (legacy.journal_id, 1, "complete")
+
+    plan = rename_plan(library, "a.mp3")
+    summary = apply_plan(plan, conn, reporter, journals)
+
+    latest = db_layer.latest_journal(conn)
+    assert latest["journal_id"] == summary["journal_id"]
+    assert (latest["plan_id"], latest["entries"], latest["status"]) == (plan.plan_id, 1, "complete")
+    assert latest["byte_offset"] == Path(summary["journal_path"]).stat().st_size
+    assert [row["journal_id"] for row in db_layer.list_journals(conn, plan_id="old-plan")] == [
+        legacy.journal_id
+    ]
+    assert index_journals(conn, journals) == 0
+
+
+def test_undo_last_skips_dry_runs_and_verifies_only_hashed_files(
+    tmp_path: Path, conn, reporter
+) -> None:
+    library = tmp_path / "library"
+    library.mkdir()
+    journals = tmp_path / "journals"
+    plan = Plan.create([library], [])
+    plan.operations = []
+    for index in range(6):
+        path = library / f"{index}.mp3"
+        path.write_bytes(bytes([index]) * 100)
+        stat = path.stat()
+        # Only even files were hashed by scan.
+        blake3 = blake3_with(path, HashSettings()) if index % 2 == 0 else None
+        record = FileRecord(
+            id=None, path=path, size=stat.st_size, mtime=stat.st_mtime, blake3=blake3
+        )
+        db_layer.upsert_file(conn, record)
+        plan.operations.append(
+            Operation.create("rename", path, library / f"new-{index}.mp3", "layout", 1.0)
+        )
+    conn.commit()
+    apply_plan(plan, conn, reporter, journals, jobs=4)
+    dry = apply_plan(rename_plan(library, "x.mp3"), conn, reporter, journals, dry_run=True)
+    assert db_layer.get_journal(conn, dry["journal_id"])["status"] == "dry-run"
+
+    summary = undo("last", conn, reporter, journals, jobs=4, verify=True)
+
+    assert summary["restored"] == 6
+    assert (summary["verified"], summary["unverified"], summary["mismatch"]) == (3, 3, 0)
+    assert sorted(path.name for path in library.iterdir()) == [
+        *(f"{index}.mp3" for index in range(6)),
+        "x.mp3",
+    ]
+    with pytest.raises(FileNotFoundError):
+        undo("last", conn, reporter, journals)
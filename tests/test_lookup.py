@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import random
+from array import array
+from pathlib import Path
+
+import audioclean.engine.lookup as lookup
+from audioclean.core import db as db_layer
+from audioclean.core.models import FileRecord
+from audioclean.engine.lookup import lookup_file
+from audioclean.utils.chromaprint import index_keys, raw_to_blob
+from audioclean.utils.fpcalc import FingerprintResult
+
+
+def fingerprint(seed: int, frames: int = 600) -> array:
+    rng = random.Random(seed)
+    return array("I", (rng.getrandbits(32) for _ in range(frames)))
+
+
+def add_file(conn, name: str, values: array) -> int:
+    path = Path("/music") / name
+    file_id = db_layer.upsert_file(conn, FileRecord(id=None, path=path, size=1000, mtime=1.0))
+    db_layer.write_fingerprints(conn, [(path, raw_to_blob(values))])
+    conn.commit()
+    return file_id
+
+
+def test_lookup_ranks_indexed_files(conn, monkeypatch) -> None:
+    song = fingerprint(1)
+    exact = add_file(conn, "exact.flac", song)
+    partial = add_file(conn, "partial.mp3", song[:300] + fingerprint(2, 300))
+    add_file(conn, "other.mp3", fingerprint(3))
+    query = Path("/incoming/query.mp3")
+    monkeypatch.setattr(
+        lookup,
+        "fingerprint_many",
+        lambda paths, settings: iter([FingerprintResult(path=query, raw=raw_to_blob(song))]),
+    )
+
+    candidates = lookup_file(conn, query)
+
+    assert [candidate.file_id for candidate in candidates] == [exact, partial]
+    assert candidates[0].matched and candidates[0].similarity == 1.0
+    assert not candidates[1].matched
+    assert candidates[0].shared_segments > candidates[1].shared_segments
+
+
+def test_fingerprints_are_marked_indexed_once_written(conn) -> None:
+    add_file(conn, "a.flac", fingerprint(4))
+    assert db_layer.get_unindexed_fingerprint_ids(conn) == []
+
+    conn.execute("UPDATE fingerprints SET indexed = 0")
+    conn.execute("DELETE FROM fingerprint_index")
+    [file_id] = db_layer.get_unindexed_fingerprint_ids(conn)
+    raws = db_layer.get_raw_fingerprints(conn, [file_id])
+    db_layer.index_fingerprints(conn, [(file_id, index_keys(raws[file_id]))])
+
+    assert db_layer.get_unindexed_fingerprint_ids(conn) == []
+    assert conn.execute("SELECT COUNT(*) FROM fingerprint_index").fetchone()[0] > 0
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import audioclean.engine.meta as meta
+from audioclean.core.config import Config
+from audioclean.engine.meta import collect_meta_issues, meta_fix
+from audioclean.engine.scanner import scan
+
+
+def scanned_config(tmp_path: Path, conn, reporter, make_mp3) -> Config:
+    make_mp3(tmp_path / "lib" / "wrong name.mp3", title="Song", artist="Band")
+    scan([tmp_path / "lib"], conn, 1, reporter)
+    return Config(db_path=tmp_path / "cache.db", journal_dir=tmp_path / "journal")
+
+
+def test_meta_check_uses_cached_tags(tmp_path: Path, conn, reporter, make_mp3, monkeypatch):
+    config = scanned_config(tmp_path, conn, reporter, make_mp3)
+
+    def read_tags(path: Path):
+        raise AssertionError(f"tags read from {path}")
+
+    monkeypatch.setattr(meta, "read_tags", read_tags)
+    issues = collect_meta_issues([tmp_path / "lib"], "%artist% - %title%", config)
+
+    assert [issue.expected for issue in issues] == ["Band - Song"]
+
+
+def test_meta_fix_opens_one_connection(tmp_path: Path, conn, reporter, make_mp3, monkeypatch):
+    config = scanned_config(tmp_path, conn, reporter, make_mp3)
+    opened = []
+    original = meta.connect
+
+    def counting_connect(path: Path):
+        opened.append(path)
+        return original(path)
+
+    monkeypatch.setattr(meta, "connect", counting_connect)
+    meta_fix([tmp_path / "lib"], "%artist% - %title%", config, reporter, dry_run=False, force=True)
+
+    assert opened == [config.db_path]
+    assert (tmp_path / "lib" / "Band - Song.mp3").exists()
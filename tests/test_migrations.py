@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from audioclean.core import db as db_layer
+from audioclean.engine.duplicates import list_duplicate_groups, refresh_duplicate_groups
+
+# The cache layout before the schema was versioned (user_version 0).
+UNVERSIONED_SCHEMA = """
+CREATE TABLE files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    blake3 TEXT,
+    codec TEXT,
+    container TEXT,
+    duration REAL,
+    bitrate INTEGER,
+    sample_rate INTEGER,
+    channels INTEGER,
+    has_art INTEGER DEFAULT 0
+);
+CREATE TABLE fingerprints (
+    file_id INTEGER NOT NULL,
+    chromaprint TEXT NOT NULL,
+    UNIQUE(file_id),
+    FOREIGN KEY(file_id) REFERENCES files(id) ON DELETE CASCADE
+);
+CREATE TABLE operations (
+    op_id TEXT PRIMARY KEY,
+    plan_id TEXT,
+    op_type TEXT,
+    path TEXT,
+    new_path TEXT,
+    status TEXT
+);
+CREATE TABLE group_overrides (
+    group_hash TEXT NOT NULL,
+    path TEXT NOT NULL,
+    action TEXT NOT NULL,
+    template TEXT,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (group_hash, path)
+);
+INSERT INTO files (path, size, mtime, blake3, codec)
+VALUES ('/music/a.flac', 10, 1.0, 'same', 'audio/flac'),
+       ('/music/b.mp3', 10, 2.0, 'same', 'audio/mp3'),
+       ('/music/c.mp3', 20, 3.0, NULL, 'audio/mp3');
+INSERT INTO group_overrides VALUES ('same', '/music/b.mp3', 'keep', NULL, '2024-01-01T00:00:00Z');
+"""
+
+
+def unversioned_db(path: Path) -> Path:
+    conn = sqlite3.connect(path)
+    conn.executescript(UNVERSIONED_SCHEMA)
+    conn.close()
+    return path
+
+
+def test_unversioned_db_is_migrated_to_current_version(tmp_path: Path) -> None:
+    conn = db_layer.connect(unversioned_db(tmp_path / "cache.db"))
+
+    assert db_layer.schema_version(conn) == len(db_layer.MIGRATIONS)
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(files)")}
+    assert {"sample_hash", "hash_level", "audio_hash", "audio_size"} <= columns
+    rows = conn.execute("SELECT path, hash_level FROM files ORDER BY path").fetchall()
+    assert [tuple(row) for row in rows] == [
+        ("/music/a.flac", "full"),
+        ("/music/b.mp3", "full"),
+        ("/music/c.mp3", "size"),
+    ]
+    assert db_layer.get_group_overrides(conn, "same")["/music/b.mp3"]["action"] == "keep"
+
+    refresh_duplicate_groups(conn, True)
+    [group] = list_duplicate_groups(conn, True)
+    assert group.group_hash == "same" and len(group.members) == 2
+    conn.close()
+
+    reopened = db_layer.connect(tmp_path / "cache.db")
+    assert db_layer.migrate(reopened) == len(db_layer.MIGRATIONS)
+
+
+def test_failed_migration_leaves_previous_version(tmp_path: Path, monkeypatch) -> None:
+    conn = db_layer.connect(tmp_path / "cache.db")
+    version = db_layer.schema_version(conn)
+
+    def broken(conn: sqlite3.Connection) -> None:
+        conn.execute("CREATE TABLE half_done (id INTEGER)")
+        raise RuntimeError("migration failed")
+
+    monkeypatch.setattr(db_layer, "MIGRATIONS", [*db_layer.MIGRATIONS, broken])
+    with pytest.raises(RuntimeError):
+        db_layer.migrate(conn)
+
+    assert db_layer.schema_version(conn) == version
+    assert not db_layer._table_exists(conn, "half_done")
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from audioclean.utils.payload import blake3_audio, file_audio_payload_size
+
+NO_GRANULE = (1 << 64) - 1
+
+
+def ogg_page(body: bytes, lacing: list[int], granule: int, flags: int = 0, seq: int = 0) -> bytes:
+    header = b"OggS" + bytes([0, flags]) + granule.to_bytes(8, "little")
+    header += (1).to_bytes(4, "little") + seq.to_bytes(4, "little") + bytes(4)
+    return header + bytes([len(lacing)]) + bytes(lacing) + body
+
+
+def ogg_stream(
+    head: bytes, comment: bytes, extra_headers: list[bytes], audio: list[bytes]
+) -> bytes:
+    pages = [ogg_page(head, [len(head)], 0, flags=0x02)]
+    # The comment packet is split over full 255 * 255 byte pages, as picture blocks are.
+    chunk = 255 * 255
+    parts = [comment[start : start + chunk] for start in range(0, len(comment), chunk)]
+    for idx, part in enumerate(parts):
+        last = idx == len(parts) - 1
+        lacing = [255] * (len(part) // 255) + ([len(part) % 255] if last else [])
+        body = part
+        for packet in extra_headers if last else []:
+            body += packet
+            lacing += [255] * (len(packet) // 255) + [len(packet) % 255]
+        flags = 0x01 if idx else 0
+        pages.append(ogg_page(body, lacing, 0 if last else NO_GRANULE, flags, seq=idx + 1))
+    for idx, packet in enumerate(audio):
+        pages.append(ogg_page(packet, [len(packet)], 960 * (idx + 1), seq=len(pages)))
+    return b"".join(pages)
+
+
+def write_pair(tmp_path: Path, head: bytes, extra_headers: list[bytes]) -> tuple[Path, Path]:
+    audio = [bytes([idx]) * 200 for idx in range(1, 6)]
+    small = tmp_path / "small.ogg"
+    large = tmp_path / "large.ogg"
+    small.write_bytes(ogg_stream(head, b"tags" + bytes(100), extra_headers, audio))
+    large.write_bytes(ogg_stream(head, b"tags" + b"\x07" * 200_000, extra_headers, audio))
+    return small, large
+
+
+def test_opus_multi_page_comment_is_not_audio(tmp_path: Path) -> None:
+    small, large = write_pair(tmp_path, b"OpusHead" + bytes(11), [])
+    assert file_audio_payload_size(small) == file_audio_payload_size(large) == 1000
+    assert blake3_audio(small) == blake3_audio(large)
+
+
+def test_vorbis_setup_packet_after_comment_is_not_audio(tmp_path: Path) -> None:
+    small, large = write_pair(tmp_path, b"\x01vorbis" + bytes(22), [b"\x05vorbis" + bytes(300)])
+    assert file_audio_payload_size(small) == file_audio_payload_size(large) == 1000
+    assert blake3_audio(small) == blake3_audio(large)
+
+
+def test_unknown_codec_skips_pages_before_first_audio_granule(tmp_path: Path) -> None:
+    small, large = write_pair(tmp_path, b"Unknown " + bytes(20), [])
+    assert file_audio_payload_size(small) == file_audio_payload_size(large) == 1000
+    assert blake3_audio(small) == blake3_audio(large)
+
+
+def test_mp3_retag_keeps_audio_hash(tmp_path: Path, make_mp3) -> None:
+    first = make_mp3(tmp_path / "first.mp3", title="Song")
+    second = make_mp3(tmp_path / "second.mp3", title="A much longer title", artist="Other")
+
+    assert first.stat().st_size != second.stat().st_size
+    assert file_audio_payload_size(first) == file_audio_payload_size(second)
+    assert blake3_audio(first) == blake3_audio(second)
+    assert blake3_audio(first) != blake3_audio(make_mp3(tmp_path / "other.mp3", seed=1))
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from audioclean.api.sdk import Audioclean
+from audioclean.core.config import Config
+from audioclean.core.models import Journal, Operation, Plan
+
+
+def make_plan(root: Path) -> Plan:
+    return Plan.create(
+        [root],
+        (
+            Operation.create("rename", root / f"{index}.mp3", root / f"t{index}.mp3", "layout", 0.9)
+            for index in range(3)
+        ),
+        {"summary": {"rename": 3}},
+    )
+
+
+def test_ndjson_plan_round_trips_and_rereads(tmp_path: Path) -> None:
+    plan = make_plan(tmp_path)
+    with (tmp_path / "plan.ndjson").open("w") as handle:
+        assert plan.write_ndjson(handle) == 3
+
+    loaded = Plan.load(tmp_path / "plan.ndjson")
+
+    assert (loaded.plan_id, loaded.metadata) == (plan.plan_id, {"summary": {"rename": 3}})
+    assert len(loaded.operations) == 3
+    first = [(op.path.name, op.new_path.name) for op in loaded.operations]
+    assert first == [("0.mp3", "t0.mp3"), ("1.mp3", "t1.mp3"), ("2.mp3", "t2.mp3")]
+    assert [op.path.name for op in loaded.operations] == ["0.mp3", "1.mp3", "2.mp3"]
+
+
+def test_legacy_json_plan_still_loads(tmp_path: Path) -> None:
+    plan = make_plan(tmp_path)
+    plan.operations = list(plan.operations)
+    (tmp_path / "plan.json").write_text(plan.to_json())
+
+    loaded = Plan.load(tmp_path / "plan.json")
+
+    assert loaded.plan_id == plan.plan_id
+    assert [op.op_id for op in loaded.operations] == [op.op_id for op in plan.operations]
+
+
+def test_sdk_apply_returns_the_journal(tmp_path: Path) -> None:
+    library = tmp_path / "library"
+    library.mkdir()
+    (library / "0.mp3").write_bytes(b"zero")
+    config = Config(db_path=tmp_path / "cache.db", journal_dir=tmp_path / "journals")
+    client = Audioclean(config)
+    plan = Plan.create([library], [])
+    plan.operations = [
+        Operation.create("rename", library / "0.mp3", library / "t0.mp3", "layout", 1.0)
+    ]
+
+    journal = client.apply(plan)
+
+    assert isinstance(journal, Journal) and journal.plan_id == plan.plan_id
+    assert [entry["status"] for entry in journal.entries] == ["moved"]
+    assert (library / "t0.mp3").read_bytes() == b"zero"
+    summary = client.apply_summary(Plan.create([library], []))
+    assert summary["entries"] == 0 and Path(summary["journal_path"]).exists()
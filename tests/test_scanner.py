@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+
+from audioclean.core import db as db_layer
+from audioclean.engine.scanner import discover_files, scan
+
+
+def test_file_index_covers_root_and_nothing_beside_it(tmp_path: Path, conn, reporter, make_mp3):
+    library = tmp_path / "lib"
+    make_mp3(library / "a" / "one.mp3")
+    make_mp3(library / "two.mp3", seed=1)
+    make_mp3(tmp_path / "lib2" / "other.mp3", seed=2)
+    scan([library, tmp_path / "lib2"], conn, 1, reporter)
+
+    index = db_layer.load_file_index(conn, [library])
+
+    assert sorted(index) == [str(library / "a" / "one.mp3"), str(library / "two.mp3")]
+    stat = (library / "two.mp3").stat()
+    assert index[str(library / "two.mp3")] == (stat.st_size, stat.st_mtime)
+
+
+def settle(*directories: Path) -> None:
+    # Directory mtimes from the last two seconds are not trusted, so age them.
+    past = time.time() - 60
+    for directory in directories:
+        os.utime(directory, (past, past))
+
+
+def test_rescan_of_unchanged_library_writes_nothing(tmp_path: Path, conn, reporter, make_mp3):
+    for idx in range(3):
+        make_mp3(tmp_path / "lib" / f"{idx}.mp3", seed=idx)
+    first = scan([tmp_path / "lib"], conn, 1, reporter)
+    again = scan([tmp_path / "lib"], conn, 1, reporter)
+
+    assert first["db_rows_written"] == 3
+    assert again["db_rows_written"] == 0
+
+
+def test_process_executor_scans_like_threads(tmp_path: Path, reporter, make_mp3) -> None:
+    for idx in range(6):
+        make_mp3(tmp_path / "lib" / f"{idx}.mp3", title=f"Song {idx}", seed=idx)
+    rows = {}
+    for executor in ("thread", "process"):
+        conn = db_layer.connect(tmp_path / f"{executor}.db")
+        scan([tmp_path / "lib"], conn, 2, reporter, executor=executor, chunk_size=2)
+        rows[executor] = conn.execute(
+            "SELECT path, size, codec, duration, title FROM files JOIN tags ON file_id = id "
+            "ORDER BY path"
+        ).fetchall()
+        conn.close()
+
+    assert len(rows["process"]) == 6
+    assert [tuple(row) for row in rows["process"]] == [tuple(row) for row in rows["thread"]]
+
+
+def test_rescan_lists_only_directories_that_changed(tmp_path: Path, conn, reporter, make_mp3):
+    library = tmp_path / "lib"
+    make_mp3(library / "a" / "one.mp3")
+    make_mp3(library / "b" / "two.mp3", seed=1)
+    settle(library / "a", library / "b", library)
+    first = scan([library], conn, 1, reporter)
+    assert (first["dirs_listed"], first["dirs_skipped"]) == (3, 0)
+
+    again = scan([library], conn, 1, reporter)
+    assert (again["dirs_listed"], again["dirs_skipped"]) == (0, 3)
+
+    listed = (library / "a").stat()
+    make_mp3(library / "a" / "one.mp3", title="Retagged")
+    os.utime(library / "a", ns=(listed.st_atime_ns, listed.st_mtime_ns))
+    make_mp3(library / "b" / "three.mp3", seed=3)
+    changed = scan([library], conn, 1, reporter)
+
+    assert (changed["dirs_listed"], changed["dirs_skipped"]) == (1, 2)
+    assert changed["db_rows_written"] == 2
+    index = db_layer.load_file_index(conn, [library])
+    assert str(library / "b" / "three.mp3") in index
+
+
+def test_parallel_walk_finds_every_audio_file_once(tmp_path: Path) -> None:
+    library = tmp_path / "lib"
+    expected = set()
+    for artist in range(4):
+        for album in range(3):
+            folder = library / f"artist{artist}" / f"album{album}"
+            folder.mkdir(parents=True)
+            (folder / "cover.jpg").write_bytes(b"jpg")
+            for track in range(2):
+                path = folder / f"{track}.FLAC"
+                path.write_bytes(b"audio")
+                expected.add(path)
+    (library / "loop").symlink_to(library)
+
+    for workers in (1, 4):
+        found = list(discover_files([library], workers=workers))
+        assert len(found) == len(expected) and set(found) == expected
+
+
+def test_rescan_carries_moved_files_over_and_prunes_deleted(tmp_path, conn, reporter, make_mp3):
+    library = tmp_path / "lib"
+    make_mp3(library / "a" / "one.mp3")
+    make_mp3(library / "a" / "two.mp3", seed=1)
+    make_mp3(library / "b" / "three.mp3", seed=2)
+    make_mp3(library / "b" / "four.mp3", frames=50)
+    scan([library], conn, 1, reporter)
+    ids = {Path(row["path"]).name: row["id"] for row in conn.execute("SELECT id, path FROM files")}
+
+    (library / "a" / "one.mp3").rename(library / "a" / "uno.mp3")
+    (library / "b").rename(library / "c")
+    (library / "a" / "two.mp3").unlink()
+    stats = scan([library], conn, 1, reporter)
+
+    assert (stats["files_moved"], stats["files_pruned"]) == (3, 1)
+    rows = {row["path"]: row["id"] for row in conn.execute("SELECT id, path FROM files")}
+    assert rows == {
+        str(library / "a" / "uno.mp3"): ids["one.mp3"],
+        str(library / "c" / "three.mp3"): ids["three.mp3"],
+        str(library / "c" / "four.mp3"): ids["four.mp3"],
+    }
+
+
+def test_size_and_mtime_match_with_other_sample_hash_is_not_a_move(
+    tmp_path: Path, conn, reporter, make_mp3
+):
+    library = tmp_path / "lib"
+    make_mp3(library / "four.mp3", frames=50)
+    scan([library], conn, 1, reporter)
+    [(file_id,)] = conn.execute("SELECT id FROM files").fetchall()
+    conn.execute("UPDATE files SET sample_hash = 'other' WHERE id = ?", (file_id,))
+    conn.commit()
+
+    (library / "four.mp3").rename(library / "cuatro.mp3")
+    stats = scan([library], conn, 1, reporter)
+
+    assert (stats["files_moved"], stats["files_pruned"]) == (0, 1)
+    # A fresh row; SQLite may hand out the freed id again.
+    [(path, sample_hash)] = conn.execute("SELECT path, sample_hash FROM files").fetchall()
+    assert path == str(library / "cuatro.mp3") and sample_hash != "other"
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import audioclean.utils.tags as tags_module
+from audioclean.engine.scanner import _scan_one
+from audioclean.utils.tags import read_media
+
+
+def test_scan_parses_each_file_once(tmp_path: Path, monkeypatch, make_mp3) -> None:
+    path = make_mp3(tmp_path / "song.mp3", title="Song", artist="Band")
+    parses = []
+    original = tags_module.File
+
+    def counting_file(source):
+        parses.append(source)
+        return original(source)
+
+    monkeypatch.setattr(tags_module, "File", counting_file)
+
+    record = _scan_one(path)
+
+    assert len(parses) == 1
+    assert record.container == "MP3" and record.duration and record.bitrate
+    assert (record.tags.title, record.tags.artist) == ("Song", "Band")
+
+
+def test_untagged_file_keeps_stream_info(tmp_path: Path, make_mp3) -> None:
+    path = make_mp3(tmp_path / "song.mp3")
+    raw = path.read_bytes()
+    untagged = tmp_path / "untagged.mp3"
+    untagged.write_bytes(raw[raw.index(b"\xff\xfb") :])
+
+    media = read_media(untagged)
+
+    assert media.container == "MP3" and media.bitrate and media.sample_rate
+    assert media.tags.title is None
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from array import array
+from pathlib import Path
+
+from audioclean.core.models import FileRecord
+from audioclean.core.writer import ScanWriter
+from audioclean.utils.chromaprint import raw_to_blob
+
+
+def record(idx: int, size: int = 1000) -> FileRecord:
+    return FileRecord(id=None, path=Path(f"/music/{idx:03}.flac"), size=size, mtime=float(idx))
+
+
+def test_writer_commits_in_batches(conn) -> None:
+    with ScanWriter(conn, batch_size=4, commit_interval=60.0) as writer:
+        for idx in range(10):
+            writer.put(record(idx))
+
+    assert conn.execute("SELECT COUNT(*) FROM files").fetchone()[0] == 10
+    assert writer.stats["rows_written"] == 10
+    assert writer.stats["batches_committed"] == 3
+
+
+def test_rewriting_a_file_keeps_its_raw_fingerprint(conn) -> None:
+    raw = raw_to_blob(array("I", range(1, 200)))
+    with ScanWriter(conn) as writer:
+        writer.put(record(1))
+        writer.flush()
+        writer.put_fingerprint(Path("/music/001.flac"), raw)
+        writer.flush()
+        writer.put(record(1, size=2000))
+
+    row = conn.execute("SELECT chromaprint, raw, indexed FROM fingerprints").fetchone()
+    assert (row["chromaprint"], bytes(row["raw"]), row["indexed"]) == ("", raw, 1)
+    assert conn.execute("SELECT size FROM files").fetchone()[0] == 2000